@@ -10,9 +10,25 @@ import threading
 import datetime
 import logging
 import traceback
-from typing import Dict, Any, Optional
+import argparse
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait as futures_wait
 from dataclasses import dataclass, asdict
-from kiteconnect import KiteConnect
+from kite_sessions import shared_sessions, KITE_ROOT_ENV
+from quote_service import QuoteService
+from positions_service import PositionsService
+from order_gateway import OrderGateway, PendingOrder
+from order_fills import FillWatcher
+from instrument_store import InstrumentStore, INSTRUMENTS_DB_ENV
+from market_data import MarketDataHub
+from algorithm_worker import AlgorithmWorker, WorkerError
+from scheduler import DeploymentScheduler
+from deployment_store import DeploymentStore, DEPLOYMENT_STORE_ENV
+from deployment_leases import LeaseManager, NODE_ID_ENV
+from event_stream import EventBus
+from deployment_logs import DeploymentLogs
+from metrics import registry as metrics_registry
+from metrics import BROKER_CALL_SECONDS, BROKER_CALL_ERRORS, BROKER_METHODS, RUN_SECONDS, RUN_FAILURES
 import subprocess
 import sys
 import os
@@ -28,6 +44,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Environment variable naming the result pipe of a subprocess-mode run
+RESULT_FD_ENV = "ALGO_RESULT_FD"
+
 @dataclass
 class DeploymentConfig:
     """Configuration for algorithm deployment"""
@@ -43,6 +62,12 @@ class DeploymentConfig:
     created_at: str = ""
     profit: float = 0.0
     trades: int = 0
+    execution_mode: str = "worker"  # "worker" (persistent process) or "subprocess" (fresh interpreter per run)
+    run_interval: float = 60.0  # seconds between executions
+    retry_interval: float = 30.0  # seconds before retrying after an error
+
+# Fields served in list payloads that leave out the algorithm source
+SUMMARY_FIELDS = tuple(name for name in DeploymentConfig.__dataclass_fields__ if name != "algorithm_code")
 
 @dataclass
 class TradeResult:
@@ -55,38 +80,152 @@ class TradeResult:
     status: str
     timestamp: str
     error: Optional[str] = None
+    queue_latency_ms: Optional[float] = None  # time spent in the order gateway
+
+class PositionBook:
+    """Net quantity and average price per symbol, used for realized P&L"""
+    
+    def __init__(self):
+        self.positions: Dict[str, Tuple[int, float]] = {}
+    
+    def apply(self, trade: TradeResult) -> float:
+        """Apply a fill and return the P&L it realized"""
+        quantity = trade.quantity if trade.transaction_type == "BUY" else -trade.quantity
+        net, average = self.positions.get(trade.symbol, (0, 0.0))
+        realized = 0.0
+        new_net = net + quantity
+        
+        if net == 0 or (net > 0) == (quantity > 0):
+            # Opening or adding to a position
+            average = (average * abs(net) + trade.price * abs(quantity)) / abs(new_net) if new_net else 0.0
+        else:
+            # Reducing, closing or flipping a position
+            closed = min(abs(quantity), abs(net))
+            realized = closed * (trade.price - average) * (1 if net > 0 else -1)
+            if new_net == 0:
+                average = 0.0
+            elif (new_net > 0) != (net > 0):
+                average = trade.price
+        
+        self.positions[trade.symbol] = (new_net, average)
+        return realized
 
 class AlgorithmExecutor:
     """Main class for executing trading algorithms"""
     
-    def __init__(self):
+    def __init__(self, max_workers: int = 16, kite_root: Optional[str] = None,
+                 store_path: Optional[str] = None, node_id: Optional[str] = None):
+        # Base URL of the Kite REST API, e.g. a local paper exchange
+        if kite_root:
+            shared_sessions.set_root(kite_root)
         self.deployments: Dict[str, DeploymentConfig] = {}
-        self.running_threads: Dict[str, threading.Thread] = {}
-        self.stop_flags: Dict[str, threading.Event] = {}
-        self.kite_instances: Dict[str, KiteConnect] = {}
+        self.workers: Dict[str, AlgorithmWorker] = {}
+        self.position_books: Dict[str, PositionBook] = {}
+        self._trade_lock = threading.Lock()
+        # Gateway references of late orders -> whether the outcome was recorded before the PENDING row
+        self._late_orders: Dict[str, bool] = {}
+        # Batched, cached quotes shared by every deployment
+        self.quotes = QuoteService(shared_sessions.get)
+        # Local instrument master, downloaded once per trading day
+        self.instruments = InstrumentStore(os.environ.get(INSTRUMENTS_DB_ENV) or 'instruments.db', shared_sessions.get)
+        # Streaming ticks shared with every algorithm through shared memory
+        self.market_data = MarketDataHub(root=shared_sessions.root)
+        shared_sessions.add_root_listener(self.market_data.set_root)
+        # Positions and margins polled once per account, shared by all consumers
+        self.positions = PositionsService(shared_sessions.get)
+        # Rate-limited, exits-first path for every deployment's orders
+        self.orders = OrderGateway(shared_sessions.get)
+        # Follows placed orders until they fill, for trade counts and realized P&L
+        self.fills = FillWatcher(shared_sessions.get)
+        # One timer thread plus a bounded pool runs every deployment
+        self.scheduler = DeploymentScheduler(self._execute_algorithm, max_workers=max_workers)
+        # Deployments, runs and trades in SQLite (WAL), written in batches by one thread
+        self.store = DeploymentStore(store_path or os.environ.get(DEPLOYMENT_STORE_ENV) or 'deployments.db')
+        # With a node id, nodes sharing the store split deployments through leases
+        self.node_id = node_id or os.environ.get(NODE_ID_ENV) or None
+        self.leases: Optional[LeaseManager] = None
+        self._stopping = threading.Event()
+        # Cleared while deployments left running by the previous process are being resumed
+        self.resumed = threading.Event()
+        self.resumed.set()
+        # Version counter and pre-serialized JSON, rebuilt only when state changes
+        self.version = 0
+        self._versions: Dict[str, int] = {}
+        self._fragments: Dict[str, Tuple[int, str, str]] = {}
+        self._listing: Dict[bool, Tuple[int, str]] = {}
+        self._version_lock = threading.Lock()
+        # Pushes state transitions, trades and P&L changes to dashboards
+        self.events = EventBus()
+        # Each deployment's output: recent lines in memory, everything in logs/algorithm_<id>.log
+        self.logs = DeploymentLogs('logs')
         self.load_deployments()
+        if self.node_id:
+            self.leases = LeaseManager(self.store.db_path, self.node_id)
+            threading.Thread(target=self._coordinate_loop, name="lease-coordinator", daemon=True).start()
         
     def load_deployments(self):
-        """Load existing deployments from file"""
+        """Load existing deployments from the store"""
         try:
-            if os.path.exists('deployments.json'):
-                with open('deployments.json', 'r') as f:
-                    data = json.load(f)
-                    for dep_id, dep_data in data.items():
-                        self.deployments[dep_id] = DeploymentConfig(**dep_data)
-                logger.info(f"Loaded {len(self.deployments)} deployments")
+            state = self.store.load()
+            if self.node_id:
+                # Only leased deployments are held in memory; the coordinator claims them
+                logger.info(f"Node {self.node_id} sees {len(state)} deployments in {self.store.db_path}")
+                return
+            for dep_id, dep_data in state.items():
+                self.deployments[dep_id] = DeploymentConfig(**dep_data)
+                self._touch(dep_id)
+            logger.info(f"Loaded {len(self.deployments)} deployments")
         except Exception as e:
             logger.error(f"Error loading deployments: {e}")
     
     def save_deployments(self):
-        """Save deployments to file"""
+        """Commit pending changes and checkpoint the store's write-ahead log"""
         try:
-            data = {dep_id: asdict(dep) for dep_id, dep in self.deployments.items()}
-            with open('deployments.json', 'w') as f:
-                json.dump(data, f, indent=2)
+            self.store.compact()
         except Exception as e:
             logger.error(f"Error saving deployments: {e}")
     
+    def update_status(self, algorithm_id: str, status: str, wait: bool = True):
+        """Change a deployment's status and persist the change"""
+        config = self.deployments.get(algorithm_id)
+        if config is not None:
+            previous, config.status = config.status, status
+            self._persist(config, "status", wait=wait)
+            self._publish_status(config, previous)
+    
+    def _publish_status(self, config: DeploymentConfig, previous: Optional[str]):
+        self.events.publish("status", self._status_event(config, previous))
+    
+    def status_events(self) -> List[Dict[str, Any]]:
+        """Current state of every deployment as "status" event data, to resync a subscriber that missed events"""
+        return [self._status_event(config, config.status) for config in list(self.deployments.values())]
+    
+    @staticmethod
+    def _status_event(config: DeploymentConfig, previous: Optional[str]) -> Dict[str, Any]:
+        return {
+            "algorithm_id": config.algorithm_id,
+            "algorithm_name": config.algorithm_name,
+            "status": config.status,
+            "previous": previous,
+            "trades": config.trades,
+            "profit": config.profit
+        }
+    
+    def _persist(self, config: DeploymentConfig, *fields: str, wait: bool = False):
+        """Store the given fields of a deployment; wait=True blocks until durable"""
+        self._touch(config.algorithm_id)
+        fence = None
+        if self.leases is not None:
+            fence = self.leases.token(config.algorithm_id)
+            if fence is None:
+                logger.warning(f"Not writing {config.algorithm_id}: this node no longer holds its lease")
+                return
+        try:
+            self.store.update(config.algorithm_id, wait=wait, fence=fence,
+                              **{field: getattr(config, field) for field in fields})
+        except Exception as e:
+            logger.error(f"Error persisting deployment {config.algorithm_id}: {e}")
+    
     def deploy_algorithm(self, config: DeploymentConfig) -> bool:
         """Deploy and start an algorithm"""
         try:
@@ -94,38 +233,23 @@ class AlgorithmExecutor:
             if not self._validate_config(config):
                 return False
             
-            # Initialize KiteConnect instance
-            kite = KiteConnect(api_key=config.api_key)
-            kite.set_access_token(config.access_token)
-            self.kite_instances[config.algorithm_id] = kite
+            # Only the node holding the deployment's lease may run it
+            fence, leased = None, False
+            if self.leases is not None:
+                leased = self.leases.holds(config.algorithm_id)
+                fence = self.leases.acquire(config.algorithm_id)
+                if fence is None:
+                    logger.error(f"Deployment {config.algorithm_id} is owned by node "
+                                 f"{self.leases.owner(config.algorithm_id)}")
+                    return False
             
             # Test connection
-            try:
-                profile = kite.profile()
-                logger.info(f"Connected to Zerodha account: {profile.get('user_name', 'Unknown')}")
-            except Exception as e:
-                logger.error(f"Failed to connect to Zerodha API: {e}")
+            if not self._verify_credentials(config):
+                if self.leases is not None and not leased:
+                    self.leases.release(config.algorithm_id)
                 return False
             
-            # Update deployment status
-            config.status = "running"
-            config.created_at = datetime.datetime.now().isoformat()
-            self.deployments[config.algorithm_id] = config
-            
-            # Create stop flag
-            stop_flag = threading.Event()
-            self.stop_flags[config.algorithm_id] = stop_flag
-            
-            # Start execution thread
-            thread = threading.Thread(
-                target=self._execute_algorithm,
-                args=(config, stop_flag),
-                daemon=True
-            )
-            thread.start()
-            self.running_threads[config.algorithm_id] = thread
-            
-            self.save_deployments()
+            self._start(config, fence)
             logger.info(f"Algorithm '{config.algorithm_name}' deployed successfully")
             return True
             
@@ -133,26 +257,188 @@ class AlgorithmExecutor:
             logger.error(f"Error deploying algorithm: {e}")
             return False
     
+    def deploy_algorithms(self, configs: List[DeploymentConfig], parallelism: int = 8) -> Dict[str, bool]:
+        """Deploy many algorithms in one call; returns success per algorithm_id.
+        
+        Like deploy_algorithm, but each account's credentials are checked
+        once, deployments start on at most `parallelism` threads and the
+        store is flushed once at the end.
+        """
+        started = time.perf_counter()
+        results: Dict[str, bool] = {}
+        fences: Dict[str, Optional[int]] = {}
+        leased = set()
+        ready = []
+        for config in {config.algorithm_id: config for config in configs}.values():
+            if not self._validate_config(config):
+                results[config.algorithm_id] = False
+                continue
+            if self.leases is not None:
+                if self.leases.holds(config.algorithm_id):
+                    leased.add(config.algorithm_id)
+                fences[config.algorithm_id] = self.leases.acquire(config.algorithm_id)
+                if fences[config.algorithm_id] is None:
+                    logger.error(f"Deployment {config.algorithm_id} is owned by node "
+                                 f"{self.leases.owner(config.algorithm_id)}")
+                    results[config.algorithm_id] = False
+                    continue
+            ready.append(config)
+        
+        results.update(self._start_batch(ready, fences, parallelism))
+        if self.leases is not None:
+            for config in ready:
+                if not results[config.algorithm_id] and config.algorithm_id not in leased:
+                    self.leases.release(config.algorithm_id)
+        logger.info(f"Deployed {sum(results.values())} of {len(results)} algorithms "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return results
+    
+    def resume_deployments(self, configs: Optional[List[DeploymentConfig]] = None, parallelism: int = 8) -> int:
+        """Restart deployments that were running (default: every loaded one marked 'running').
+        
+        Credentials are checked once per (api_key, access_token) and the
+        checks and starts run on at most `parallelism` threads. Deployments
+        that cannot be started, e.g. because their token was rejected, are
+        marked stopped. Returns how many deployments were resumed.
+        """
+        if configs is None:
+            configs = [config for config in list(self.deployments.values()) if config.status == "running"]
+        started = time.perf_counter()
+        fences: Dict[str, Optional[int]] = {}
+        ready = []
+        for config in configs:
+            if self.leases is not None:
+                fences[config.algorithm_id] = self.leases.acquire(config.algorithm_id)
+                if fences[config.algorithm_id] is None:
+                    continue
+            ready.append(config)
+        if not ready:
+            return 0
+        
+        results = self._start_batch(ready, fences, parallelism, resumed=True)
+        for config in ready:
+            if not results[config.algorithm_id]:
+                logger.error(f"Could not resume {config.algorithm_id}; marking it stopped")
+                self.deployments.setdefault(config.algorithm_id, config)
+                self.update_status(config.algorithm_id, "stopped")
+                if self.leases is not None:
+                    self.leases.release(config.algorithm_id)
+        count = sum(results.values())
+        logger.info(f"Resumed {count} of {len(configs)} deployments "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return count
+    
+    def _start_batch(self, configs: List[DeploymentConfig], fences: Dict[str, Optional[int]],
+                     parallelism: int, resumed: bool = False) -> Dict[str, bool]:
+        """Verify each account once, then start its deployments in parallel and flush the store once"""
+        if not configs:
+            return {}
+        accounts: Dict[Tuple[str, str], List[DeploymentConfig]] = {}
+        for config in configs:
+            accounts.setdefault((config.api_key, config.access_token), []).append(config)
+        
+        with ThreadPoolExecutor(max_workers=min(parallelism, len(configs)), thread_name_prefix="start") as pool:
+            verified = dict(zip(accounts, pool.map(self._verify_credentials,
+                                                   [group[0] for group in accounts.values()])))
+            ready = [config for account, group in accounts.items() if verified[account] for config in group]
+            outcomes = pool.map(lambda config: self._try_start(config, fences.get(config.algorithm_id), resumed),
+                                ready)
+            results = dict(zip([config.algorithm_id for config in ready], outcomes))
+        self.store.sync()
+        return {config.algorithm_id: results.get(config.algorithm_id, False) for config in configs}
+    
+    def _try_start(self, config: DeploymentConfig, fence: Optional[int], resumed: bool) -> bool:
+        try:
+            self._start(config, fence, resumed=resumed, wait=False)
+            return True
+        except Exception as e:
+            logger.error(f"Error starting {config.algorithm_id}: {e}")
+            return False
+    
+    def resume_in_background(self):
+        """Restart the deployments the previous process left running, on a background thread.
+        
+        Only the service entry points call this, once the executor is fully
+        configured; constructing an executor never starts trading by itself.
+        With leases, the coordinator claims deployments instead.
+        """
+        if self.leases is not None:
+            return
+        self.resumed.clear()
+        threading.Thread(target=self._resume_loaded, name="resume", daemon=True).start()
+    
+    def _resume_loaded(self):
+        try:
+            self.resume_deployments()
+        except Exception as e:
+            logger.error(f"Error resuming deployments: {e}")
+        finally:
+            self.resumed.set()
+    
+    def _verify_credentials(self, config: DeploymentConfig) -> bool:
+        """Check the deployment's access token with a profile call, once per token and day"""
+        if shared_sessions.verified_profile(config.api_key, config.access_token) is not None:
+            return True
+        # Shared, pooled KiteConnect instance for these credentials
+        kite = shared_sessions.get(config.api_key, config.access_token)
+        started = time.perf_counter()
+        try:
+            profile = kite.profile()
+            self._record_call(config, "profile", time.perf_counter() - started)
+            shared_sessions.remember_profile(config.api_key, config.access_token, profile)
+            logger.info(f"Connected to Zerodha account: {profile.get('user_name', 'Unknown')}")
+            return True
+        except Exception as e:
+            self._record_call(config, "profile", time.perf_counter() - started, error=True)
+            logger.error(f"Failed to connect to Zerodha API: {e}")
+            shared_sessions.discard(config.api_key, config.access_token)
+            return False
+    
+    def _start(self, config: DeploymentConfig, fence: Optional[int] = None, resumed: bool = False,
+               wait: bool = True):
+        """Mark a verified deployment running, prepare it and hand it to the scheduler"""
+        # Make sure today's instrument master is on disk
+        self.instruments.refresh_async(config.api_key, config.access_token)
+        
+        # Update deployment status
+        existing = self.deployments.get(config.algorithm_id)
+        previous = existing.status if existing is not None and existing is not config else None
+        config.status = "running"
+        if not resumed or not config.created_at:
+            config.created_at = datetime.datetime.now().isoformat()
+        self.deployments[config.algorithm_id] = config
+        
+        # Prepare the algorithm and hand it to the scheduler
+        self._prepare_execution(config)
+        self.scheduler.schedule(config.algorithm_id)
+        
+        self._touch(config.algorithm_id)
+        self.store.put(config.algorithm_id, asdict(config), wait=wait, fence=fence)
+        self._publish_status(config, previous)
+    
     def stop_algorithm(self, algorithm_id: str) -> bool:
         """Stop a running algorithm"""
         try:
-            if algorithm_id in self.stop_flags:
-                self.stop_flags[algorithm_id].set()
-                
-            if algorithm_id in self.running_threads:
-                self.running_threads[algorithm_id].join(timeout=5)
-                del self.running_threads[algorithm_id]
-                
-            if algorithm_id in self.deployments:
-                self.deployments[algorithm_id].status = "stopped"
-                
-            if algorithm_id in self.kite_instances:
-                del self.kite_instances[algorithm_id]
-                
-            if algorithm_id in self.stop_flags:
-                del self.stop_flags[algorithm_id]
+            if self.leases is not None and algorithm_id not in self.deployments:
+                # Runs on another node: record the stop, which its owner applies on the next renewal
+                if self.store.get(algorithm_id) is None:
+                    return False
+                self.store.update(algorithm_id, wait=True, status="stopped")
+                logger.info(f"Stop of {algorithm_id} recorded for node {self.leases.owner(algorithm_id)}")
+                return True
+            
+            in_flight = self.scheduler.cancel(algorithm_id)
+            if in_flight is not None:
+                try:
+                    in_flight.result(timeout=5)
+                except Exception:
+                    pass
+            
+            self._cleanup_execution(algorithm_id)
                 
-            self.save_deployments()
+            self.update_status(algorithm_id, "stopped")
+            if self.leases is not None:
+                self.leases.release(algorithm_id)
             logger.info(f"Algorithm {algorithm_id} stopped successfully")
             return True
             
@@ -160,6 +446,116 @@ class AlgorithmExecutor:
             logger.error(f"Error stopping algorithm: {e}")
             return False
     
+    def stop_algorithms(self, algorithm_ids: List[str], parallelism: int = 16) -> Dict[str, bool]:
+        """Stop many algorithms in one call; returns success per algorithm_id.
+        
+        Every deployment is taken off the scheduler first, in-flight runs get
+        one shared 5 second grace period, workers are shut down in parallel
+        and the new statuses are flushed to the store once.
+        """
+        started = time.perf_counter()
+        results: Dict[str, bool] = {}
+        local = []
+        for algorithm_id in dict.fromkeys(algorithm_ids):
+            if algorithm_id in self.deployments:
+                local.append(algorithm_id)
+            elif self.leases is not None and self.store.get(algorithm_id) is not None:
+                # Runs on another node, which applies the stop on its next renewal
+                self.store.update(algorithm_id, status="stopped")
+                results[algorithm_id] = True
+            else:
+                results[algorithm_id] = False
+        
+        in_flight = [future for future in map(self.scheduler.cancel, local) if future is not None]
+        if in_flight:
+            futures_wait(in_flight, timeout=5)
+        if local:
+            with ThreadPoolExecutor(max_workers=min(parallelism, len(local)), thread_name_prefix="stop") as pool:
+                list(pool.map(self._try_cleanup, local))
+        
+        for algorithm_id in local:
+            self.update_status(algorithm_id, "stopped", wait=False)
+            if self.leases is not None:
+                self.leases.release(algorithm_id)
+            results[algorithm_id] = True
+        self.store.sync()
+        logger.info(f"Stopped {sum(results.values())} of {len(results)} algorithms "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return results
+    
+    def _try_cleanup(self, algorithm_id: str):
+        try:
+            self._cleanup_execution(algorithm_id)
+        except Exception as e:
+            logger.error(f"Error stopping {algorithm_id}: {e}")
+    
+    def adopt_deployment(self, config: DeploymentConfig,
+                         history: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> bool:
+        """Take over a deployment recorded by another executor, restarting it if it was running"""
+        if history:
+            self.store.import_history(config.algorithm_id, history)
+        if config.status == "running":
+            return self.deploy_algorithm(config)
+        self.deployments[config.algorithm_id] = config
+        self._touch(config.algorithm_id)
+        self.store.put(config.algorithm_id, asdict(config), wait=True)
+        return True
+    
+    def is_running(self, algorithm_id: str) -> bool:
+        """Check whether a deployment is scheduled or mid-run"""
+        return self.scheduler.is_scheduled(algorithm_id)
+    
+    def running_count(self) -> int:
+        return sum(1 for config in list(self.deployments.values()) if config.status == "running")
+    
+    def reconcile(self) -> int:
+        """Mark deployments 'stopped' that claim to run but are no longer scheduled"""
+        if not self.resumed.is_set():
+            return 0
+        stale = [dep_id for dep_id, config in list(self.deployments.items())
+                 if config.status == "running" and not self.is_running(dep_id)]
+        for dep_id in stale:
+            self.update_status(dep_id, "stopped")
+        return len(stale)
+    
+    def render_metrics(self) -> str:
+        return metrics_registry.render()
+    
+    def coordinate(self):
+        """One lease round: renew, apply stops recorded elsewhere, claim orphaned deployments"""
+        for dep_id in self.leases.renew():
+            self._relinquish(dep_id)
+        
+        for dep_id, status in self.store.statuses(self.leases.held()).items():
+            config = self.deployments.get(dep_id)
+            if status != "running" and config is not None and config.status == "running":
+                logger.info(f"Deployment {dep_id} was stopped on another node")
+                self.stop_algorithm(dep_id)
+        
+        claimed = []
+        for dep_id in self.leases.claimable():
+            data = self.store.get(dep_id)
+            if data is not None and data.get("status") == "running":
+                logger.info(f"Node {self.node_id} taking over deployment {dep_id}")
+                claimed.append(DeploymentConfig(**data))
+        if claimed:
+            self.resume_deployments(claimed)
+    
+    def _coordinate_loop(self):
+        while not self._stopping.wait(self.leases.ttl / 4):
+            try:
+                self.coordinate()
+            except Exception as e:
+                logger.error(f"Error coordinating leases: {e}")
+    
+    def _relinquish(self, algorithm_id: str):
+        """Stop running a deployment locally without touching its stored state"""
+        self.scheduler.cancel(algorithm_id)
+        self._cleanup_execution(algorithm_id)
+        self.deployments.pop(algorithm_id, None)
+        self._touch(algorithm_id)
+        logger.warning(f"Deployment {algorithm_id} handed to another node")
+    
     def get_deployment_status(self, algorithm_id: str) -> Optional[Dict[str, Any]]:
         """Get status of a deployment"""
         if algorithm_id in self.deployments:
@@ -170,7 +566,53 @@ class AlgorithmExecutor:
         """Get all deployments"""
         return {dep_id: asdict(dep) for dep_id, dep in self.deployments.items()}
     
-    def _validate_config(self, config: DeploymentConfig) -> bool:
+    def serialized_deployment(self, algorithm_id: str, include_code: bool = True) -> Tuple[int, Optional[str]]:
+        """(version, JSON) of one deployment, serialized once per change"""
+        fragment = self._fragment(algorithm_id)
+        if fragment is None:
+            return self.version, None
+        return fragment[0], fragment[1] if include_code else fragment[2]
+    
+    def serialized_deployments(self, include_code: bool = True) -> Tuple[int, str]:
+        """(version, JSON object of all deployments), rebuilt only after a change"""
+        version = self.version
+        cached = self._listing.get(include_code)
+        if cached is not None and cached[0] == version:
+            return cached
+        
+        parts = []
+        for dep_id in list(self.deployments):
+            fragment = self._fragment(dep_id)
+            if fragment is not None:
+                parts.append(f"{json.dumps(dep_id)}:{fragment[1] if include_code else fragment[2]}")
+        listing = (version, "{" + ",".join(parts) + "}")
+        self._listing[include_code] = listing
+        return listing
+    
+    def _touch(self, algorithm_id: str):
+        """Bump the state version after a deployment changed"""
+        with self._version_lock:
+            self.version += 1
+            self._versions[algorithm_id] = self.version
+    
+    def _fragment(self, algorithm_id: str) -> Optional[Tuple[int, str, str]]:
+        config = self.deployments.get(algorithm_id)
+        if config is None:
+            return None
+        # Read the version before the fields so a concurrent change forces a rebuild
+        version = self._versions.get(algorithm_id, 0)
+        cached = self._fragments.get(algorithm_id)
+        if cached is not None and cached[0] == version:
+            return cached
+        summary = {name: getattr(config, name) for name in SUMMARY_FIELDS}
+        summary_json = json.dumps(summary)
+        full_json = summary_json[:-1] + f', "algorithm_code": {json.dumps(config.algorithm_code)}}}'
+        fragment = (version, full_json, summary_json)
+        self._fragments[algorithm_id] = fragment
+        return fragment
+    
+    @staticmethod
+    def _validate_config(config: DeploymentConfig) -> bool:
         """Validate deployment configuration"""
         if not config.api_key:
             logger.error("API Key is required")
@@ -186,78 +628,436 @@ class AlgorithmExecutor:
             
         return True
     
-    def _execute_algorithm(self, config: DeploymentConfig, stop_flag: threading.Event):
-        """Execute algorithm in a separate thread"""
-        logger.info(f"Starting execution of algorithm: {config.algorithm_name}")
+    def _prepare_execution(self, config: DeploymentConfig):
+        """Write the enhanced algorithm to disk and set up its worker"""
+        # Create a temporary Python file with the algorithm code
+        temp_file = self._temp_file(config.algorithm_id)
+        
+        # Prepare the algorithm code with KiteConnect integration
+        enhanced_code = self._enhance_algorithm_code(config, self.instruments.db_path, self.market_data.buffer_name,
+                                                     self._indicator_state_file(config.algorithm_id),
+                                                     shared_sessions.root)
+        
+        with open(temp_file, 'w') as f:
+            f.write(enhanced_code)
+        
+        previous = self.workers.pop(config.algorithm_id, None)
+        if previous is not None:
+            previous.stop()
+        
+        if config.execution_mode == "worker":
+            # Broker calls from the worker are served with this process's pooled sessions
+            self.workers[config.algorithm_id] = AlgorithmWorker(config.algorithm_id, temp_file, rpc=True)
+    
+    def _cleanup_execution(self, algorithm_id: str):
+        """Stop the worker and remove the temporary algorithm file"""
+        worker = self.workers.pop(algorithm_id, None)
+        if worker is not None:
+            worker.stop()
+        
+        temp_file = self._temp_file(algorithm_id)
+        if os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+            except:
+                pass
+        
+        logger.info(f"Algorithm {algorithm_id} execution ended")
+    
+    def _temp_file(self, algorithm_id: str) -> str:
+        return f"temp_algorithm_{algorithm_id}.py"
+    
+    def _indicator_state_file(self, algorithm_id: str) -> str:
+        # Kept after the run ends so a redeployed algorithm resumes its indicators
+        return os.path.abspath(f"indicators_{algorithm_id}.pkl")
+    
+    def _execute_algorithm(self, algorithm_id: str) -> Optional[float]:
+        """Run one scheduled cycle of an algorithm.
+        
+        Returns the delay in seconds before the next run, or None to stop scheduling.
+        """
+        config = self.deployments.get(algorithm_id)
+        if config is None or config.status != "running":
+            return None
+        if self.leases is not None and not self.leases.holds(algorithm_id):
+            self._relinquish(algorithm_id)
+            return None
         
+        worker = self.workers.get(algorithm_id)
+        mode = "worker" if worker is not None else "subprocess"
+        started_at = datetime.datetime.now().isoformat()
+        started = time.perf_counter()
+        outcome, error = "error", None
         try:
-            # Create a temporary Python file with the algorithm code
-            temp_file = f"temp_algorithm_{config.algorithm_id}.py"
+            # Run the algorithm; trades and P&L follow the TradeResult records it reports
+            if worker is not None:
+                success, error = self._run_in_worker(config, worker)
+            else:
+                success, error = self._run_in_subprocess(config)
             
-            # Prepare the algorithm code with KiteConnect integration
-            enhanced_code = self._enhance_algorithm_code(config)
+            if success:
+                outcome = "ok"
+                logger.info(f"Algorithm {config.algorithm_name} executed successfully")
+            else:
+                outcome = "failed"
+                RUN_FAILURES.inc(deployment=algorithm_id, mode=mode)
+                logger.error(f"Algorithm {config.algorithm_name} failed: {error}")
+                self.logs.append(algorithm_id, f"Run failed: {error}")
             
-            with open(temp_file, 'w') as f:
-                f.write(enhanced_code)
-            
-            # Execute the algorithm
-            while not stop_flag.is_set():
-                try:
-                    # Run the algorithm
-                    result = subprocess.run(
-                        [sys.executable, temp_file],
-                        capture_output=True,
-                        text=True,
-                        timeout=300  # 5 minute timeout
-                    )
-                    
-                    if result.returncode == 0:
-                        logger.info(f"Algorithm {config.algorithm_name} executed successfully")
-                        logger.info(f"Output: {result.stdout}")
-                        
-                        # Update trade count and profit (mock for now)
-                        self.deployments[config.algorithm_id].trades += 1
-                        # In real implementation, parse the output to get actual P&L
-                        
-                    else:
-                        logger.error(f"Algorithm {config.algorithm_name} failed: {result.stderr}")
-                    
-                    # Wait before next execution (configurable interval)
-                    if not stop_flag.wait(60):  # Wait 1 minute between executions
-                        continue
-                    else:
-                        break
-                        
-                except subprocess.TimeoutExpired:
-                    logger.warning(f"Algorithm {config.algorithm_name} execution timed out")
-                except Exception as e:
-                    logger.error(f"Error executing algorithm {config.algorithm_name}: {e}")
-                    
-                # Wait before retry
-                if not stop_flag.wait(30):  # Wait 30 seconds before retry
-                    continue
-                else:
-                    break
-                    
+            # Wait before next execution (configurable interval)
+            return config.run_interval
+                
+        except subprocess.TimeoutExpired:
+            outcome = "timeout"
+            logger.warning(f"Algorithm {config.algorithm_name} execution timed out")
+            self.logs.append(algorithm_id, "Run timed out")
         except Exception as e:
-            logger.error(f"Fatal error in algorithm execution: {e}")
+            error = str(e)
+            logger.error(f"Error executing algorithm {config.algorithm_name}: {e}")
             logger.error(traceback.format_exc())
         finally:
-            # Cleanup
-            if os.path.exists(temp_file):
+            duration = time.perf_counter() - started
+            RUN_SECONDS.observe(duration, deployment=algorithm_id, mode=mode)
+            self.store.record_run(algorithm_id, started_at, duration, mode, outcome, error)
+        
+        # Wait before retry
+        RUN_FAILURES.inc(deployment=algorithm_id, mode=mode)
+        return config.retry_interval
+    
+    def _run_in_worker(self, config: DeploymentConfig, worker: AlgorithmWorker) -> Tuple[bool, Optional[str]]:
+        """Run one cycle in the persistent worker, (re)starting it if needed"""
+        if not worker.alive:
+            try:
+                load_output = worker.start(
+                    on_message=lambda message: self._handle_worker_message(config, message)
+                )
+            except WorkerError as e:
+                return False, str(e)
+            logger.info(f"Worker for {config.algorithm_name} loaded (pid {worker.process.pid})")
+            if load_output:
+                self.logs.append(config.algorithm_id, load_output)
+        
+        try:
+            result = worker.run(
+                timeout=300,  # 5 minute timeout
+                on_message=lambda message: self._handle_worker_message(config, message)
+            )
+        except WorkerError as e:
+            return False, str(e)
+        if result["output"]:
+            self.logs.append(config.algorithm_id, result['output'])
+        return result["ok"], result["error"]
+    
+    def _run_in_subprocess(self, config: DeploymentConfig) -> Tuple[bool, Optional[str]]:
+        """Run one cycle in a fresh interpreter, streaming its output and trade records"""
+        env = dict(os.environ)
+        if shared_sessions.root:
+            env[KITE_ROOT_ENV] = shared_sessions.root
+        read_fd = write_fd = None
+        if os.name == "posix":
+            # Dedicated pipe for JSON-lines TradeResult records
+            read_fd, write_fd = os.pipe()
+            env[RESULT_FD_ENV] = str(write_fd)
+        
+        try:
+            process = subprocess.Popen(
+                [sys.executable, self._temp_file(config.algorithm_id)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                env=env,
+                pass_fds=(write_fd,) if write_fd is not None else ()
+            )
+        except Exception:
+            if read_fd is not None:
+                os.close(read_fd)
+            raise
+        finally:
+            if write_fd is not None:
+                os.close(write_fd)
+        
+        reader = None
+        if read_fd is not None:
+            reader = threading.Thread(target=self._consume_results, args=(config, read_fd), daemon=True)
+            reader.start()
+        
+        timed_out = threading.Event()
+        def kill():
+            timed_out.set()
+            process.kill()
+        watchdog = threading.Timer(300, kill)  # 5 minute timeout
+        watchdog.start()
+        try:
+            for line in process.stdout:
+                self.logs.append(config.algorithm_id, line.rstrip("\n"))
+            returncode = process.wait()
+        finally:
+            watchdog.cancel()
+            if reader is not None:
+                reader.join(timeout=5)
+        
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(process.args, 300)
+        return returncode == 0, None if returncode == 0 else f"exit code {returncode}"
+    
+    def _consume_results(self, config: DeploymentConfig, read_fd: int):
+        """Read TradeResult and broker call records from a subprocess run as they are written"""
+        with os.fdopen(read_fd, 'r') as pipe:
+            for line in pipe:
                 try:
-                    os.remove(temp_file)
-                except:
-                    pass
-            
-            # Update status
-            if config.algorithm_id in self.deployments:
-                self.deployments[config.algorithm_id].status = "stopped"
-                self.save_deployments()
-            
-            logger.info(f"Algorithm {config.algorithm_name} execution ended")
+                    record = json.loads(line)
+                    if record.pop("type", "trade") == "call":
+                        self._record_call(config, record.get("method", ""), float(record.get("seconds") or 0.0),
+                                          error=bool(record.get("error")))
+                    else:
+                        self._record_trade(config, record)
+                except ValueError:
+                    logger.warning(f"Malformed result record from {config.algorithm_name}: {line!r}")
+    
+    def _record_call(self, config: DeploymentConfig, method: str, seconds: float, error: bool = False):
+        """Latency histogram and error counter for one broker call"""
+        if method not in BROKER_METHODS:
+            return
+        BROKER_CALL_SECONDS.observe(seconds, deployment=config.algorithm_id, method=method)
+        if error:
+            BROKER_CALL_ERRORS.inc(deployment=config.algorithm_id, method=method)
+    
+    def _record_trade(self, config: DeploymentConfig, record: Dict[str, Any]):
+        """Record a TradeResult; trades and realized P&L change only when the order has filled.
+        
+        A PLACED order is followed in the broker's order book and its record
+        updated with the filled quantity and average price once it is final.
+        """
+        trade = TradeResult(
+            order_id=str(record.get("order_id") or ""),
+            symbol=record.get("symbol", ""),
+            transaction_type=str(record.get("transaction_type", "")).upper(),
+            quantity=int(record.get("quantity") or 0),
+            price=float(record.get("price") or 0.0),
+            status=record.get("status", ""),
+            timestamp=record.get("timestamp") or datetime.datetime.now().isoformat(),
+            error=record.get("error")
+        )
+        if trade.status == "PENDING":
+            with self._trade_lock:
+                if self._late_orders.pop(trade.order_id, False):
+                    # The broker answered before the worker reported the order; its outcome is recorded
+                    return
+                self._late_orders[trade.order_id] = False
+        queue_latency = self.orders.queue_latency(trade.order_id) if trade.order_id else None
+        if queue_latency is not None:
+            trade.queue_latency_ms = round(queue_latency * 1000, 2)
+        
+        self.store.record_trade(config.algorithm_id, asdict(trade))
+        self.events.publish("trade", dict(asdict(trade), algorithm_id=config.algorithm_id))
+        logger.info(f"Trade {trade.status}: {trade.transaction_type} {trade.quantity} {trade.symbol} "
+                    f"@ {trade.price} (order {trade.order_id or '-'}, queued {trade.queue_latency_ms} ms)")
+        
+        if trade.status == "PLACED" and trade.order_id:
+            self.fills.watch(config.api_key, config.access_token, trade.order_id,
+                             lambda order: self._order_final(config, trade, order))
+        elif trade.status == "COMPLETE" and trade.error is None:
+            self._apply_fill(config, trade)
+    
+    def _order_final(self, config: DeploymentConfig, trade: TradeResult, order: Dict[str, Any]):
+        """Update a placed trade with the broker's final status, filled quantity and average price"""
+        filled = int(order.get("filled_quantity") or 0)
+        trade.status = order.get("status", trade.status)
+        trade.price = float(order.get("average_price") or 0.0)
+        if filled:
+            trade.quantity = filled
+        if trade.status == "REJECTED":
+            trade.error = order.get("status_message") or "Rejected"
+        self.store.update_trade(config.algorithm_id, trade.order_id, status=trade.status, price=trade.price,
+                                quantity=trade.quantity, error=trade.error)
+        self.events.publish("trade", dict(asdict(trade), algorithm_id=config.algorithm_id))
+        logger.info(f"Order {trade.order_id} {trade.status}: {trade.transaction_type} {filled} {trade.symbol} "
+                    f"@ {trade.price}")
+        # A cancelled order may have filled partly
+        if filled:
+            self._apply_fill(config, trade)
+    
+    def _apply_fill(self, config: DeploymentConfig, trade: TradeResult):
+        """Count a fill and realize its P&L against the deployment's position book"""
+        delta = 0.0
+        with self._trade_lock:
+            # A fill changes positions; don't wait for the next poll
+            self.positions.request_refresh(config.api_key, config.access_token)
+            config.trades += 1
+            if trade.price > 0:
+                book = self.position_books.setdefault(config.algorithm_id, PositionBook())
+                delta = book.apply(trade)
+                config.profit = round(config.profit + delta, 2)
+        self._persist(config, "trades", "profit")
+        self.events.publish("pnl", {
+            "algorithm_id": config.algorithm_id,
+            "profit": config.profit,
+            "delta": round(delta, 2),
+            "trades": config.trades
+        })
+    
+    def _resolve_pending_order(self, config: DeploymentConfig, params: Dict[str, Any], reference: str, future):
+        """Record the outcome of an order whose broker reply arrived after place_order stopped waiting.
+        
+        The worker records the order as PENDING under its gateway reference; that
+        row is updated in place with the broker's order id. If the outcome is known
+        before the PENDING row arrives, the outcome is recorded and the row dropped.
+        """
+        if future.cancelled():
+            return
+        record = {
+            "symbol": params.get("tradingsymbol", ""),
+            "transaction_type": params.get("transaction_type", ""),
+            "quantity": params.get("quantity", 0),
+        }
+        try:
+            record.update(order_id=str(future.result()), status="PLACED")
+            logger.warning(f"Pending order {reference} of {config.algorithm_id} was accepted as {record['order_id']}")
+        except Exception as e:
+            record.update(order_id="", status="FAILED", error=str(e))
+            logger.error(f"Pending order {reference} of {config.algorithm_id} failed: {e}")
+        with self._trade_lock:
+            pending_row = reference in self._late_orders
+            if pending_row:
+                del self._late_orders[reference]
+            else:
+                self._late_orders[reference] = True
+        if not pending_row:
+            self._record_trade(config, record)
+            return
+        
+        trade = TradeResult(
+            order_id=record["order_id"],
+            symbol=record["symbol"],
+            transaction_type=str(record["transaction_type"]).upper(),
+            quantity=int(record["quantity"] or 0),
+            price=0.0,
+            status=record["status"],
+            timestamp=datetime.datetime.now().isoformat(),
+            error=record.get("error")
+        )
+        queue_latency = self.orders.queue_latency(trade.order_id) if trade.order_id else None
+        if queue_latency is not None:
+            trade.queue_latency_ms = round(queue_latency * 1000, 2)
+        self.store.update_trade(config.algorithm_id, reference, order_id=trade.order_id, status=trade.status,
+                                error=trade.error, queue_latency_ms=trade.queue_latency_ms)
+        self.events.publish("trade", dict(asdict(trade), algorithm_id=config.algorithm_id))
+        if trade.status == "PLACED":
+            self.fills.watch(config.api_key, config.access_token, trade.order_id,
+                             lambda order: self._order_final(config, trade, order))
+    
+    def _is_exit(self, config: DeploymentConfig, symbol: str, transaction_type: str) -> bool:
+        """Whether an order reduces the deployment's open position in symbol"""
+        with self._trade_lock:
+            book = self.position_books.get(config.algorithm_id)
+            net = book.positions.get(symbol, (0, 0.0))[0] if book else 0
+        return (net > 0 and transaction_type == "SELL") or (net < 0 and transaction_type == "BUY")
+    
+    def close(self):
+        """Flush state, release leases, feeds, pollers and log files"""
+        self._stopping.set()
+        self.scheduler.shutdown(wait=False)
+        for worker in list(self.workers.values()):
+            worker.stop()
+        self.fills.close()
+        self.save_deployments()
+        if self.leases is not None:
+            self.leases.close()
+        self.store.close()
+        shared_sessions.remove_root_listener(self.market_data.set_root)
+        self.market_data.close()
+        self.positions.close()
+        self.orders.close()
+        self.logs.close()
+    
+    def get_trade_results(self, algorithm_id: str, before: Optional[int] = None,
+                          limit: int = 100) -> List[Dict[str, Any]]:
+        """TradeResult records reported by a deployment, newest first, paged by row id"""
+        return self.store.trades(algorithm_id, before, limit)
+    
+    def get_runs(self, algorithm_id: str, before: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """A deployment's runs (start, duration, mode, outcome), newest first, paged by row id"""
+        return self.store.runs(algorithm_id, before, limit)
+    
+    def query_deployments(self, status: Optional[str] = None, after: Optional[str] = None, limit: int = 100,
+                          include_code: bool = True) -> List[Dict[str, Any]]:
+        """One page of deployments by algorithm_id from the store's indexes"""
+        return self.store.deployments(status, after, limit, include_code)
+    
+    def _handle_worker_message(self, config: DeploymentConfig, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Handle a worker frame: broker calls, trade records and streamed output"""
+        if message.get("type") == "trade":
+            self._record_trade(config, message.get("record") or {})
+            return None
+        if message.get("type") == "output":
+            self.logs.append(config.algorithm_id, message.get('output', ''))
+            return None
+        if message.get("type") != "call":
+            return None
+        
+        method = message.get("method")
+        params = message.get("params") or {}
+        started = time.perf_counter()
+        try:
+            kite = shared_sessions.get(config.api_key, config.access_token)
+            if method == "profile":
+                result = kite.profile()
+            elif method in ("quote", "ltp"):
+                result = self.quotes.get(
+                    config.api_key, config.access_token,
+                    params.get("instruments", []),
+                    kind=method,
+                    purpose=params.get("purpose", "pricing")
+                )
+            elif method == "validate_symbol":
+                result = self.instruments.exists(params["instrument"])
+            elif method == "nearest_expiry":
+                result = self.instruments.nearest_expiry(
+                    params["underlying"],
+                    exchange=params.get("exchange", "NFO"),
+                    instrument_type=params.get("instrument_type", "FUT")
+                )
+            elif method == "subscribe_ticks":
+                result = self._subscribe_ticks(config, params.get("instruments", []))
+            elif method == "positions":
+                result = self.positions.positions(config.api_key, config.access_token)
+            elif method == "place_order":
+                if self.leases is not None and not self.leases.holds(config.algorithm_id):
+                    raise PermissionError(f"Node {self.node_id} no longer holds the lease on {config.algorithm_id}")
+                exit = params.pop("exit", None)
+                if exit is None:
+                    exit = self._is_exit(config, params.get("tradingsymbol", ""), params.get("transaction_type", ""))
+                result = self.orders.place(config.api_key, config.access_token, params, exit=bool(exit))
+                if isinstance(result, PendingOrder):
+                    # Sent, but the broker's reply is late: report it as pending, record the outcome later
+                    result.future.add_done_callback(
+                        lambda future, reference=result.reference: self._resolve_pending_order(
+                            config, params, reference, future))
+                    result = {"status": "PENDING", "reference": result.reference}
+            else:
+                raise ValueError(f"Unsupported broker call: {method}")
+            self._record_call(config, method, time.perf_counter() - started)
+            return {"op": "reply", "result": result}
+        except Exception as e:
+            self._record_call(config, method, time.perf_counter() - started, error=True)
+            return {"op": "reply", "error": str(e)}
+    
+    def _subscribe_ticks(self, config: DeploymentConfig, instruments: List[str]) -> Dict[str, Optional[int]]:
+        """Stream ticks for these instruments on the deployment's account"""
+        tokens = {}
+        for instrument in instruments:
+            record = self.instruments.lookup(instrument)
+            tokens[instrument] = record["instrument_token"] if record else None
+        
+        known = [token for token in tokens.values() if token is not None]
+        if known:
+            self.market_data.subscribe(config.api_key, config.access_token, known)
+        return tokens
     
-    def _enhance_algorithm_code(self, config: DeploymentConfig) -> str:
+    @staticmethod
+    def _enhance_algorithm_code(config: DeploymentConfig, instruments_db: str = "instruments.db",
+                                tick_buffer: str = "", indicator_state: str = "",
+                                kite_root: Optional[str] = None) -> str:
         """Enhance algorithm code with KiteConnect integration for REAL trading"""
         
         # Add imports and setup code for REAL trading
@@ -265,6 +1065,7 @@ class AlgorithmExecutor:
 import sys
 import os
 import json
+import time
 import datetime
 import logging
 from kiteconnect import KiteConnect
@@ -274,25 +1075,97 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Initialize KiteConnect for REAL trading
-kite = KiteConnect(api_key="{config.api_key}")
+kite = KiteConnect(api_key="{config.api_key}", root={kite_root!r})
 kite.set_access_token("{config.access_token}")
 
 # Global configuration
 MAX_POSITIONS = {config.max_positions}
 RISK_PER_TRADE = {config.risk_per_trade}
 
+# Set by a persistent worker when broker calls are routed through the executor
+_rpc = globals().get("_rpc")
+
+# Structured results: the worker channel, or a dedicated pipe in subprocess mode
+_emit = globals().get("_emit")
+_result_pipe = None
+if _emit is None and os.environ.get("{RESULT_FD_ENV}"):
+    try:
+        _result_pipe = os.fdopen(int(os.environ["{RESULT_FD_ENV}"]), "w", buffering=1)
+    except OSError:
+        _result_pipe = None
+_last_prices = {{}}
+
+def _report(kind, record):
+    """Send a structured record to the executor"""
+    if _emit:
+        _emit(kind, record)
+    elif _result_pipe:
+        _result_pipe.write(json.dumps(dict(record, type=kind)) + "\\n")
+
+def _kite_call(method, call, *args, **kwargs):
+    """A direct broker call, timed for the executor's metrics"""
+    started = time.perf_counter()
+    error = False
+    try:
+        return call(*args, **kwargs)
+    except Exception:
+        error = True
+        raise
+    finally:
+        try:
+            _report("call", {{"method": method, "seconds": time.perf_counter() - started, "error": error}})
+        except Exception:
+            pass
+
+def _emit_trade(order_id, symbol, transaction_type, quantity, status, error=None):
+    """Report a TradeResult record to the executor as it happens"""
+    record = {{
+        "order_id": order_id or "",
+        "symbol": symbol,
+        "transaction_type": str(transaction_type).upper(),
+        "quantity": quantity,
+        "price": _last_prices.get(symbol, 0.0),
+        "status": status,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "error": error,
+    }}
+    try:
+        _report("trade", record)
+    except Exception as e:
+        logger.error(f"Could not report trade result: {{e}}")
+
+# Local instrument master maintained by the executor
+INSTRUMENTS_DB = {os.path.abspath(instruments_db)!r}
+_instrument_store = None
+
+def _local_instruments():
+    """Open the instrument master directly when there is no executor channel"""
+    global _instrument_store
+    if _instrument_store is None:
+        try:
+            from instrument_store import InstrumentStore
+            _instrument_store = InstrumentStore(INSTRUMENTS_DB, preload=False)
+        except Exception as e:
+            logger.warning(f"Instrument master unavailable: {{e}}")
+            _instrument_store = False
+    return _instrument_store or None
+
 def get_positions():
     """Get current positions from Zerodha account"""
     try:
-        positions = kite.positions()
+        positions = _rpc("positions") if _rpc else _kite_call("positions", kite.positions)
         logger.info(f"Retrieved {{len(positions.get('net', []))}} net positions")
         return positions
     except Exception as e:
         logger.error(f"Error getting positions: {{e}}")
         return {{"net": [], "day": []}}
 
-def place_order(symbol, transaction_type, quantity, order_type="MARKET", product="MIS"):
-    """Place a REAL order using KiteConnect API"""
+def place_order(symbol, transaction_type, quantity, order_type="MARKET", product="MIS", exit=None):
+    """Place a REAL order using KiteConnect API
+    
+    In a worker, orders go through the executor's rate-limited gateway; exit=True sends it
+    ahead of queued entries (by default inferred from the open position).
+    """
     try:
         logger.info(f"🔥 PLACING REAL ORDER: {{transaction_type}} {{quantity}} {{symbol}} on NFO")
         
@@ -305,7 +1178,7 @@ def place_order(symbol, transaction_type, quantity, order_type="MARKET", product
             raise ValueError(f"Invalid transaction type: {{transaction_type}}")
         
         # Place REAL order on Zerodha
-        order_id = kite.place_order(
+        order_params = dict(
             variety=kite.VARIETY_REGULAR,
             exchange=kite.EXCHANGE_NFO,  # NFO for NIFTY futures
             tradingsymbol=symbol,
@@ -314,6 +1187,16 @@ def place_order(symbol, transaction_type, quantity, order_type="MARKET", product
             product=kite.PRODUCT_MIS,  # MIS for intraday
             order_type=kite.ORDER_TYPE_MARKET  # MARKET order for immediate execution
         )
+        if _rpc:
+            order_id = _rpc("place_order", exit=exit, **order_params)
+        else:
+            order_id = _kite_call("place_order", kite.place_order, **order_params)
+        
+        if isinstance(order_id, dict) and order_id.get("status") == "PENDING":
+            # Sent, but the broker has not answered yet: the order may be live, so it must not be retried
+            logger.warning(f"⏳ ORDER PENDING: {{transaction_type}} {{quantity}} {{symbol}} ({{order_id['reference']}})")
+            _emit_trade(order_id["reference"], symbol, transaction_type, quantity, "PENDING")
+            return order_id["reference"]
         
         logger.info(f"✅ REAL ORDER PLACED SUCCESSFULLY!")
         logger.info(f"   Order ID: {{order_id}}")
@@ -324,19 +1207,28 @@ def place_order(symbol, transaction_type, quantity, order_type="MARKET", product
         logger.info(f"   Product: MIS")
         logger.info(f"   Order Type: MARKET")
         
+        _emit_trade(order_id, symbol, transaction_type, quantity, "PLACED")
         return order_id
         
     except Exception as e:
         logger.error(f"❌ REAL ORDER FAILED: {{str(e)}}")
+        _emit_trade(None, symbol, transaction_type, quantity, "FAILED", str(e))
         # Log error but continue running as per requirements
         return None
 
-def get_quote(symbol):
-    """Get real market quote for a symbol"""
+def get_quote(symbol, purpose="pricing"):
+    """Get real market quote for a symbol
+    
+    purpose selects how stale a cached quote may be ("pricing" or "validation").
+    """
     try:
-        quote_data = kite.quote(f"NFO:{{symbol}}")
+        if _rpc:
+            quote_data = _rpc("quote", instruments=[f"NFO:{{symbol}}"], purpose=purpose)
+        else:
+            quote_data = _kite_call("quote", kite.quote, f"NFO:{{symbol}}")
         if f"NFO:{{symbol}}" in quote_data:
             quote = quote_data[f"NFO:{{symbol}}"]
+            _last_prices[symbol] = quote.get('last_price', 0.0)
             logger.info(f"📊 Real market data for {{symbol}}: LTP ₹{{quote.get('last_price', 'N/A')}}")
             return quote
         else:
@@ -380,12 +1272,108 @@ def check_market_status():
 def validate_symbol(symbol):
     """Validate if the trading symbol exists"""
     try:
-        quote = get_quote(symbol)
+        # Local lookup first; fall back to a quote if the master is not loaded yet
+        if _rpc:
+            known = _rpc("validate_symbol", instrument=f"NFO:{{symbol}}")
+        else:
+            store = _local_instruments()
+            known = store.exists(f"NFO:{{symbol}}") if store else None
+        if known is not None:
+            return known
+        
+        quote = get_quote(symbol, purpose="validation")
         return quote is not None
     except Exception as e:
         logger.error(f"Error validating symbol {{symbol}}: {{e}}")
         return False
 
+def get_nearest_future(underlying, exchange="NFO"):
+    """Trading symbol of the nearest unexpired future for an underlying, or None"""
+    try:
+        if _rpc:
+            contract = _rpc("nearest_expiry", underlying=underlying, exchange=exchange)
+        else:
+            store = _local_instruments()
+            contract = store.nearest_expiry(underlying, exchange) if store else None
+        return contract["tradingsymbol"] if contract else None
+    except Exception as e:
+        logger.error(f"Error resolving nearest future for {{underlying}}: {{e}}")
+        return None
+
+# Shared-memory tick buffer written by the executor's market data feed
+TICK_BUFFER_NAME = {tick_buffer!r}
+_tick_buffer = None
+_tick_tokens = {{}}
+
+def _ticks():
+    """Attach to the executor's tick buffer once"""
+    global _tick_buffer
+    if _tick_buffer is None:
+        try:
+            from market_data import TickBuffer
+            _tick_buffer = TickBuffer.attach(TICK_BUFFER_NAME) if TICK_BUFFER_NAME else False
+        except Exception as e:
+            logger.warning(f"Tick buffer unavailable: {{e}}")
+            _tick_buffer = False
+    return _tick_buffer or None
+
+def _tick_token(instrument):
+    """Instrument token for "EXCHANGE:SYMBOL", subscribing the feed on first use"""
+    if isinstance(instrument, int):
+        return instrument
+    if instrument not in _tick_tokens:
+        if _rpc:
+            token = _rpc("subscribe_ticks", instruments=[instrument]).get(instrument)
+        else:
+            store = _local_instruments()
+            record = store.lookup(instrument) if store else None
+            token = record["instrument_token"] if record else None
+        if token is None:
+            return None
+        _tick_tokens[instrument] = token
+    return _tick_tokens[instrument]
+
+def get_tick(instrument):
+    """Latest streamed tick (timestamp, last_price, volume, oi) without a network call"""
+    buffer, token = _ticks(), _tick_token(instrument)
+    if buffer is None or token is None:
+        return None
+    return buffer.latest(token)
+
+def get_ticks(instrument, count=100):
+    """Up to `count` most recent streamed ticks, oldest first"""
+    buffer, token = _ticks(), _tick_token(instrument)
+    if buffer is None or token is None:
+        return []
+    return buffer.history(token, count)
+
+def wait_for_tick(instrument, after=0, timeout=1.0):
+    """Block until a tick newer than sequence `after` arrives; returns the new sequence"""
+    buffer, token = _ticks(), _tick_token(instrument)
+    if buffer is None or token is None:
+        return after
+    return buffer.wait_for_update(token, after, timeout)
+
+# Incremental indicators (indicators.sma("fast", 10).update(price), ...) keep their
+# state across scheduled runs: in memory in a worker, and in this file between runs
+INDICATOR_STATE = {indicator_state!r}
+try:
+    import atexit
+    from indicators import Indicators
+    indicators = globals().get("indicators")
+    if not isinstance(indicators, Indicators):
+        # A worker re-running a script without main() keeps the instance it already has
+        indicators = Indicators.load(INDICATOR_STATE) if INDICATOR_STATE else Indicators()
+        atexit.register(indicators.save)
+except Exception as e:
+    logger.warning(f"Indicators unavailable: {{e}}")
+    indicators = None
+
+def _after_run():
+    """Called by a persistent worker after every run"""
+    if indicators is not None:
+        indicators.save()
+
 # Original algorithm code starts here:
 '''
         
@@ -423,6 +1411,35 @@ class AlgorithmAPI:
             "message": "Algorithm stopped successfully" if success else "Failed to stop algorithm"
         }
     
+    def deploy_many(self, requests_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Bulk deploy endpoint"""
+        configs, invalid = [], []
+        for request_data in requests_data:
+            try:
+                configs.append(DeploymentConfig(**request_data))
+            except Exception as e:
+                logger.error(f"Invalid deployment {request_data.get('algorithm_id')}: {e}")
+                invalid.append(request_data.get('algorithm_id'))
+        results = self.executor.deploy_algorithms(configs)
+        failed = invalid + [algorithm_id for algorithm_id, ok in results.items() if not ok]
+        return {
+            "success": not failed,
+            "message": f"Deployed {sum(results.values())} of {len(requests_data)} algorithms",
+            "results": results,
+            "failed": failed
+        }
+    
+    def stop_many(self, algorithm_ids: List[str]) -> Dict[str, Any]:
+        """Bulk stop endpoint"""
+        results = self.executor.stop_algorithms(algorithm_ids)
+        failed = [algorithm_id for algorithm_id, ok in results.items() if not ok]
+        return {
+            "success": not failed,
+            "message": f"Stopped {sum(results.values())} of {len(results)} algorithms",
+            "results": results,
+            "failed": failed
+        }
+    
     def status(self, algorithm_id: str) -> Dict[str, Any]:
         """Get algorithm status endpoint"""
         status = self.executor.get_deployment_status(algorithm_id)
@@ -441,7 +1458,13 @@ class AlgorithmAPI:
 
 def main():
     """Main function to run the executor service"""
-    executor = AlgorithmExecutor()
+    parser = argparse.ArgumentParser(description="Algorithm Executor Service")
+    parser.add_argument("--kite-root", default=None,
+                        help=f"Kite API base URL, e.g. a local paper exchange (default: ${KITE_ROOT_ENV} or api.kite.trade)")
+    args = parser.parse_args()
+    
+    executor = AlgorithmExecutor(kite_root=args.kite_root)
+    executor.resume_in_background()
     api = AlgorithmAPI(executor)
     
     logger.info("Algorithm Executor Service started")
@@ -453,10 +1476,11 @@ def main():
     except KeyboardInterrupt:
         logger.info("Shutting down Algorithm Executor Service")
         
-        # Stop all running algorithms
-        for algorithm_id in list(executor.deployments.keys()):
-            if executor.deployments[algorithm_id].status == "running":
-                executor.stop_algorithm(algorithm_id)
+        # Stop all running algorithms at once
+        executor.stop_algorithms([algorithm_id for algorithm_id, config in list(executor.deployments.items())
+                                  if config.status == "running"])
+        
+        executor.close()
 
 if __name__ == "__main__":
     main()
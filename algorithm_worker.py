@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Persistent Algorithm Worker
+Loads enhanced algorithm code once into a long-lived child process and
+runs its main() on every scheduled tick
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import socket
+import struct
+import secrets
+import logging
+import builtins
+import traceback
+import subprocess
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+WORKER_ADDRESS_ENV = "ALGO_WORKER_ADDRESS"
+WORKER_TOKEN_ENV = "ALGO_WORKER_TOKEN"
+WORKER_RPC_ENV = "ALGO_WORKER_RPC"
+CONNECT_TIMEOUT = 30  # seconds to wait for a spawned worker to dial back
+
+FRAME_HEADER = struct.Struct(">I")
+
+
+class WorkerError(Exception):
+    """Raised when a worker cannot be started or stops responding"""
+
+
+def encode_frame(message: Dict[str, Any]) -> bytes:
+    payload = json.dumps(message, default=str).encode("utf-8")
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+class FrameChannel:
+    """Length-prefixed JSON frames over a local socket"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+
+    def send(self, message: Dict[str, Any]):
+        self.sock.sendall(encode_frame(message))
+
+    def recv(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        self.sock.settimeout(timeout)
+        (length,) = FRAME_HEADER.unpack(self._read_exact(FRAME_HEADER.size))
+        return json.loads(self._read_exact(length).decode("utf-8"))
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def _read_exact(self, size: int) -> bytes:
+        chunks = []
+        while size:
+            chunk = self.sock.recv(size)
+            if not chunk:
+                raise ConnectionError("Worker channel closed")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+
+class AlgorithmWorker:
+    """Executor-side handle to a persistent worker process"""
+
+    def __init__(self, algorithm_id: str, code_path: str, rpc: bool = False):
+        self.algorithm_id = algorithm_id
+        self.code_path = code_path
+        self.rpc = rpc  # route the injected broker helpers through the executor
+        self.process: Optional[subprocess.Popen] = None
+        self.channel: Optional[FrameChannel] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None and self.channel is not None
+
+    def start(self, on_message: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None) -> str:
+        """Spawn the worker and wait until the algorithm module is loaded.
+
+        Returns any output produced while loading the module. Records the
+        module reported while loading (e.g. trades) are passed to on_message.
+        """
+        self.stop()
+        token = secrets.token_hex(16)
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            listener.bind(("127.0.0.1", 0))
+            listener.listen(1)
+            listener.settimeout(CONNECT_TIMEOUT)
+            host, port = listener.getsockname()
+
+            env = dict(os.environ)
+            env[WORKER_ADDRESS_ENV] = f"{host}:{port}"
+            env[WORKER_TOKEN_ENV] = token
+            env[WORKER_RPC_ENV] = "1" if self.rpc else ""
+            self.process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), self.code_path],
+                env=env,
+                stdin=subprocess.DEVNULL,
+            )
+
+            try:
+                sock, _ = listener.accept()
+            except socket.timeout:
+                raise WorkerError(f"Worker for {self.algorithm_id} did not connect")
+        finally:
+            listener.close()
+
+        self.channel = FrameChannel(sock)
+        try:
+            hello = self.channel.recv(timeout=CONNECT_TIMEOUT)
+            if hello.get("token") != token:
+                raise WorkerError("Worker handshake failed")
+            deadline = time.monotonic() + CONNECT_TIMEOUT
+            while True:
+                ready = self.channel.recv(timeout=max(0.0, deadline - time.monotonic()))
+                if ready.get("type") in ("ready", "error"):
+                    break
+                # Only ready/error are expected here; never mistake another frame for a failed load
+                logger.warning(f"Worker for {self.algorithm_id} sent a {ready.get('type')!r} frame while loading")
+                if on_message is not None:
+                    on_message(ready)
+        except (OSError, ValueError, ConnectionError) as e:
+            self.stop()
+            raise WorkerError(f"Worker for {self.algorithm_id} failed to start: {e}")
+
+        if ready.get("type") != "ready":
+            self.stop()
+            raise WorkerError(f"Algorithm failed to load:\n{ready.get('error', '')}")
+        if on_message is not None:
+            for message in ready.get("frames", ()):
+                on_message(message)
+        return ready.get("output", "")
+
+    def run(self, timeout: float,
+            on_message: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+        """Run one cycle of the algorithm and return the worker's 'done' frame.
+
+        Frames other than 'done' (such as broker 'call' frames) are passed to
+        on_message; a returned dict is sent back to the worker as the reply.
+        Raises subprocess.TimeoutExpired after killing the worker if the cycle
+        exceeds timeout.
+        """
+        if not self.alive:
+            raise WorkerError(f"Worker for {self.algorithm_id} is not running")
+
+        deadline = time.monotonic() + timeout
+        # stop() from another thread clears self.channel; the closed socket ends this loop
+        channel = self.channel
+        try:
+            channel.send({"op": "run"})
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout()
+                message = channel.recv(timeout=remaining)
+                if message.get("type") == "done":
+                    return message
+                reply = on_message(message) if on_message else None
+                if reply is not None:
+                    channel.send(reply)
+        except socket.timeout:
+            self.stop()
+            raise subprocess.TimeoutExpired(self.code_path, timeout)
+        except (OSError, ValueError, ConnectionError) as e:
+            self.stop()
+            raise WorkerError(f"Worker for {self.algorithm_id} died: {e}")
+
+    def stop(self, timeout: float = 5):
+        """Ask the worker to exit, killing it if it does not comply"""
+        if self.channel is not None:
+            try:
+                self.channel.send({"op": "shutdown"})
+            except OSError:
+                pass
+            self.channel.close()
+            self.channel = None
+
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+
+
+class _RunCapture(io.TextIOBase):
+    """Stand-in for stdout/stderr that buffers output of the current run.
+
+    Once more than `limit` characters are pending they are handed to
+    on_flush, so a chatty algorithm never holds its whole output in memory.
+    """
+
+    def __init__(self, on_flush: Optional[Callable[[str], None]] = None, limit: int = 8192):
+        self._buffer = io.StringIO()
+        self.on_flush = on_flush
+        self.limit = limit
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        written = self._buffer.write(text)
+        if self.on_flush is not None and self._buffer.tell() > self.limit:
+            self.on_flush(self.drain())
+        return written
+
+    def drain(self) -> str:
+        output = self._buffer.getvalue()
+        self._buffer = io.StringIO()
+        return output
+
+
+def _make_rpc(channel: FrameChannel, state: Dict[str, bool]) -> Callable[..., Any]:
+    """Build the _rpc(method, **params) hook injected into the algorithm"""
+    def call(method: str, **params):
+        if not state["running"]:
+            raise RuntimeError("Broker calls are only available while main() runs")
+        channel.send({"type": "call", "method": method, "params": params})
+        reply = channel.recv()
+        if reply.get("error"):
+            raise RuntimeError(reply["error"])
+        return reply.get("result")
+    return call
+
+
+def worker_main(code_path: str):
+    """Entry point of the worker process"""
+    host, port = os.environ[WORKER_ADDRESS_ENV].rsplit(":", 1)
+    channel = FrameChannel(socket.create_connection((host, int(port))))
+    channel.send({"token": os.environ.get(WORKER_TOKEN_ENV, "")})
+
+    # Everything the algorithm prints, including logging handlers it
+    # configures while loading, lands in the per-run capture buffer.
+    capture = _RunCapture()
+    sys.stdout = sys.stderr = capture
+
+    namespace: Dict[str, Any] = {
+        "__name__": "__algorithm__",
+        "__file__": code_path,
+        "__builtins__": builtins,
+    }
+    state = {"running": False, "ready": False}
+    if os.environ.get(WORKER_RPC_ENV):
+        namespace["_rpc"] = _make_rpc(channel, state)
+    # Records reported while the module loads travel in the "ready" frame
+    loading = []
+
+    def emit(kind: str, record: Dict[str, Any]):
+        """One-way structured records (e.g. TradeResult) for the executor"""
+        message = {"type": kind, "record": record}
+        if state["ready"]:
+            channel.send(message)
+        else:
+            loading.append(message)
+
+    namespace["_emit"] = emit
+    try:
+        with open(code_path, "r") as f:
+            code = compile(f.read(), code_path, "exec")
+        exec(code, namespace)
+    except BaseException:
+        channel.send({"type": "error", "error": traceback.format_exc(), "output": capture.drain()})
+        return
+    channel.send({"type": "ready", "output": capture.drain(), "frames": loading})
+    state["ready"] = True
+
+    entry = namespace.get("main")
+    while True:
+        try:
+            command = channel.recv()
+        except (OSError, ValueError, ConnectionError):
+            return
+
+        if command.get("op") == "shutdown":
+            return
+        if command.get("op") != "run":
+            continue
+
+        started = time.monotonic()
+        error = None
+        state["running"] = True
+        capture.on_flush = lambda text: channel.send({"type": "output", "output": text})
+        try:
+            if callable(entry):
+                entry()
+            else:
+                # Scripts without main() keep their run-as-a-script semantics
+                exec(code, dict(namespace, __name__="__main__"))
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                error = f"SystemExit: {e.code}"
+        except BaseException:
+            error = traceback.format_exc()
+        finally:
+            state["running"] = False
+            capture.on_flush = None
+            after_run = namespace.get("_after_run")
+            if callable(after_run):
+                try:
+                    after_run()
+                except Exception:
+                    logger.error(f"Post-run hook failed: {traceback.format_exc()}")
+
+        channel.send({
+            "type": "done",
+            "ok": error is None,
+            "error": error,
+            "output": capture.drain(),
+            "duration": time.monotonic() - started,
+        })
+
+
+if __name__ == "__main__":
+    worker_main(sys.argv[1])
@@ -4,24 +4,75 @@ Flask API Server for Algorithm Deployment
 Provides REST API endpoints for the frontend to manage algorithm deployments
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import json
 import os
 import threading
 import time
-from algorithm_executor import AlgorithmExecutor, AlgorithmAPI, DeploymentConfig
+import uuid
+import argparse
+from typing import Optional
+from algorithm_executor import AlgorithmAPI, DeploymentConfig
+from executor_shards import create_executor, SHARDS_ENV
+from deployment_store import DEPLOYMENT_STORE_ENV
+from deployment_leases import NODE_ID_ENV
+from kite_sessions import shared_sessions, KITE_ROOT_ENV
+from event_stream import sse_stream
+from deployment_logs import follow_stream
+from deploy_jobs import DeployJobs, DeployInProgress
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
-# Global executor instance
-executor = AlgorithmExecutor()
-api = AlgorithmAPI(executor)
+# Global executor instance, created by start_executor() once the command line has been applied
+shard_count = 0
+executor = None
+api: Optional[AlgorithmAPI] = None
+
+def start_executor(shards: Optional[int] = None):
+    """Create the one executor this process serves; EXECUTOR_SHARDS=N spreads deployments over N processes
+    
+    Reads the store, node id and Kite root from the environment and shared_sessions,
+    so call it after those are configured.
+    """
+    global shard_count, executor, api
+    if executor is not None:
+        raise RuntimeError("The executor has already been started")
+    shard_count = int(os.environ.get(SHARDS_ENV) or 0) if shards is None else shards
+    executor = create_executor(shard_count)
+    api = AlgorithmAPI(executor)
+    return executor
+
+# Deploys run here in the background; /api/deploy only queues them
+deploy_jobs = DeployJobs()
+
+# Distinguishes ETags issued by this process from those of an earlier run
+BOOT_ID = uuid.uuid4().hex[:8]
+
+def _include_code() -> bool:
+    """?include_code=false leaves algorithm_code out of the payload"""
+    return request.args.get('include_code', 'true').lower() not in ('0', 'false', 'no')
+
+def _versioned_response(version: int, variant: str, build_body):
+    """Answer 304 if the client already has this version, else the pre-serialized body"""
+    etag = f"{BOOT_ID}-{version}-{variant}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(build_body(), mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/deploy', methods=['POST'])
 def deploy_algorithm():
-    """Deploy an algorithm"""
+    """Deploy an algorithm
+    
+    Answers 202 with a job id once the request is well formed; credentials are
+    checked and the algorithm started in the background. Poll /api/jobs/<job_id>.
+    A different deploy of the same algorithm_id still in progress answers 409.
+    """
     try:
         data = request.get_json()
         
@@ -33,9 +84,37 @@ def deploy_algorithm():
                     'success': False,
                     'message': f'Missing required field: {field}'
                 }), 400
+        try:
+            DeploymentConfig(**data)
+        except TypeError as e:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid deployment: {str(e)}'
+            }), 400
         
-        result = api.deploy(data)
-        return jsonify(result)
+        try:
+            job, created = deploy_jobs.submit(data['algorithm_id'], lambda: api.deploy(data), request=data)
+        except DeployInProgress as e:
+            response = jsonify({
+                'success': False,
+                'message': f'{str(e)}; retry once it has finished',
+                'algorithm_id': data['algorithm_id'],
+                'job_id': e.job['job_id'],
+                'status': e.job['status']
+            })
+            response.status_code = 409
+            response.headers['Location'] = f"/api/jobs/{e.job['job_id']}"
+            return response
+        response = jsonify({
+            'success': True,
+            'message': 'Deployment accepted' if created else 'Deployment already in progress',
+            'algorithm_id': data['algorithm_id'],
+            'job_id': job['job_id'],
+            'status': job['status']
+        })
+        response.status_code = 202
+        response.headers['Location'] = f"/api/jobs/{job['job_id']}"
+        return response
         
     except Exception as e:
         return jsonify({
@@ -43,6 +122,14 @@ def deploy_algorithm():
             'message': f'Server error: {str(e)}'
         }), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_deploy_job(job_id):
+    """Status of a deploy job: queued, running, succeeded or failed"""
+    job = deploy_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+    return jsonify({'success': True, 'data': job})
+
 @app.route('/api/stop/<algorithm_id>', methods=['POST'])
 def stop_algorithm(algorithm_id):
     """Stop a running algorithm"""
@@ -55,12 +142,56 @@ def stop_algorithm(algorithm_id):
             'message': f'Server error: {str(e)}'
         }), 500
 
+@app.route('/api/bulk/deploy', methods=['POST'])
+def deploy_algorithms():
+    """Deploy many algorithms in one call: {"deployments": [<deploy body>, ...]}
+    
+    Each account's credentials are checked once and the algorithms start in
+    parallel; answers when all are done, with a result per algorithm_id.
+    """
+    try:
+        deployments = (request.get_json() or {}).get('deployments')
+        if not isinstance(deployments, list) or not all(isinstance(data, dict) for data in deployments):
+            return jsonify({
+                'success': False,
+                'message': 'deployments must be a list of deployment objects'
+            }), 400
+        return jsonify(api.deploy_many(deployments))
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Server error: {str(e)}'
+        }), 500
+
+@app.route('/api/bulk/stop', methods=['POST'])
+def stop_algorithms():
+    """Stop many algorithms in one call: {"algorithm_ids": [...]}"""
+    try:
+        algorithm_ids = (request.get_json() or {}).get('algorithm_ids')
+        if not isinstance(algorithm_ids, list) or not all(isinstance(item, str) for item in algorithm_ids):
+            return jsonify({
+                'success': False,
+                'message': 'algorithm_ids must be a list of strings'
+            }), 400
+        return jsonify(api.stop_many(algorithm_ids))
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Server error: {str(e)}'
+        }), 500
+
 @app.route('/api/status/<algorithm_id>', methods=['GET'])
 def get_algorithm_status(algorithm_id):
     """Get status of a specific algorithm"""
     try:
-        result = api.status(algorithm_id)
-        return jsonify(result)
+        include_code = _include_code()
+        version, data = executor.serialized_deployment(algorithm_id, include_code)
+        if data is None:
+            return jsonify({'success': False, 'data': None})
+        return _versioned_response(
+            version, f"{algorithm_id}-{int(include_code)}",
+            lambda: f'{{"success": true, "data": {data}}}'
+        )
     except Exception as e:
         return jsonify({
             'success': False,
@@ -69,40 +200,114 @@ def get_algorithm_status(algorithm_id):
 
 @app.route('/api/deployments', methods=['GET'])
 def list_deployments():
-    """List all deployments"""
+    """List all deployments
+    
+    ?status=<status>, ?after=<algorithm_id> or ?limit=<n> return one page from the store's
+    indexes instead; pass the returned next_after as the next after.
+    """
     try:
-        result = api.list_all()
-        return jsonify(result)
+        include_code = _include_code()
+        if any(name in request.args for name in ('status', 'after', 'limit')):
+            limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+            page = executor.query_deployments(request.args.get('status'), request.args.get('after'),
+                                              limit, include_code)
+            return jsonify({
+                'success': True,
+                'data': page,
+                'next_after': page[-1]['algorithm_id'] if len(page) == limit else None
+            })
+        version, data = executor.serialized_deployments(include_code)
+        return _versioned_response(
+            version, f"all-{int(include_code)}",
+            lambda: f'{{"success": true, "data": {data}}}'
+        )
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'Server error: {str(e)}'
         }), 500
 
+def _history_page(fetch, algorithm_id):
+    """Newest-first page of runs or trades; ?before=<id>&limit=<n>, continue with next_before"""
+    try:
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+        rows = fetch(algorithm_id, request.args.get('before', type=int), limit)
+        return jsonify({
+            'success': True,
+            'data': rows,
+            'next_before': rows[-1]['id'] if len(rows) == limit else None
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Server error: {str(e)}'
+        }), 500
+
+@app.route('/api/trades/<algorithm_id>', methods=['GET'])
+def get_algorithm_trades(algorithm_id):
+    """TradeResult records of a deployment, newest first"""
+    return _history_page(executor.get_trade_results, algorithm_id)
+
+@app.route('/api/runs/<algorithm_id>', methods=['GET'])
+def get_algorithm_runs(algorithm_id):
+    """Runs of a deployment (start, duration, mode, outcome), newest first"""
+    return _history_page(executor.get_runs, algorithm_id)
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """Server-sent events: deployment status, trade and pnl updates as they happen"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription = executor.events.subscribe(int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+    return Response(
+        sse_stream(subscription),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of broker call, run, scheduler and store metrics"""
+    return Response(executor.render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'success': True,
         'message': 'Algorithm Executor API is running',
-        'active_deployments': len([d for d in executor.deployments.values() if d.status == 'running'])
+        'active_deployments': executor.running_count()
     })
 
 @app.route('/api/logs/<algorithm_id>', methods=['GET'])
 def get_algorithm_logs(algorithm_id):
-    """Get logs for a specific algorithm"""
+    """Get logs for a specific algorithm
+    
+    ?since=<offset>&limit=<n> reads a window (default: the last 200 lines); pass the
+    returned next_offset as the next since. ?follow=true streams new lines as server-sent events.
+    """
     try:
-        # Read logs from file (if exists)
-        log_file = f'algorithm_{algorithm_id}.log'
-        if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                logs = f.read()
-        else:
-            logs = "No logs available"
+        since = request.args.get('since', type=int)
+        if request.args.get('follow', 'false').lower() in ('1', 'true', 'yes'):
+            log = executor.logs.get(algorithm_id, create=False)
+            if log is None:
+                return jsonify({'success': False, 'message': f'No logs for algorithm {algorithm_id}'}), 404
+            last_event_id = request.headers.get('Last-Event-ID')
+            if last_event_id and last_event_id.isdigit():
+                since = int(last_event_id) + 1
+            return Response(
+                follow_stream(log, since),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
         
+        limit = min(max(request.args.get('limit', 200, type=int), 0), 5000)
+        page = executor.logs.read(algorithm_id, since, limit)
         return jsonify({
             'success': True,
-            'logs': logs
+            'logs': "\n".join(line['text'] for line in page['lines']) or "No logs available",
+            'lines': page['lines'],
+            'first_offset': page['first_offset'],
+            'next_offset': page['next_offset']
         })
     except Exception as e:
         return jsonify({
@@ -124,12 +329,11 @@ def test_api_connection():
                 'message': 'API Key and Access Token are required'
             }), 400
         
-        from kiteconnect import KiteConnect
-        kite = KiteConnect(api_key=api_key)
-        kite.set_access_token(access_token)
+        kite = shared_sessions.get(api_key, access_token)
         
-        # Test connection by getting profile
+        # Test connection by getting profile; a deploy on the same token today skips the check
         profile = kite.profile()
+        shared_sessions.remember_profile(api_key, access_token, profile)
         
         return jsonify({
             'success': True,
@@ -158,16 +362,14 @@ def get_positions():
                 'message': 'API Key and Access Token are required'
             }), 400
         
-        from kiteconnect import KiteConnect
-        kite = KiteConnect(api_key=api_key)
-        kite.set_access_token(access_token)
-        
-        # Get positions
-        positions = kite.positions()
+        # Shared snapshot, polled once per account in the background
+        snapshot = executor.positions.get(api_key, access_token)
         
         return jsonify({
             'success': True,
-            'positions': positions
+            'positions': snapshot['positions'],
+            'margins': snapshot['margins'],
+            'updated_at': snapshot['updated_at']
         })
         
     except Exception as e:
@@ -180,13 +382,11 @@ def run_background_monitor():
     """Background thread to monitor deployments"""
     while True:
         try:
-            # Update deployment statuses
-            for deployment_id, deployment in executor.deployments.items():
-                if deployment.status == 'running':
-                    # Check if thread is still alive
-                    if deployment_id not in executor.running_threads or not executor.running_threads[deployment_id].is_alive():
-                        deployment.status = 'stopped'
-                        executor.save_deployments()
+            # Mark deployments the scheduler no longer knows about as stopped
+            executor.reconcile()
+            
+            # Close Kite sessions nobody has used for a while
+            shared_sessions.evict_idle()
             
             time.sleep(10)  # Check every 10 seconds
         except Exception as e:
@@ -194,19 +394,58 @@ def run_background_monitor():
             time.sleep(30)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Algorithm Executor API Server")
+    parser.add_argument('--kite-root', default=None,
+                        help=f"Kite API base URL (default: ${KITE_ROOT_ENV} or api.kite.trade)")
+    parser.add_argument('--paper', action='store_true',
+                        help="Start a local paper exchange and send every Kite call to it")
+    parser.add_argument('--shards', type=int, default=None,
+                        help=f"Run deployments in N executor processes, 0 for in-process (default: ${SHARDS_ENV} or 0)")
+    parser.add_argument('--store', default=None,
+                        help=f"Deployment store path; nodes sharing one store coordinate (default: ${DEPLOYMENT_STORE_ENV} or deployments.db)")
+    parser.add_argument('--node-id', default=None,
+                        help=f"Name of this node; enables lease-based ownership of deployments (default: ${NODE_ID_ENV})")
+    args = parser.parse_args()
+    
+    # The executor (and any shard process) reads these when it is created below
+    if args.store:
+        os.environ[DEPLOYMENT_STORE_ENV] = args.store
+    if args.node_id:
+        os.environ[NODE_ID_ENV] = args.node_id
+    
+    if args.paper:
+        from kite_stub_server import start_stub_server
+        paper_exchange = start_stub_server(port=8765, tick_interval=0.25)
+        args.kite_root = paper_exchange.root
+    if args.kite_root:
+        shared_sessions.set_root(args.kite_root)
+    # Only now, with the store, node id, shards and Kite root applied, does anything get scheduled
+    start_executor(args.shards)
+    
     # Start background monitoring thread
     monitor_thread = threading.Thread(target=run_background_monitor, daemon=True)
     monitor_thread.start()
     
     print("Starting Algorithm Executor API Server...")
+    print(f"Kite API: {shared_sessions.root or 'https://api.kite.trade'}")
+    print(f"Executor: {f'{shard_count} shard processes' if shard_count > 0 else 'in-process'}")
+    if os.environ.get(NODE_ID_ENV):
+        print(f"Node: {os.environ[NODE_ID_ENV]} (deployments leased through {os.environ.get(DEPLOYMENT_STORE_ENV) or 'deployments.db'})")
     print("API endpoints available at:")
-    print("  POST /api/deploy - Deploy algorithm")
+    print("  POST /api/deploy - Deploy algorithm (202 with a job id)")
+    print("  GET  /api/jobs/<job_id> - Deploy job status")
     print("  POST /api/stop/<id> - Stop algorithm")
+    print("  POST /api/bulk/deploy - Deploy many algorithms")
+    print("  POST /api/bulk/stop - Stop many algorithms")
     print("  GET  /api/status/<id> - Get algorithm status")
     print("  GET  /api/deployments - List all deployments")
+    print("  GET  /api/trades/<id> - Trade history")
+    print("  GET  /api/runs/<id> - Run history")
+    print("  GET  /api/events - Stream deployment events (SSE)")
+    print("  GET  /api/metrics - Prometheus metrics")
     print("  GET  /api/health - Health check")
     print("  POST /api/test-connection - Test API connection")
     print("  POST /api/positions - Get positions")
     
     # Run Flask app
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
@@ -9,6 +9,11 @@ class ZerodhaApp {
         this.currentAlgorithm = null;
         this.isConnected = false;
         this.logs = [];
+        this.eventSource = null;
+        // Set while the event stream is interrupted; deployments are polled only then
+        this.eventStreamDown = false;
+        // Polling timers, the fallback while deployment events are unavailable
+        this.monitoringIntervals = {};
         
         this.init();
         this.createDefaultAlgorithms();
@@ -21,6 +26,10 @@ class ZerodhaApp {
         this.loadAlgorithms();
         this.loadDeployments();
         this.updateConnectionStatus();
+        this.connectEventStream();
+        if (!this.eventSource) {
+            this.resumeMonitoring();
+        }
         this.log('System initialized successfully', 'info');
         
         // Auto-connect if we have valid credentials
@@ -147,13 +156,19 @@ class ZerodhaApp {
             redirectUrl: document.getElementById('redirectUrl').value.trim(),
             maxPositions: parseInt(document.getElementById('maxPositions').value) || 10,
             riskPerTrade: parseFloat(document.getElementById('riskPerTrade').value) || 2.0,
-            autoTrade: document.getElementById('autoTrade').checked
+            autoTrade: document.getElementById('autoTrade').checked,
+            executorUrl: document.getElementById('executorUrl').value.trim().replace(/\/+$/, '')
         };
 
+        const executorChanged = settings.executorUrl !== this.settings.executorUrl;
         this.settings = settings;
         localStorage.setItem('settings', JSON.stringify(settings));
         this.log('Settings saved successfully', 'success', settings);
         this.showNotification('Settings saved successfully!', 'success');
+
+        if (executorChanged) {
+            this.reconnectEventStream();
+        }
         
         // Auto-connect after saving if we have the required credentials
         if (settings.apiKey && settings.accessToken) {
@@ -178,6 +193,7 @@ class ZerodhaApp {
             document.getElementById('maxPositions').value = this.settings.maxPositions || 10;
             document.getElementById('riskPerTrade').value = this.settings.riskPerTrade || 2;
             document.getElementById('autoTrade').checked = this.settings.autoTrade || false;
+            document.getElementById('executorUrl').value = this.settings.executorUrl || '';
             
             this.log('Settings loaded from localStorage', 'success');
         } else {
@@ -1250,54 +1266,134 @@ Local file:// URLs will NOT work.
         }
     }
 
+    // One server-sent event stream replaces per-deployment polling timers
+    connectEventStream() {
+        if (this.eventSource || typeof EventSource === 'undefined') {
+            return;
+        }
+
+        const baseUrl = this.executorUrl();
+        this.eventSource = new EventSource(`${baseUrl}/api/events`);
+
+        this.eventSource.addEventListener('status', (e) => this.applyDeploymentEvent('status', JSON.parse(e.data)));
+        this.eventSource.addEventListener('trade', (e) => this.applyDeploymentEvent('trade', JSON.parse(e.data)));
+        this.eventSource.addEventListener('pnl', (e) => this.applyDeploymentEvent('pnl', JSON.parse(e.data)));
+        this.eventSource.onopen = () => {
+            this.log('Connected to deployment event stream', 'info', { baseUrl });
+            // Events carry status, trades and P&L again; polling is no longer needed
+            this.eventStreamDown = false;
+            Object.keys(this.monitoringIntervals).forEach(deploymentId => this.stopMonitoring(deploymentId));
+        };
+        // EventSource reconnects on its own and resumes from the last event id; poll until it does
+        this.eventSource.onerror = () => {
+            if (this.eventStreamDown) {
+                return;
+            }
+            this.log('Deployment event stream interrupted, polling until it reconnects', 'warning');
+            this.eventStreamDown = true;
+            this.resumeMonitoring();
+        };
+    }
+
+    shouldPoll() {
+        return !this.eventSource || this.eventStreamDown;
+    }
+
+    executorUrl() {
+        return this.settings.executorUrl || 'http://localhost:5000';
+    }
+
+    reconnectEventStream() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+        this.eventStreamDown = false;
+        this.connectEventStream();
+    }
+
+    applyDeploymentEvent(type, data) {
+        const deployment = this.deployments[data.algorithm_id];
+        if (!deployment) {
+            return;
+        }
+
+        if (type === 'status') {
+            deployment.status = data.status;
+            this.log(`Deployment ${data.algorithm_id} is now ${data.status}`, 'info', data);
+        } else if (type === 'trade') {
+            this.log(`Trade ${data.status}: ${data.transaction_type} ${data.quantity} ${data.symbol}`,
+                     data.error ? 'error' : 'success', data);
+            return;
+        } else if (type === 'pnl') {
+            deployment.profit = data.profit;
+            deployment.trades = data.trades;
+        }
+
+        localStorage.setItem('deployments', JSON.stringify(this.deployments));
+        this.loadDeployments();
+    }
+
     startPositionMonitoring(deploymentId, orderId) {
         this.log('Starting position monitoring', 'info', { deploymentId, orderId });
-        
-        // Monitor the position and update P&L
-        const interval = setInterval(async () => {
-            try {
-                const deployment = this.deployments[deploymentId];
-                if (!deployment || deployment.status !== 'running') {
-                    this.log('Stopping position monitoring - deployment not running', 'info');
-                    clearInterval(interval);
-                    return;
-                }
 
-                // Get real positions and update P&L
-                await this.updateDeploymentPnL(deploymentId);
-                
-            } catch (error) {
-                this.log('Position monitoring error', 'error', { error: error.message });
-            }
-        }, 30000); // Update every 30 seconds
+        // Initial P&L from positions; later changes arrive on the event stream
+        this.updateDeploymentPnL(deploymentId);
+        this.connectEventStream();
 
-        // Store interval ID for cleanup
-        this.deployments[deploymentId].monitoringInterval = interval;
+        // Poll positions only while the event stream is unavailable
+        this.startMonitoring(deploymentId, 30000, () => this.updateDeploymentPnL(deploymentId));
     }
 
     startCustomAlgorithmMonitoring(deploymentId) {
         this.log('Starting custom algorithm monitoring', 'info', { deploymentId });
-        
-        // For custom algorithms, just keep the deployment active
-        const interval = setInterval(async () => {
+
+        // Status, trades and P&L arrive on the event stream
+        this.connectEventStream();
+
+        // Custom algorithms run continuously; check on them while the event stream is unavailable
+        this.startMonitoring(deploymentId, 60000, () => {
+            this.log('Custom algorithm still running', 'info', { deploymentId });
+        });
+    }
+
+    // Polling fallback while the event stream is unavailable
+    startMonitoring(deploymentId, intervalMs, tick) {
+        this.stopMonitoring(deploymentId);
+        if (!this.shouldPoll()) {
+            return;
+        }
+
+        this.monitoringIntervals[deploymentId] = setInterval(async () => {
             try {
                 const deployment = this.deployments[deploymentId];
-                if (!deployment || deployment.status !== 'running') {
-                    this.log('Stopping custom algorithm monitoring', 'info');
-                    clearInterval(interval);
+                if (!deployment || deployment.status !== 'running' || !this.shouldPoll()) {
+                    this.log('Stopping deployment monitoring', 'info', { deploymentId });
+                    this.stopMonitoring(deploymentId);
                     return;
                 }
 
-                // Keep deployment active (custom algorithms run continuously)
-                this.log('Custom algorithm still running', 'info', { deploymentId });
-                
+                await tick();
+
             } catch (error) {
-                this.log('Custom algorithm monitoring error', 'error', { error: error.message });
+                this.log('Deployment monitoring error', 'error', { error: error.message });
             }
-        }, 60000); // Check every minute
+        }, intervalMs);
+    }
+
+    resumeMonitoring() {
+        // Poll every running deployment, e.g. after a reload without an event stream
+        Object.values(this.deployments)
+            .filter(deployment => deployment.status === 'running')
+            .forEach(deployment => this.startMonitoring(deployment.id, 30000,
+                () => this.updateDeploymentPnL(deployment.id)));
+    }
 
-        // Store interval ID for cleanup
-        this.deployments[deploymentId].monitoringInterval = interval;
+    stopMonitoring(deploymentId) {
+        if (this.monitoringIntervals[deploymentId]) {
+            clearInterval(this.monitoringIntervals[deploymentId]);
+            delete this.monitoringIntervals[deploymentId];
+        }
     }
 
     async updateDeploymentPnL(deploymentId) {
@@ -1355,12 +1451,7 @@ Local file:// URLs will NOT work.
         this.log('Stopping deployment', 'info', { deploymentId });
         
         if (confirm('Are you sure you want to stop this deployment?')) {
-            // Clear monitoring interval if exists
-            const deployment = this.deployments[deploymentId];
-            if (deployment && deployment.monitoringInterval) {
-                clearInterval(deployment.monitoringInterval);
-            }
-            
+            this.stopMonitoring(deploymentId);
             delete this.deployments[deploymentId];
             localStorage.setItem('deployments', JSON.stringify(this.deployments));
             this.loadDeployments();
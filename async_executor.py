@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+"""
+Asyncio Algorithm Executor
+Event-loop alternative to the threaded AlgorithmExecutor: every deployment
+is a coroutine and broker calls go through a non-blocking HTTP client
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import secrets
+import argparse
+import datetime
+import logging
+from collections import deque
+from typing import Dict, Any, Deque, Optional, Set, Tuple, List, Callable, Awaitable
+from dataclasses import asdict
+
+import aiohttp
+from kiteconnect import KiteConnect
+
+import algorithm_worker
+from algorithm_worker import (
+    FRAME_HEADER, CONNECT_TIMEOUT, WORKER_ADDRESS_ENV, WORKER_TOKEN_ENV, WORKER_RPC_ENV,
+    WorkerError, encode_frame,
+)
+from algorithm_executor import AlgorithmExecutor, DeploymentConfig, PositionBook, TradeResult
+from instrument_store import InstrumentStore
+from market_data import MarketDataHub
+from order_fills import FINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Overridden by $KITE_API_ROOT, e.g. to trade against a local paper exchange
+KITE_API_ROOT = os.environ.get("KITE_API_ROOT") or "https://api.kite.trade"
+
+# Seconds between order status checks of a placed order, and how long to keep checking
+FILL_POLL_INTERVAL = 1.0
+FILL_MAX_AGE = 86400.0
+
+
+class KiteAPIError(Exception):
+    """Error envelope returned by the Kite REST API"""
+
+    def __init__(self, message: str, error_type: str = "GeneralException", status: int = 0):
+        super().__init__(message)
+        self.error_type = error_type
+        self.status = status
+
+
+class AsyncKiteClient:
+    """Minimal non-blocking client for the Kite endpoints the executor uses"""
+
+    def __init__(self, api_key: str, access_token: str, root: str = KITE_API_ROOT,
+                 session: Optional[aiohttp.ClientSession] = None, timeout: float = 7.0):
+        self.api_key = api_key
+        self.access_token = access_token
+        self.root = root.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = session
+        self._owns_session = session is None
+        self._headers = {
+            "X-Kite-Version": "3",
+            "Authorization": f"token {api_key}:{access_token}",
+        }
+
+    async def profile(self) -> Dict[str, Any]:
+        return await self._request("GET", "/user/profile")
+
+    async def quote(self, *instruments: str) -> Dict[str, Any]:
+        return await self._request("GET", "/quote", params=[("i", i) for i in instruments])
+
+    async def ltp(self, *instruments: str) -> Dict[str, Any]:
+        return await self._request("GET", "/quote/ltp", params=[("i", i) for i in instruments])
+
+    async def positions(self) -> Dict[str, Any]:
+        return await self._request("GET", "/portfolio/positions")
+
+    async def place_order(self, variety: str, **params) -> str:
+        data = {k: str(v) for k, v in params.items() if v is not None}
+        result = await self._request("POST", f"/orders/{variety}", data=data)
+        return result["order_id"]
+
+    async def order_history(self, order_id: str) -> List[Dict[str, Any]]:
+        return await self._request("GET", f"/orders/{order_id}")
+
+    async def close(self):
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+        self._session = None
+
+    async def _request(self, method: str, route: str, params=None, data=None) -> Any:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+            self._owns_session = True
+
+        async with self._session.request(method, self.root + route, params=params, data=data,
+                                         headers=self._headers) as response:
+            body = await response.json(content_type=None)
+
+        if response.status >= 400 or body.get("status") == "error":
+            raise KiteAPIError(body.get("message", f"HTTP {response.status}"),
+                               body.get("error_type", "GeneralException"), response.status)
+        return body["data"]
+
+
+class AsyncAlgorithmWorker:
+    """asyncio counterpart of algorithm_worker.AlgorithmWorker"""
+
+    def __init__(self, algorithm_id: str, code_path: str):
+        self.algorithm_id = algorithm_id
+        self.code_path = code_path
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None and self.writer is not None
+
+    async def start(self, on_message: Optional[Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]] = None) -> str:
+        """Spawn the worker and wait for the algorithm to load; records reported meanwhile go to on_message"""
+        await self.stop()
+        token = secrets.token_hex(16)
+        connected: asyncio.Future = asyncio.get_running_loop().create_future()
+
+        def on_connect(reader, writer):
+            if connected.done():
+                writer.close()
+            else:
+                connected.set_result((reader, writer))
+
+        server = await asyncio.start_server(on_connect, "127.0.0.1", 0)
+        try:
+            host, port = server.sockets[0].getsockname()[:2]
+            env = dict(os.environ)
+            env[WORKER_ADDRESS_ENV] = f"{host}:{port}"
+            env[WORKER_TOKEN_ENV] = token
+            env[WORKER_RPC_ENV] = "1"
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.abspath(algorithm_worker.__file__), self.code_path,
+                env=env, stdin=asyncio.subprocess.DEVNULL,
+            )
+            self.reader, self.writer = await asyncio.wait_for(connected, CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            await self.stop()
+            raise WorkerError(f"Worker for {self.algorithm_id} did not connect")
+        finally:
+            server.close()
+
+        try:
+            hello = await self._recv(CONNECT_TIMEOUT)
+            if hello.get("token") != token:
+                raise WorkerError("Worker handshake failed")
+            deadline = time.monotonic() + CONNECT_TIMEOUT
+            while True:
+                ready = await self._recv(max(0.0, deadline - time.monotonic()))
+                if ready.get("type") in ("ready", "error"):
+                    break
+                logger.warning(f"Worker for {self.algorithm_id} sent a {ready.get('type')!r} frame while loading")
+                if on_message is not None:
+                    await on_message(ready)
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            await self.stop()
+            raise WorkerError(f"Worker for {self.algorithm_id} failed to start: {e}")
+
+        if ready.get("type") != "ready":
+            await self.stop()
+            raise WorkerError(f"Algorithm failed to load:\n{ready.get('error', '')}")
+        if on_message is not None:
+            for message in ready.get("frames", ()):
+                await on_message(message)
+        return ready.get("output", "")
+
+    async def run(self, timeout: float,
+                  on_message: Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]) -> Dict[str, Any]:
+        """Run one cycle; raises asyncio.TimeoutError after killing the worker on timeout"""
+        if not self.alive:
+            raise WorkerError(f"Worker for {self.algorithm_id} is not running")
+
+        deadline = time.monotonic() + timeout
+        try:
+            await self._send({"op": "run"})
+            while True:
+                message = await self._recv(max(0.0, deadline - time.monotonic()))
+                if message.get("type") == "done":
+                    return message
+                reply = await on_message(message)
+                if reply is not None:
+                    await self._send(reply)
+        except asyncio.TimeoutError:
+            await self.stop(kill=True)
+            raise
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            await self.stop()
+            raise WorkerError(f"Worker for {self.algorithm_id} died: {e}")
+
+    async def stop(self, timeout: float = 5, kill: bool = False):
+        if self.writer is not None:
+            if not kill:
+                try:
+                    await self._send({"op": "shutdown"})
+                except OSError:
+                    pass
+            self.writer.close()
+            self.writer = self.reader = None
+
+        if self.process is not None:
+            if kill and self.process.returncode is None:
+                self.process.kill()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+            self.process = None
+
+    async def _send(self, message: Dict[str, Any]):
+        self.writer.write(encode_frame(message))
+        await self.writer.drain()
+
+    async def _recv(self, timeout: float) -> Dict[str, Any]:
+        async def read():
+            (length,) = FRAME_HEADER.unpack(await self.reader.readexactly(FRAME_HEADER.size))
+            return json.loads((await self.reader.readexactly(length)).decode("utf-8"))
+        return await asyncio.wait_for(read(), timeout)
+
+
+class AsyncAlgorithmExecutor:
+    """Runs deployments as coroutines on a single event loop.
+
+    Algorithms always execute in persistent workers with their broker helpers
+    (get_quote, get_positions, place_order) routed back to this executor, so
+    no thread ever blocks on the network. Symbol checks and nearest-expiry
+    lookups are served from the local instrument master, and streamed ticks
+    from a shared tick buffer, as in the threaded executor. Deployment state
+    and the most recent trades are kept in memory; as in the threaded
+    executor, trades and realized P&L change only when an order fills.
+    """
+
+    def __init__(self, root: str = KITE_API_ROOT, max_connections: int = 100,
+                 instruments_db: str = "instruments.db"):
+        self.root = root
+        self.deployments: Dict[str, DeploymentConfig] = {}
+        self.clients: Dict[Tuple[str, str], AsyncKiteClient] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._max_connections = max_connections
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.position_books: Dict[str, PositionBook] = {}
+        self.trade_results: Dict[str, Deque[TradeResult]] = {}
+        # Placed orders being followed until they are final
+        self._fill_tasks: Set[asyncio.Task] = set()
+        # Local instrument master, downloaded once per trading day in a background thread
+        self.instruments = InstrumentStore(instruments_db, self._kite_session)
+        # Streaming ticks shared with every algorithm through shared memory
+        self.market_data = MarketDataHub()
+
+    def _kite_session(self, api_key: str, access_token: str) -> KiteConnect:
+        """Blocking client for the daily instrument dump, against the same root"""
+        kite = KiteConnect(api_key=api_key, root=self.root)
+        kite.set_access_token(access_token)
+        return kite
+
+    def client_for(self, config: DeploymentConfig) -> AsyncKiteClient:
+        """One client per set of credentials, all sharing a keep-alive connection pool"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._max_connections),
+                timeout=aiohttp.ClientTimeout(total=7),
+            )
+        key = (config.api_key, config.access_token)
+        if key not in self.clients:
+            self.clients[key] = AsyncKiteClient(config.api_key, config.access_token,
+                                                root=self.root, session=self._session)
+        return self.clients[key]
+
+    async def deploy_algorithm(self, config: DeploymentConfig) -> bool:
+        """Deploy and start an algorithm"""
+        try:
+            if not AlgorithmExecutor._validate_config(config):
+                return False
+
+            client = self.client_for(config)
+            try:
+                profile = await client.profile()
+                logger.info(f"Connected to Zerodha account: {profile.get('user_name', 'Unknown')}")
+            except Exception as e:
+                logger.error(f"Failed to connect to Zerodha API: {e}")
+                return False
+
+            await self.stop_algorithm(config.algorithm_id)
+            # Make sure today's instrument master is on disk
+            self.instruments.refresh_async(config.api_key, config.access_token)
+            config.status = "running"
+            config.created_at = datetime.datetime.now().isoformat()
+            self.deployments[config.algorithm_id] = config
+            self._tasks[config.algorithm_id] = asyncio.create_task(
+                self._run_deployment(config), name=f"algo-{config.algorithm_id}")
+
+            logger.info(f"Algorithm '{config.algorithm_name}' deployed successfully")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error deploying algorithm: {e}")
+            return False
+
+    async def stop_algorithm(self, algorithm_id: str) -> bool:
+        """Stop a running algorithm"""
+        task = self._tasks.pop(algorithm_id, None)
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if algorithm_id in self.deployments:
+            self.deployments[algorithm_id].status = "stopped"
+        return True
+
+    def get_deployment_status(self, algorithm_id: str) -> Optional[Dict[str, Any]]:
+        if algorithm_id in self.deployments:
+            return asdict(self.deployments[algorithm_id])
+        return None
+
+    def get_all_deployments(self) -> Dict[str, Dict[str, Any]]:
+        return {dep_id: asdict(dep) for dep_id, dep in self.deployments.items()}
+
+    def get_trade_results(self, algorithm_id: str) -> List[Dict[str, Any]]:
+        """A deployment's recent trades, newest first"""
+        return [asdict(trade) for trade in reversed(self.trade_results.get(algorithm_id, ()))]
+
+    async def shutdown(self):
+        """Stop every deployment and close the shared connection pool"""
+        await asyncio.gather(*(self.stop_algorithm(dep_id) for dep_id in list(self._tasks)))
+        for task in list(self._fill_tasks):
+            task.cancel()
+        await asyncio.gather(*self._fill_tasks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self.clients.clear()
+        self.market_data.close()
+        self.instruments.close()
+
+    async def _run_deployment(self, config: DeploymentConfig):
+        temp_file = f"temp_algorithm_{config.algorithm_id}.py"
+        with open(temp_file, 'w') as f:
+            f.write(AlgorithmExecutor._enhance_algorithm_code(config, self.instruments.db_path,
+                                                              self.market_data.buffer_name))
+
+        client = self.client_for(config)
+        worker = AsyncAlgorithmWorker(config.algorithm_id, temp_file)
+
+        async def on_message(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            if message.get("type") == "call":
+                return await self._handle_call(config, client, message)
+            if message.get("type") == "trade":
+                self._record_trade(config, client, message.get("record") or {})
+            return None
+
+        try:
+            while True:
+                delay = config.run_interval
+                try:
+                    if not worker.alive:
+                        output = await worker.start(on_message)
+                        if output:
+                            logger.info(f"Output: {output}")
+                    result = await worker.run(300, on_message)  # 5 minute timeout
+                    if result["ok"]:
+                        logger.info(f"Algorithm {config.algorithm_name} executed successfully")
+                        logger.info(f"Output: {result['output']}")
+                    else:
+                        logger.error(f"Algorithm {config.algorithm_name} failed: {result['error']}")
+                except asyncio.TimeoutError:
+                    logger.warning(f"Algorithm {config.algorithm_name} execution timed out")
+                    delay = config.retry_interval
+                except WorkerError as e:
+                    logger.error(f"Error executing algorithm {config.algorithm_name}: {e}")
+                    delay = config.retry_interval
+                await asyncio.sleep(delay)
+        finally:
+            await worker.stop()
+            if os.path.exists(temp_file):
+                try:
+                    os.remove(temp_file)
+                except OSError:
+                    pass
+            logger.info(f"Algorithm {config.algorithm_name} execution ended")
+
+    def _record_trade(self, config: DeploymentConfig, client: AsyncKiteClient, record: Dict[str, Any]):
+        """Record a TradeResult reported by an algorithm and follow it until it fills"""
+        trade = TradeResult(
+            order_id=str(record.get("order_id") or ""),
+            symbol=record.get("symbol", ""),
+            transaction_type=str(record.get("transaction_type", "")).upper(),
+            quantity=int(record.get("quantity") or 0),
+            price=float(record.get("price") or 0.0),
+            status=record.get("status", ""),
+            timestamp=record.get("timestamp") or datetime.datetime.now().isoformat(),
+            error=record.get("error")
+        )
+        self.trade_results.setdefault(config.algorithm_id, deque(maxlen=1000)).append(trade)
+        logger.info(f"Trade {trade.status}: {trade.transaction_type} {trade.quantity} {trade.symbol} "
+                    f"@ {trade.price} (order {trade.order_id or '-'})")
+
+        if trade.status == "PLACED" and trade.order_id:
+            task = asyncio.create_task(self._follow_order(config, client, trade),
+                                       name=f"fill-{trade.order_id}")
+            self._fill_tasks.add(task)
+            task.add_done_callback(self._fill_tasks.discard)
+        elif trade.status == "COMPLETE" and trade.error is None:
+            self._apply_fill(config, trade)
+
+    async def _follow_order(self, config: DeploymentConfig, client: AsyncKiteClient, trade: TradeResult):
+        """Poll a placed order until the broker reports it final, then apply what filled"""
+        deadline = time.monotonic() + FILL_MAX_AGE
+        while time.monotonic() < deadline:
+            await asyncio.sleep(FILL_POLL_INTERVAL)
+            try:
+                order = (await client.order_history(trade.order_id))[-1]
+            except Exception as e:
+                logger.error(f"Error checking order {trade.order_id}: {e}")
+                continue
+            if order.get("status") not in FINAL_STATUSES:
+                continue
+
+            filled = int(order.get("filled_quantity") or 0)
+            trade.status = order["status"]
+            trade.price = float(order.get("average_price") or 0.0)
+            if filled:
+                trade.quantity = filled
+            if trade.status == "REJECTED":
+                trade.error = order.get("status_message") or "Rejected"
+            logger.info(f"Order {trade.order_id} {trade.status}: {trade.transaction_type} {filled} "
+                        f"{trade.symbol} @ {trade.price}")
+            # A cancelled order may have filled partly
+            if filled:
+                self._apply_fill(config, trade)
+            return
+        logger.warning(f"Stopped following order {trade.order_id}: still not final after {FILL_MAX_AGE:.0f}s")
+
+    def _apply_fill(self, config: DeploymentConfig, trade: TradeResult):
+        """Count a fill and realize its P&L against the deployment's position book"""
+        config.trades += 1
+        if trade.price > 0:
+            book = self.position_books.setdefault(config.algorithm_id, PositionBook())
+            config.profit = round(config.profit + book.apply(trade), 2)
+
+    async def _handle_call(self, config: DeploymentConfig, client: AsyncKiteClient,
+                           message: Dict[str, Any]) -> Dict[str, Any]:
+        """Serve a broker call made by an algorithm's injected helpers"""
+        method = message.get("method")
+        params = message.get("params") or {}
+        try:
+            if method == "profile":
+                result = await client.profile()
+            elif method == "quote":
+                result = await client.quote(*params.get("instruments", []))
+            elif method == "ltp":
+                result = await client.ltp(*params.get("instruments", []))
+            elif method == "positions":
+                result = await client.positions()
+            elif method == "place_order":
+                # Orders are sent as soon as they arrive, so there is no queue for an exit to jump
+                params.pop("exit", None)
+                result = await client.place_order(**params)
+            elif method == "validate_symbol":
+                result = self.instruments.exists(params["instrument"])
+            elif method == "nearest_expiry":
+                result = self.instruments.nearest_expiry(
+                    params["underlying"],
+                    params.get("exchange", "NFO"),
+                    instrument_type=params.get("instrument_type", "FUT")
+                )
+            elif method == "subscribe_ticks":
+                result = self._subscribe_ticks(config, params.get("instruments", []))
+            else:
+                raise KiteAPIError(f"Unsupported broker call: {method}")
+            return {"op": "reply", "result": result}
+        except Exception as e:
+            return {"op": "reply", "error": str(e)}
+
+    def _subscribe_ticks(self, config: DeploymentConfig, instruments: List[str]) -> Dict[str, Optional[int]]:
+        """Stream ticks for these instruments on the deployment's account"""
+        tokens = {}
+        for instrument in instruments:
+            record = self.instruments.lookup(instrument)
+            tokens[instrument] = record["instrument_token"] if record else None
+        known = [token for token in tokens.values() if token is not None]
+        if known:
+            self.market_data.subscribe(config.api_key, config.access_token, known)
+        return tokens
+
+
+async def _run_offline(args):
+    root = KITE_API_ROOT
+    if args.stub:
+        from kite_stub_server import start_stub_server
+        server = start_stub_server(latency=args.latency_ms / 1000.0)
+        root = server.root
+        logger.info(f"Using stub broker at {root}")
+
+    with open(args.algorithm, 'r') as f:
+        code = f.read()
+
+    executor = AsyncAlgorithmExecutor(root=root)
+    configs: List[DeploymentConfig] = [
+        DeploymentConfig(
+            algorithm_id=f"async-{i}",
+            algorithm_name=f"{os.path.basename(args.algorithm)} #{i}",
+            algorithm_code=code,
+            api_key=args.api_key,
+            access_token=args.access_token,
+            run_interval=args.interval,
+        )
+        for i in range(args.count)
+    ]
+    await asyncio.gather(*(executor.deploy_algorithm(c) for c in configs))
+    try:
+        await asyncio.sleep(args.duration) if args.duration else await asyncio.Event().wait()
+    finally:
+        await executor.shutdown()
+        logger.info(f"Trades per deployment: {[c.trades for c in configs]}")
+
+
+def main():
+    """Run an algorithm file N times on the asyncio engine"""
+    parser = argparse.ArgumentParser(description="Asyncio algorithm executor")
+    parser.add_argument("algorithm", help="Path to the algorithm source file")
+    parser.add_argument("--count", type=int, default=1, help="Number of deployments to start")
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between runs")
+    parser.add_argument("--duration", type=float, default=0.0, help="Stop after this many seconds")
+    parser.add_argument("--api-key", default="stub")
+    parser.add_argument("--access-token", default="stub")
+    parser.add_argument("--stub", action="store_true", help="Trade against a local stub broker")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Stub broker latency per request")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_run_offline(args))
+    except KeyboardInterrupt:
+        logger.info("Shutting down asyncio executor")
+
+
+if __name__ == "__main__":
+    main()
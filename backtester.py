@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Backtesting Engine
+Runs unmodified algorithm code against local OHLC or tick history with a
+simulated kite object and helpers; fills and P&L are computed with NumPy
+"""
+
+import io
+import csv
+import sys
+import json
+import time
+import types
+import logging
+import argparse
+import builtins
+import datetime
+import traceback
+import contextlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from indicators import Indicators
+
+logger = logging.getLogger(__name__)
+
+MONTHS = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+
+# Bars given only a date are taken to close just before the market does
+DAILY_BAR_TIME = datetime.time(15, 29)
+
+
+@dataclass
+class Bars:
+    """One price series as parallel arrays (timestamps in epoch seconds)"""
+    timestamp: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+
+@dataclass
+class BacktestResult:
+    """Summary statistics plus the per-bar equity curve"""
+    summary: Dict[str, Any]
+    equity: np.ndarray
+    position: np.ndarray
+    errors: List[str] = field(default_factory=list)
+
+
+def _parse_time(value: str) -> float:
+    value = value.strip()
+    try:
+        number = float(value)
+        return number / 1000.0 if number > 1e11 else number
+    except ValueError:
+        pass
+    parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if len(value) <= 10:
+        parsed = datetime.datetime.combine(parsed.date(), DAILY_BAR_TIME)
+    return parsed.timestamp()
+
+
+def load_bars(path: str) -> Bars:
+    """Read OHLC bars (or ticks with last_price) from a CSV or Parquet file.
+
+    Recognised columns: timestamp/date/datetime, open, high, low, close,
+    volume; a file with only last_price is treated as ticks (O=H=L=C).
+    """
+    if path.endswith(".parquet"):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("Reading Parquet history needs pandas and pyarrow installed")
+        frame = pd.read_parquet(path)
+        columns = {name.lower(): frame[name] for name in frame.columns}
+        time_column = next(columns[c] for c in ("timestamp", "datetime", "date") if c in columns)
+        timestamps = np.array([_parse_time(str(v)) if not hasattr(v, "timestamp") else v.timestamp()
+                               for v in time_column], dtype=np.float64)
+
+        def get(name: str) -> Optional[np.ndarray]:
+            return columns[name].to_numpy(dtype=np.float64) if name in columns else None
+    else:
+        with open(path, "r", newline="") as f:
+            reader = csv.reader(f)
+            header = [name.strip().lower() for name in next(reader)]
+            rows = [row for row in reader if row]
+        index = {name: i for i, name in enumerate(header)}
+        time_index = next(index[c] for c in ("timestamp", "datetime", "date") if c in index)
+        timestamps = np.array([_parse_time(row[time_index]) for row in rows], dtype=np.float64)
+
+        def get(name: str) -> Optional[np.ndarray]:
+            if name not in index:
+                return None
+            column = index[name]
+            return np.array([float(row[column] or 0) for row in rows], dtype=np.float64)
+
+    close = get("close")
+    if close is None:
+        close = get("last_price")
+    if close is None:
+        raise ValueError(f"{path} has neither a close nor a last_price column")
+    order = np.argsort(timestamps, kind="stable")
+
+    def column(name: str, default: np.ndarray) -> np.ndarray:
+        values = get(name)
+        return (values if values is not None else default)[order]
+
+    return Bars(
+        timestamp=timestamps[order],
+        open=column("open", close),
+        high=column("high", close),
+        low=column("low", close),
+        close=close[order],
+        volume=column("volume", np.zeros(len(close))),
+    )
+
+
+class SimulatedMarket:
+    """Clock, order book and positions of one backtest.
+
+    The algorithm runs once per bar, after the bar has closed; every symbol
+    it asks about is priced from the single series being replayed. Orders
+    are only recorded here and filled afterwards in bulk.
+    """
+
+    def __init__(self, bars: Bars):
+        self.bars = bars
+        self.i = 0
+        self.order_bar: List[int] = []
+        self.order_qty: List[int] = []
+        self.order_symbol: List[str] = []
+        self.net: Dict[str, int] = {}
+        self.average: Dict[str, float] = {}
+
+    def now(self) -> float:
+        return float(self.bars.timestamp[self.i])
+
+    def last_price(self) -> float:
+        return float(self.bars.close[self.i])
+
+    def quote(self, symbol: str) -> Dict[str, Any]:
+        i, bars = self.i, self.bars
+        return {
+            "instrument_token": 0,
+            "timestamp": datetime.datetime.fromtimestamp(self.now()),
+            "last_price": float(bars.close[i]),
+            "volume": int(bars.volume[i]),
+            "ohlc": {"open": float(bars.open[i]), "high": float(bars.high[i]),
+                     "low": float(bars.low[i]), "close": float(bars.close[max(i - 1, 0)])},
+        }
+
+    def place(self, symbol: str, transaction_type: str, quantity: int) -> str:
+        side = 1 if str(transaction_type).upper() == "BUY" else -1
+        quantity = int(quantity)
+        self.order_bar.append(self.i)
+        self.order_qty.append(side * quantity)
+        self.order_symbol.append(symbol)
+
+        # Running position for get_positions(), assuming the order fills at the last price
+        net = self.net.get(symbol, 0)
+        price = self.last_price()
+        new_net = net + side * quantity
+        if new_net == 0:
+            self.average[symbol] = 0.0
+        elif net == 0 or (net > 0) == (side > 0):
+            self.average[symbol] = (self.average.get(symbol, 0.0) * abs(net) + price * quantity) / abs(new_net)
+        elif (new_net > 0) != (net > 0):
+            self.average[symbol] = price
+        self.net[symbol] = new_net
+        return f"BT{len(self.order_bar):08d}"
+
+    def positions(self) -> Dict[str, List[Dict[str, Any]]]:
+        price = self.last_price()
+        net = [{
+            "tradingsymbol": symbol,
+            "exchange": "NFO",
+            "product": "MIS",
+            "quantity": quantity,
+            "average_price": self.average.get(symbol, 0.0),
+            "last_price": price,
+            "pnl": quantity * (price - self.average.get(symbol, 0.0)),
+        } for symbol, quantity in self.net.items() if quantity]
+        return {"net": net, "day": net}
+
+
+class SimulatedKite:
+    """Drop-in for the KiteConnect methods algorithms call, backed by a SimulatedMarket"""
+
+    EXCHANGE_NSE = "NSE"
+    EXCHANGE_NFO = "NFO"
+    EXCHANGE_BSE = "BSE"
+    TRANSACTION_TYPE_BUY = "BUY"
+    TRANSACTION_TYPE_SELL = "SELL"
+    VARIETY_REGULAR = "regular"
+    VARIETY_AMO = "amo"
+    PRODUCT_MIS = "MIS"
+    PRODUCT_CNC = "CNC"
+    PRODUCT_NRML = "NRML"
+    ORDER_TYPE_MARKET = "MARKET"
+    ORDER_TYPE_LIMIT = "LIMIT"
+    VALIDITY_DAY = "DAY"
+
+    def __init__(self, market: SimulatedMarket, api_key: str = "backtest", **kwargs):
+        self.market = market
+        self.api_key = api_key
+
+    def set_access_token(self, access_token: str):
+        pass
+
+    def profile(self) -> Dict[str, Any]:
+        return {"user_id": "BACKTEST", "user_name": "Backtest", "broker": "SIMULATED"}
+
+    def margins(self, segment: Optional[str] = None) -> Dict[str, Any]:
+        return {"equity": {"enabled": True, "net": 0.0}}
+
+    def quote(self, *instruments) -> Dict[str, Any]:
+        names = instruments[0] if len(instruments) == 1 and isinstance(instruments[0], (list, tuple)) else instruments
+        return {name: self.market.quote(name.partition(":")[2] or name) for name in names}
+
+    def ltp(self, *instruments) -> Dict[str, Any]:
+        return {name: {"instrument_token": 0, "last_price": data["last_price"]}
+                for name, data in self.quote(*instruments).items()}
+
+    def positions(self) -> Dict[str, Any]:
+        return self.market.positions()
+
+    def place_order(self, variety: str = "regular", tradingsymbol: str = "", transaction_type: str = "BUY",
+                    quantity: int = 0, **params) -> str:
+        return self.market.place(tradingsymbol, transaction_type, quantity)
+
+    def instruments(self, exchange: Optional[str] = None) -> List[Dict[str, Any]]:
+        return []
+
+
+def _clock_module(market: SimulatedMarket) -> types.ModuleType:
+    """A datetime module whose now()/today() follow the backtest clock"""
+
+    class SimDatetime(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.fromtimestamp(market.now(), tz)
+
+        @classmethod
+        def today(cls):
+            return cls.fromtimestamp(market.now())
+
+    class SimDate(datetime.date):
+        @classmethod
+        def today(cls):
+            return datetime.date.fromtimestamp(market.now())
+
+    module = types.ModuleType("datetime")
+    module.__dict__.update(datetime.__dict__)
+    module.datetime = SimDatetime
+    module.date = SimDate
+    return module
+
+
+def _helpers(market: SimulatedMarket, kite: SimulatedKite, clock: types.ModuleType,
+             algo_logger: logging.Logger) -> Dict[str, Any]:
+    """The functions _enhance_algorithm_code injects, answered by the simulation"""
+
+    def get_positions():
+        return market.positions()
+
+    def place_order(symbol, transaction_type, quantity, order_type="MARKET", product="MIS", exit=None):
+        if str(transaction_type).upper() not in ("BUY", "SELL"):
+            algo_logger.error(f"Invalid transaction type: {transaction_type}")
+            return None
+        return market.place(symbol, transaction_type, quantity)
+
+    def get_quote(symbol, purpose="pricing"):
+        return market.quote(symbol)
+
+    def check_market_status():
+        now = clock.datetime.now()
+        return now.weekday() < 5 and datetime.time(9, 15) <= now.time() <= datetime.time(15, 30)
+
+    def validate_symbol(symbol):
+        return True
+
+    def get_nearest_future(underlying, exchange="NFO"):
+        today = clock.date.today()
+        return f"{underlying}{str(today.year)[-2:]}{MONTHS[today.month - 1]}FUT"
+
+    def get_ticks(instrument, count=100):
+        from market_data import Tick
+        bars, end = market.bars, market.i + 1
+        start = max(0, end - count)
+        return [Tick(0, float(bars.timestamp[j]), float(bars.close[j]), int(bars.volume[j]), 0)
+                for j in range(start, end)]
+
+    def get_tick(instrument):
+        return get_ticks(instrument, 1)[0]
+
+    def wait_for_tick(instrument, after=0, timeout=1.0):
+        return market.i + 1
+
+    return {
+        "kite": kite,
+        "logger": algo_logger,
+        "MAX_POSITIONS": 10,
+        "RISK_PER_TRADE": 2.0,
+        "get_positions": get_positions,
+        "place_order": place_order,
+        "get_quote": get_quote,
+        "check_market_status": check_market_status,
+        "validate_symbol": validate_symbol,
+        "get_nearest_future": get_nearest_future,
+        "get_tick": get_tick,
+        "get_ticks": get_ticks,
+        "wait_for_tick": wait_for_tick,
+        # Same incremental indicators as live runs, kept in memory for the whole backtest
+        "indicators": Indicators(),
+    }
+
+
+class _Discard(io.TextIOBase):
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        return len(text)
+
+
+class Backtester:
+    """Replays history through an algorithm, then fills its orders in bulk.
+
+    Orders fill at the next bar's open (fill="next_open") or at the close
+    of the bar they were placed on (fill="close"), moved against the trade
+    by slippage_bps; commission_bps is charged on traded value.
+    """
+
+    def __init__(self, algorithm_code: str, fill: str = "next_open", slippage_bps: float = 0.0,
+                 commission_bps: float = 0.0, quiet: bool = True, max_errors: int = 10):
+        if fill not in ("next_open", "close"):
+            raise ValueError(f"Unsupported fill model: {fill}")
+        self.algorithm_code = algorithm_code
+        self.fill = fill
+        self.slippage_bps = slippage_bps
+        self.commission_bps = commission_bps
+        self.quiet = quiet
+        self.max_errors = max_errors
+
+    def run(self, bars: Bars) -> BacktestResult:
+        market = SimulatedMarket(bars)
+        kite = SimulatedKite(market)
+        clock = _clock_module(market)
+        algo_logger = logging.getLogger("backtest.algorithm")
+        algo_logger.disabled = self.quiet
+
+        kite_module = types.ModuleType("kiteconnect")
+        kite_module.KiteConnect = lambda *args, **kwargs: kite
+        real_import = builtins.__import__
+
+        def sim_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if name == "datetime":
+                return clock
+            if name == "kiteconnect":
+                return kite_module
+            return real_import(name, globals, locals, fromlist, level)
+
+        namespace: Dict[str, Any] = {
+            "__name__": "__algorithm__",
+            "__builtins__": dict(builtins.__dict__, __import__=sim_import),
+        }
+        namespace.update(_helpers(market, kite, clock, algo_logger))
+        code = compile(self.algorithm_code, "<algorithm>", "exec")
+
+        errors: List[str] = []
+        started = time.perf_counter()
+        output = _Discard() if self.quiet else sys.stdout
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            exec(code, namespace)
+            entry = namespace.get("main")
+            for i in range(len(bars)):
+                market.i = i
+                try:
+                    if callable(entry):
+                        entry()
+                    else:
+                        exec(code, dict(namespace, __name__="__main__"))
+                except Exception:
+                    if len(errors) < self.max_errors:
+                        errors.append(f"bar {i}: {traceback.format_exc()}")
+        run_seconds = time.perf_counter() - started
+
+        result = self._settle(bars, market)
+        result.summary["bars"] = len(bars)
+        result.summary["run_seconds"] = round(run_seconds, 3)
+        result.summary["errors"] = len(errors)
+        result.errors = errors
+        return result
+
+    def _settle(self, bars: Bars, market: SimulatedMarket) -> BacktestResult:
+        """Vectorized fills, positions, cash and equity over every bar"""
+        n = len(bars)
+        order_bar = np.asarray(market.order_bar, dtype=np.int64)
+        signed_qty = np.asarray(market.order_qty, dtype=np.float64)
+
+        if self.fill == "next_open":
+            fill_bar = order_bar + 1
+            filled = fill_bar < n
+            fill_bar, signed_qty = fill_bar[filled], signed_qty[filled]
+            base_price = bars.open[fill_bar]
+        else:
+            fill_bar = order_bar
+            base_price = bars.close[fill_bar]
+
+        fill_price = base_price * (1 + np.sign(signed_qty) * self.slippage_bps / 10_000)
+        traded_value = np.abs(signed_qty) * fill_price
+        cash_flow = -signed_qty * fill_price - traded_value * self.commission_bps / 10_000
+
+        position = np.cumsum(np.bincount(fill_bar, weights=signed_qty, minlength=n))
+        cash = np.cumsum(np.bincount(fill_bar, weights=cash_flow, minlength=n))
+        equity = cash + position * bars.close
+        drawdown = equity - np.maximum.accumulate(equity) if n else equity
+
+        # Daily returns from the last equity of each calendar day
+        days = (bars.timestamp // 86400).astype(np.int64)
+        day_end = np.flatnonzero(np.diff(days, append=days[-1] + 1)) if n else days
+        daily = np.diff(equity[day_end], prepend=0.0)
+        sharpe = float(daily.mean() / daily.std() * np.sqrt(252)) if len(daily) > 1 and daily.std() > 0 else None
+
+        summary = {
+            "orders": int(len(order_bar)),
+            "filled": int(len(fill_bar)),
+            "net_pnl": round(float(equity[-1]), 2) if n else 0.0,
+            "max_drawdown": round(float(drawdown.min()), 2) if n else 0.0,
+            "turnover": round(float(traded_value.sum()), 2),
+            "commission": round(float(traded_value.sum() * self.commission_bps / 10_000), 2),
+            "final_position": int(position[-1]) if n else 0,
+            "exposure": round(float(np.mean(position != 0)), 4) if n else 0.0,
+            "days": int(len(day_end)),
+            "sharpe": round(sharpe, 3) if sharpe is not None else None,
+        }
+        return BacktestResult(summary=summary, equity=equity, position=position)
+
+
+def run_backtest(algorithm_code: str, history_path: str, **options) -> BacktestResult:
+    """Load history and run algorithm_code over it"""
+    return Backtester(algorithm_code, **options).run(load_bars(history_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest an algorithm against local history")
+    parser.add_argument("algorithm", help="Algorithm file, as submitted to /api/deploy")
+    parser.add_argument("history", help="CSV or Parquet file of bars or ticks")
+    parser.add_argument("--fill", choices=["next_open", "close"], default="next_open")
+    parser.add_argument("--slippage-bps", type=float, default=0.0)
+    parser.add_argument("--commission-bps", type=float, default=0.0)
+    parser.add_argument("--verbose", action="store_true", help="Show the algorithm's output")
+    parser.add_argument("--equity-csv", help="Write the per-bar equity curve here")
+    args = parser.parse_args()
+
+    with open(args.algorithm, "r") as f:
+        code = f.read()
+    started = time.perf_counter()
+    bars = load_bars(args.history)
+    load_seconds = time.perf_counter() - started
+    result = Backtester(code, fill=args.fill, slippage_bps=args.slippage_bps,
+                        commission_bps=args.commission_bps, quiet=not args.verbose).run(bars)
+    result.summary["load_seconds"] = round(load_seconds, 3)
+
+    if args.equity_csv:
+        np.savetxt(args.equity_csv, np.column_stack([bars.timestamp, bars.close, result.position, result.equity]),
+                   delimiter=",", header="timestamp,close,position,equity", comments="", fmt="%.6f")
+    for error in result.errors:
+        print(error, file=sys.stderr)
+    print(json.dumps(result.summary))
+
+
+if __name__ == "__main__":
+    main()
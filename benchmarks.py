@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Executor and API Benchmarks
+Drives the executor and the Flask API against a local paper exchange and
+reports deploy latency, run-cycle overhead, tick-to-order latency,
+persistence cost and /api/deployments throughput as JSON
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from dataclasses import asdict
+from typing import Any, Dict, List
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+NOOP_ALGORITHM = '''
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
+'''
+
+# One order per tick, as fast as the algorithm can react
+TICK_ALGORITHM = '''
+BENCH_TOKEN = {token}
+
+def main():
+    seq = 0
+    for _ in range({count}):
+        seq = wait_for_tick(BENCH_TOKEN, seq, timeout=10.0)
+        place_order("TCS", "BUY", 1)
+'''
+
+ALL_BENCHMARKS = ("deploy", "cycle", "tick_to_order", "persistence", "api_throughput")
+
+# Metric name suffixes and whether larger values are better, for --baseline
+_LOWER_IS_BETTER = ("_ms", "_seconds")
+_HIGHER_IS_BETTER = ("per_second",)
+
+
+def _summary(samples: List[float]) -> Dict[str, Any]:
+    """Latency distribution of samples given in seconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": pick(0.5),
+        "p90_ms": pick(0.9),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _config(algorithm_id: str, code: str, **fields) -> Dict[str, Any]:
+    config = {
+        "algorithm_id": algorithm_id,
+        "algorithm_name": algorithm_id,
+        "algorithm_code": code,
+        "api_key": "bench",
+        "access_token": "bench",
+        "run_interval": 3600.0,
+    }
+    config.update(fields)
+    return config
+
+
+def _quiet_console():
+    """Keep the executor's INFO logging in its file but off the console"""
+    for handler in logging.getLogger().handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setLevel(logging.WARNING)
+
+
+class BenchmarkEnvironment:
+    """A paper exchange, the API server's executor and its Flask app on local ports.
+
+    Everything runs in a temporary working directory so deployments.db,
+    logs and worker files never touch the real ones.
+    """
+
+    def __init__(self, workdir: str, exchange_latency: float = 0.0):
+        from kite_stub_server import start_stub_server
+        from kite_sessions import shared_sessions
+
+        self.workdir = workdir
+        # Subprocess-mode runs start in the temporary directory but import repo modules
+        os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")]))
+        os.chdir(workdir)
+        self.exchange = start_stub_server(latency=exchange_latency, tick_interval=0.1)
+        shared_sessions.set_root(self.exchange.root)
+
+        import api_server
+        from werkzeug.serving import make_server
+        _quiet_console()
+        self.api_server = api_server
+        self.executor = api_server.start_executor(0)
+        self.http = make_server("127.0.0.1", 0, api_server.app, threaded=True)
+        self.root = f"http://127.0.0.1:{self.http.server_port}"
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+
+    def stop_all(self):
+        for algorithm_id, config in list(self.executor.deployments.items()):
+            if config.status == "running":
+                self.executor.stop_algorithm(algorithm_id)
+
+    def close(self):
+        self.stop_all()
+        self.http.shutdown()
+        self.exchange.shutdown()
+        self.exchange.broker.close()
+        self.executor.store.close()
+        self.executor.market_data.close()
+        self.executor.positions.close()
+        self.executor.orders.close()
+
+
+def bench_deploy(env: BenchmarkEnvironment, count: int) -> Dict[str, Any]:
+    """POST /api/deploy round trips (202 Accepted) and time until each job has finished"""
+    session = requests.Session()
+    latencies = []
+    completions = []
+    failures = 0
+    for i in range(count):
+        started = time.perf_counter()
+        response = session.post(f"{env.root}/api/deploy", json=_config(f"bench-deploy-{i}", NOOP_ALGORITHM))
+        latencies.append(time.perf_counter() - started)
+        status = response.json().get("status")
+        while status in ("queued", "running"):
+            time.sleep(0.005)
+            status = session.get(f"{env.root}{response.headers['Location']}").json()["data"]["status"]
+        completions.append(time.perf_counter() - started)
+        if status != "succeeded":
+            failures += 1
+    env.stop_all()
+    return {"latency": _summary(latencies), "completion": _summary(completions), "failures": failures}
+
+
+def bench_cycle(env: BenchmarkEnvironment, worker_runs: int, subprocess_runs: int) -> Dict[str, Any]:
+    """Time _execute_algorithm for an algorithm that does nothing"""
+    from algorithm_executor import DeploymentConfig
+
+    executor = env.executor
+    results = {}
+    for mode, runs in (("worker", worker_runs), ("subprocess", subprocess_runs)):
+        config = DeploymentConfig(**_config(f"bench-cycle-{mode}", NOOP_ALGORITHM, execution_mode=mode))
+        config.status = "running"
+        executor.deployments[config.algorithm_id] = config
+        executor._prepare_execution(config)
+        try:
+            # The first worker run also starts the worker process
+            started = time.perf_counter()
+            executor._execute_algorithm(config.algorithm_id)
+            first_run = time.perf_counter() - started
+
+            samples = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                executor._execute_algorithm(config.algorithm_id)
+                samples.append(time.perf_counter() - started)
+        finally:
+            config.status = "stopped"
+            executor._cleanup_execution(config.algorithm_id)
+            executor.deployments.pop(config.algorithm_id, None)
+        results[mode] = {"first_run_ms": round(first_run * 1000, 3), "cycle": _summary(samples)}
+    return results
+
+
+def bench_tick_to_order(env: BenchmarkEnvironment, count: int, spacing: float) -> Dict[str, Any]:
+    """Time from a tick landing in the shared buffer to its order reaching the exchange"""
+    broker = env.exchange.broker
+    arrivals: List[float] = []
+    arrived = threading.Event()
+    place_order = broker.place_order
+
+    def timed_place_order(variety, params):
+        arrivals.append(time.perf_counter())
+        arrived.set()
+        return place_order(variety, params)
+
+    token = 987654
+    warmup = 3
+    broker.place_order = timed_place_order
+    try:
+        code = TICK_ALGORITHM.format(token=token, count=count + warmup)
+        config = _config("bench-tick", code, run_interval=3600.0)
+        if not env.executor.deploy_algorithm(_dataclass(config)):
+            raise RuntimeError("Could not deploy the tick benchmark algorithm")
+
+        buffer = env.executor.market_data.buffer
+        latencies, missed = [], 0
+        for i in range(count + warmup):
+            arrived.clear()
+            before = len(arrivals)
+            written = time.perf_counter()
+            buffer.write(token, time.time(), 100.0 + i, 1)
+            if not arrived.wait(10.0):
+                missed += 1
+                continue
+            if i >= warmup:
+                latencies.append(arrivals[before] - written)
+            time.sleep(spacing)
+    finally:
+        broker.place_order = place_order
+        env.stop_all()
+
+    gateway = env.executor.orders.stats().get("bench", {})
+    return {
+        "latency": _summary(latencies),
+        "missed": missed,
+        "tick_spacing_ms": round(spacing * 1000, 1),
+        "gateway_queue_ms_p50": gateway.get("queue_ms_p50"),
+        "gateway_queue_ms_p99": gateway.get("queue_ms_p99"),
+    }
+
+
+def _dataclass(config: Dict[str, Any]):
+    from algorithm_executor import DeploymentConfig
+    return DeploymentConfig(**config)
+
+
+def bench_persistence(env: BenchmarkEnvironment, sizes: List[int]) -> Dict[str, Any]:
+    """Store appends, save_deployments (WAL checkpoint) and load_deployments at each size"""
+    from algorithm_executor import AlgorithmExecutor
+
+    results = {}
+    code = NOOP_ALGORITHM * 20
+    for size in sizes:
+        directory = os.path.join(env.workdir, f"persistence-{size}")
+        os.makedirs(directory, exist_ok=True)
+        os.chdir(directory)
+        executor = AlgorithmExecutor(max_workers=1)
+        try:
+            started = time.perf_counter()
+            for i in range(size):
+                config = _dataclass(_config(f"bench-{i}", code))
+                executor.deployments[config.algorithm_id] = config
+                executor.store.put(config.algorithm_id, asdict(config))
+            executor.store.sync()
+            append_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            executor.save_deployments()
+            save_seconds = time.perf_counter() - started
+
+            executor.deployments.clear()
+            started = time.perf_counter()
+            executor.load_deployments()
+            load_seconds = time.perf_counter() - started
+            if len(executor.deployments) != size:
+                raise RuntimeError(f"Loaded {len(executor.deployments)} of {size} deployments")
+
+            results[str(size)] = {
+                "journal_append_seconds": round(append_seconds, 4),
+                "journal_appends_per_second": round(size / append_seconds) if append_seconds else None,
+                "save_seconds": round(save_seconds, 4),
+                "load_seconds": round(load_seconds, 4),
+                "snapshot_bytes": os.path.getsize("deployments.db"),
+            }
+        finally:
+            executor.store.close()
+            executor.market_data.close()
+            executor.positions.close()
+            executor.orders.close()
+            os.chdir(env.workdir)
+    return results
+
+
+def bench_api_throughput(env: BenchmarkEnvironment, deployments: int, clients: int,
+                         duration: float) -> Dict[str, Any]:
+    """Concurrent GET /api/deployments polling: full payload, without code, and revalidation"""
+    executor = env.executor
+    code = NOOP_ALGORITHM * 20
+    for i in range(deployments):
+        config = _dataclass(_config(f"bench-list-{i}", code))
+        executor.deployments[config.algorithm_id] = config
+        executor._touch(config.algorithm_id)
+
+    variants = {
+        "full": ("", False),
+        "without_code": ("?include_code=false", False),
+        "not_modified": ("?include_code=false", True),
+    }
+    results = {}
+    for name, (query, revalidate) in variants.items():
+        url = f"{env.root}/api/deployments{query}"
+        etag = requests.get(url).headers.get("ETag") if revalidate else None
+        latencies: List[List[float]] = [[] for _ in range(clients)]
+        errors = [0] * clients
+        deadline = time.perf_counter() + duration
+
+        def poll(index: int):
+            session = requests.Session()
+            headers = {"If-None-Match": etag} if etag else {}
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = session.get(url, headers=headers)
+                latencies[index].append(time.perf_counter() - started)
+                if response.status_code not in (200, 304):
+                    errors[index] += 1
+
+        threads = [threading.Thread(target=poll, args=(i,)) for i in range(clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        samples = [sample for client in latencies for sample in client]
+        results[name] = {
+            "requests": len(samples),
+            "requests_per_second": round(len(samples) / elapsed, 1),
+            "errors": sum(errors),
+            "latency": _summary(samples),
+        }
+
+    for i in range(deployments):
+        executor.deployments.pop(f"bench-list-{i}", None)
+    results["deployments"] = deployments
+    results["clients"] = clients
+    return results
+
+
+def _metadata() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _flatten(tree: Any, prefix: str = "") -> Dict[str, float]:
+    if isinstance(tree, dict):
+        flat = {}
+        for key, value in tree.items():
+            flat.update(_flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+        return flat
+    if isinstance(tree, (int, float)) and not isinstance(tree, bool):
+        return {prefix: float(tree)}
+    return {}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than `threshold` (a fraction)"""
+    now, before = _flatten(current["results"]), _flatten(baseline["results"])
+    regressions = []
+    for name, value in sorted(now.items()):
+        old = before.get(name)
+        if not old:
+            continue
+        change = (value - old) / old
+        if name.endswith(_LOWER_IS_BETTER) and change > threshold:
+            regressions.append(f"{name}: {old:g} -> {value:g} (+{change:.0%})")
+        elif name.endswith(_HIGHER_IS_BETTER) and change < -threshold:
+            regressions.append(f"{name}: {old:g} -> {value:g} ({change:.0%})")
+    return regressions
+
+
+def run_benchmarks(selected: List[str], args: argparse.Namespace) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="executor-bench-") as workdir:
+        env = BenchmarkEnvironment(workdir, exchange_latency=args.exchange_latency_ms / 1000.0)
+        try:
+            for name in selected:
+                logger.warning(f"Running {name} benchmark")
+                started = time.perf_counter()
+                if name == "deploy":
+                    results[name] = bench_deploy(env, args.deploys)
+                elif name == "cycle":
+                    results[name] = bench_cycle(env, args.cycles, args.subprocess_cycles)
+                elif name == "tick_to_order":
+                    results[name] = bench_tick_to_order(env, args.ticks, args.tick_spacing_ms / 1000.0)
+                elif name == "persistence":
+                    results[name] = bench_persistence(env, args.sizes)
+                elif name == "api_throughput":
+                    results[name] = bench_api_throughput(env, args.list_size, args.clients, args.duration)
+                results[name]["wall_seconds"] = round(time.perf_counter() - started, 3)
+        finally:
+            env.close()
+            os.chdir(original_dir)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the executor and API against a local paper exchange")
+    parser.add_argument("--only", default=",".join(ALL_BENCHMARKS),
+                        help=f"Comma-separated subset of: {', '.join(ALL_BENCHMARKS)}")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", help="Earlier JSON report; exit 1 if any metric regressed")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Relative change counted as a regression (default 0.25)")
+    parser.add_argument("--exchange-latency-ms", type=float, default=0.0)
+    parser.add_argument("--deploys", type=int, default=50)
+    parser.add_argument("--cycles", type=int, default=200, help="Worker-mode cycles to time")
+    parser.add_argument("--subprocess-cycles", type=int, default=10)
+    parser.add_argument("--ticks", type=int, default=30)
+    parser.add_argument("--tick-spacing-ms", type=float, default=150.0,
+                        help="Gap between ticks; keep it above the order gateway's rate limit")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[100, 1000, 10000])
+    parser.add_argument("--list-size", type=int, default=1000, help="Deployments served by /api/deployments")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per polling variant")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(selected) - set(ALL_BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    report = {"meta": _metadata(), "parameters": vars(args), "results": run_benchmarks(selected, args)}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
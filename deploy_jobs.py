@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Deployment Jobs
+Runs deploy requests in the background so POST /api/deploy can answer at
+once with a job id whose progress is polled at /api/jobs/<job_id>
+"""
+
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DeployJob:
+    """Progress of one background deploy"""
+    job_id: str
+    algorithm_id: str
+    status: str = "queued"  # queued, running, succeeded or failed
+    message: str = ""
+    submitted_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class DeployInProgress(Exception):
+    """A different deploy of the same algorithm_id is still queued or running"""
+
+    def __init__(self, job: Dict[str, Any]):
+        super().__init__(f"Deploy job {job['job_id']} for {job['algorithm_id']} is still {job['status']}")
+        self.job = job
+
+
+class DeployJobs:
+    """Bounded pool of deploy jobs plus a record of the most recent ones.
+
+    At most one job per algorithm_id is in flight. Submitting the same
+    request again while it is queued or running returns the existing job;
+    a different request for it raises DeployInProgress, so an edited
+    redeploy is never mistaken for the one already under way. The last
+    `keep` finished jobs stay queryable.
+    """
+
+    def __init__(self, max_workers: int = 8, keep: int = 1000):
+        self.keep = keep
+        self._jobs: "OrderedDict[str, DeployJob]" = OrderedDict()
+        self._active: Dict[str, DeployJob] = {}
+        self._requests: Dict[str, Any] = {}  # job_id -> request of an in-flight job
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deploy-job")
+
+    def submit(self, algorithm_id: str, deploy: Callable[[], Dict[str, Any]],
+               request: Any = None) -> Tuple[Dict[str, Any], bool]:
+        """Queue deploy(), which returns {"success", "message"}; returns (job, newly created)
+
+        `request` is what deploy() will deploy; it tells a repeated submission
+        apart from a different one.
+        """
+        with self._lock:
+            job = self._active.get(algorithm_id)
+            if job is not None:
+                if self._requests.get(job.job_id) != request:
+                    raise DeployInProgress(asdict(job))
+                return asdict(job), False
+            job = DeployJob(uuid.uuid4().hex, algorithm_id, submitted_at=time.time())
+            self._jobs[job.job_id] = job
+            self._active[algorithm_id] = job
+            self._requests[job.job_id] = request
+            self._trim_locked()
+            snapshot = asdict(job)
+        self._pool.submit(self._run, job, deploy)
+        return snapshot, True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return asdict(job) if job is not None else None
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+    def _run(self, job: DeployJob, deploy: Callable[[], Dict[str, Any]]):
+        with self._lock:
+            job.status, job.started_at = "running", time.time()
+        try:
+            result = deploy()
+            status, message = ("succeeded" if result.get("success") else "failed"), result.get("message", "")
+        except Exception as e:
+            logger.error(f"Deploy job {job.job_id} for {job.algorithm_id} failed: {e}")
+            status, message = "failed", f"Error: {e}"
+        with self._lock:
+            job.status, job.message, job.finished_at = status, message, time.time()
+            self._active.pop(job.algorithm_id, None)
+            self._requests.pop(job.job_id, None)
+
+    def _trim_locked(self):
+        # Drop the oldest finished jobs; queued and running ones are always kept
+        excess = len(self._jobs) - self.keep
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].finished_at is not None:
+                del self._jobs[job_id]
+                excess -= 1
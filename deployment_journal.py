@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Deployment State Journal
+Append-only write-ahead log of deployment changes, fsynced in batches and
+periodically compacted into the deployments.json snapshot
+"""
+
+import os
+import time
+import json
+import zlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from metrics import JOURNAL_WRITE_SECONDS, JOURNAL_COMPACT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class DeploymentJournal:
+    """Crash-safe store for deployment state.
+
+    Every change is one journal line: "<crc32> <json>" where the record is
+    {"op": "put"|"update"|"delete", "id": ..., "data": {...}}. A "put" carries
+    the full deployment once; later "update" records carry only the fields
+    that changed, so a write costs the size of the change. A background
+    thread writes pending records and fsyncs them together. Once the journal
+    holds compact_every records, the materialized state is written to the
+    snapshot (temp file, fsync, atomic rename) and the journal is truncated.
+
+    On load the snapshot is read and the journal replayed on top of it;
+    replay stops at the first torn or corrupt line, which is cut off.
+    """
+
+    def __init__(self, snapshot_path: str = "deployments.json",
+                 journal_path: str = "deployments.journal",
+                 flush_interval: float = 0.05, compact_every: int = 1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.state: Dict[str, Dict[str, Any]] = {}
+        self._pending: List[str] = []
+        self._appended = 0
+        self._flushed = 0
+        self._journal_records = 0
+        self._file = None
+        self._cond = threading.Condition()
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Read the snapshot, replay the journal and start the writer"""
+        state: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r") as f:
+                state = json.load(f)
+
+        replayed, good_offset = 0, 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    record = self._decode(line)
+                    if record is None:
+                        logger.warning(f"Discarding torn journal tail at byte {good_offset} of {self.journal_path}")
+                        break
+                    self._apply(state, record)
+                    good_offset += len(line)
+                    replayed += 1
+            if good_offset != os.path.getsize(self.journal_path):
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(good_offset)
+
+        self.state = state
+        self._journal_records = replayed
+        self._file = open(self.journal_path, "ab")
+        self._writer = threading.Thread(target=self._write_loop, name="deployment-journal", daemon=True)
+        self._writer.start()
+        if replayed:
+            logger.info(f"Replayed {replayed} journal records over {self.snapshot_path}")
+        return {dep_id: dict(data) for dep_id, data in state.items()}
+
+    def put(self, algorithm_id: str, data: Dict[str, Any], wait: bool = False):
+        """Record a full deployment (new deploy or redeploy)"""
+        self._append({"op": "put", "id": algorithm_id, "data": data}, wait)
+
+    def update(self, algorithm_id: str, wait: bool = False, **fields):
+        """Record changed fields of an existing deployment"""
+        self._append({"op": "update", "id": algorithm_id, "data": fields}, wait)
+
+    def delete(self, algorithm_id: str, wait: bool = False):
+        self._append({"op": "delete", "id": algorithm_id, "data": None}, wait)
+
+    def sync(self):
+        """Block until everything appended so far is on disk"""
+        with self._cond:
+            target = self._appended
+            self._cond.notify_all()
+            while self._flushed < target and self._writer is not None and self._writer.is_alive():
+                self._cond.wait(1.0)
+
+    def compact(self):
+        """Write the current state to the snapshot and empty the journal"""
+        with self._cond:
+            self._write_pending()
+            self._compact_locked()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join(timeout=5)
+        with self._cond:
+            self._write_pending()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _append(self, record: Dict[str, Any], wait: bool):
+        payload = json.dumps(record, separators=(",", ":"), default=str)
+        with self._cond:
+            self._apply(self.state, record)
+            self._pending.append(f"{zlib.crc32(payload.encode()):08x} {payload}\n")
+            self._appended += 1
+            if wait:
+                self._cond.notify_all()
+        if wait:
+            self.sync()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                if not self._pending and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                if self._closed:
+                    return
+                try:
+                    self._write_pending()
+                    if self._journal_records >= self.compact_every:
+                        self._compact_locked()
+                except Exception as e:
+                    logger.error(f"Error writing deployment journal: {e}")
+
+    def _write_pending(self):
+        """Write and fsync every pending record as one batch (lock held)"""
+        if not self._pending or self._file is None:
+            return
+        batch, self._pending = self._pending, []
+        started = time.perf_counter()
+        self._file.write("".join(batch).encode())
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        JOURNAL_WRITE_SECONDS.observe(time.perf_counter() - started)
+        self._journal_records += len(batch)
+        self._flushed += len(batch)
+        self._cond.notify_all()
+
+    def _compact_locked(self):
+        started = time.perf_counter()
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, separators=(",", ":"), default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # Records already folded into the snapshot replay idempotently, so a
+        # crash before this truncate is harmless
+        if self._file is not None:
+            self._file.truncate(0)
+            self._file.seek(0)
+            os.fsync(self._file.fileno())
+        JOURNAL_COMPACT_SECONDS.observe(time.perf_counter() - started)
+        logger.info(f"Compacted {self._journal_records} journal records into {self.snapshot_path}")
+        self._journal_records = 0
+
+    @staticmethod
+    def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+        try:
+            checksum, _, payload = line.rstrip(b"\n").partition(b" ")
+            if not line.endswith(b"\n") or int(checksum, 16) != zlib.crc32(payload):
+                return None
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _apply(state: Dict[str, Dict[str, Any]], record: Dict[str, Any]):
+        op, dep_id, data = record["op"], record["id"], record.get("data")
+        if op == "put":
+            state[dep_id] = dict(data)
+        elif op == "update":
+            if dep_id in state:
+                state[dep_id].update(data)
+        elif op == "delete":
+            state.pop(dep_id, None)
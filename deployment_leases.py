@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Deployment Leases
+Renewable per-deployment leases with fencing tokens in the shared deployment
+store, so several executor nodes split the fleet without double trading
+"""
+
+import math
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Name of this executor node; setting it turns on lease coordination
+NODE_ID_ENV = "EXECUTOR_NODE_ID"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    algorithm_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    token INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_leases_owner ON leases (owner, expires_at);
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+class LeaseManager:
+    """Leases on algorithm_ids held by one node, stored next to the deployments.
+
+    A lease row is (algorithm_id, owner, token, expires_at). Acquiring a
+    lease that is free, expired or left by an earlier run of this node
+    increments its fencing token; rows are never deleted, so tokens only
+    grow. The owner must renew() well within `ttl`; a lease that could not
+    be renewed, or whose local deadline (renewal time + ttl - margin) has
+    passed, is no longer held and the node must stop acting for it. Store
+    writes carry the token, so a node that lost its lease cannot overwrite
+    the new owner's state.
+
+    Expiry uses wall-clock time shared by all nodes, so their clocks must
+    agree to well within `margin`.
+    """
+
+    def __init__(self, db_path: str, node_id: str, ttl: float = 10.0, margin: float = 2.0):
+        self.db_path = db_path
+        self.node_id = node_id
+        self.ttl = ttl
+        self.margin = margin
+        # algorithm_id -> (token, local monotonic deadline)
+        self._held: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA busy_timeout = 5000")
+        self._conn.executescript(SCHEMA)
+        self.heartbeat()
+
+    def acquire(self, algorithm_id: str) -> Optional[int]:
+        """Take or extend the lease; returns its fencing token, or None if another node holds it"""
+        with self._lock:
+            held = self._held.get(algorithm_id)
+            if held is not None and self._valid(held):
+                return held[0] if self._renew_locked([algorithm_id]) == [] else None
+            started = time.monotonic()
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT owner, token, expires_at FROM leases WHERE algorithm_id = ?",
+                                         (algorithm_id,)).fetchone()
+                if row is not None and row[0] != self.node_id and row[2] > now:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                token = (row[1] if row is not None else 0) + 1
+                self._conn.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?, ?)",
+                                   (algorithm_id, self.node_id, token, now + self.ttl))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._held[algorithm_id] = (token, started + self.ttl)
+            return token
+
+    def release(self, algorithm_id: str):
+        """Give the lease up at once (the token is kept so the next owner's is higher)"""
+        with self._lock:
+            held = self._held.pop(algorithm_id, None)
+            if held is not None:
+                self._conn.execute("UPDATE leases SET expires_at = 0 WHERE algorithm_id = ? AND owner = ? "
+                                   "AND token = ?", (algorithm_id, self.node_id, held[0]))
+
+    def renew(self) -> List[str]:
+        """Extend every held lease; returns the algorithm_ids whose lease was lost"""
+        self.heartbeat()
+        with self._lock:
+            return self._renew_locked(list(self._held))
+
+    def token(self, algorithm_id: str) -> Optional[int]:
+        """Fencing token of a lease this node currently holds"""
+        with self._lock:
+            held = self._held.get(algorithm_id)
+            return held[0] if held is not None and self._valid(held) else None
+
+    def holds(self, algorithm_id: str) -> bool:
+        return self.token(algorithm_id) is not None
+
+    def held(self) -> List[str]:
+        with self._lock:
+            return list(self._held)
+
+    def owner(self, algorithm_id: str) -> Optional[str]:
+        """Node currently holding the lease, if it has not expired"""
+        with self._lock:
+            row = self._conn.execute("SELECT owner FROM leases WHERE algorithm_id = ? AND expires_at > ?",
+                                     (algorithm_id, time.time())).fetchone()
+        return row[0] if row is not None else None
+
+    def heartbeat(self):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO nodes VALUES (?, ?)", (self.node_id, time.time()))
+
+    def claimable(self) -> List[str]:
+        """Running deployments with no live owner, up to this node's fair share of the fleet.
+
+        Reads the store's deployments table, which lives in the same database.
+        """
+        now = time.time()
+        with self._lock:
+            running = self._conn.execute("SELECT COUNT(*) FROM deployments WHERE status = 'running'").fetchone()[0]
+            nodes = self._conn.execute("SELECT COUNT(*) FROM nodes WHERE last_seen > ?",
+                                       (now - self.ttl,)).fetchone()[0]
+            room = math.ceil(running / max(1, nodes)) - len(self._held)
+            if room <= 0:
+                return []
+            rows = self._conn.execute(
+                "SELECT d.algorithm_id FROM deployments d LEFT JOIN leases l ON l.algorithm_id = d.algorithm_id "
+                "WHERE d.status = 'running' AND (l.algorithm_id IS NULL OR l.expires_at <= ? OR l.owner = ?) "
+                "ORDER BY d.algorithm_id LIMIT ?",
+                (now, self.node_id, room + len(self._held))
+            ).fetchall()
+            return [row[0] for row in rows if row[0] not in self._held][:room]
+
+    def close(self):
+        """Release every lease so other nodes can take over immediately"""
+        for algorithm_id in self.held():
+            self.release(algorithm_id)
+        with self._lock:
+            self._conn.execute("DELETE FROM nodes WHERE node_id = ?", (self.node_id,))
+            self._conn.close()
+
+    def _valid(self, held: Tuple[int, float]) -> bool:
+        return held[1] - self.margin > time.monotonic()
+
+    def _renew_locked(self, algorithm_ids: List[str]) -> List[str]:
+        started = time.monotonic()
+        expires_at = time.time() + self.ttl
+        lost = []
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for algorithm_id in algorithm_ids:
+                token = self._held[algorithm_id][0]
+                renewed = self._conn.execute(
+                    "UPDATE leases SET expires_at = ? WHERE algorithm_id = ? AND owner = ? AND token = ?",
+                    (expires_at, algorithm_id, self.node_id, token)).rowcount
+                if renewed:
+                    self._held[algorithm_id] = (token, started + self.ttl)
+                else:
+                    lost.append(algorithm_id)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        for algorithm_id in lost:
+            self._held.pop(algorithm_id, None)
+            logger.warning(f"Lost the lease on {algorithm_id}")
+        return lost
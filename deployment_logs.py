@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Deployment Logs
+Per-deployment output capture into a bounded in-memory ring buffer backed by
+size-rotated files, read by line offset so a tail costs only its window
+"""
+
+import os
+import json
+import time
+import logging
+import datetime
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# One line on disk: "<offset> <timestamp> <text>"
+_Line = Tuple[int, str, str]
+
+
+class DeploymentLog:
+    """Output of one deployment.
+
+    Every line gets an increasing offset. The newest `capacity` lines are
+    kept in a ring buffer; every line is also appended to `path`, which is
+    rotated to path.1 .. path.<backups> once it exceeds max_bytes. Reads
+    older than the buffer binary-search the files by offset, so any window
+    is found with a few seeks regardless of how large the files are.
+    """
+
+    def __init__(self, path: str, capacity: int = 1000, max_bytes: int = 1024 * 1024, backups: int = 3):
+        self.path = path
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._ring: List[Optional[_Line]] = [None] * capacity
+        self._buffered_from = 0
+        self._cond = threading.Condition()
+        self._file = None
+        # Oldest offset still on disk; only changes when a file is started, so it is cached until then
+        self._first: Optional[int] = None
+        self.next_offset = self._recover_next_offset()
+        self._buffered_from = self.next_offset
+
+    def append(self, text: str):
+        lines = text.splitlines() or [""]
+        timestamp = datetime.datetime.now().isoformat(timespec="milliseconds")
+        with self._cond:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+                self._first = None
+            for line in lines:
+                offset = self.next_offset
+                self._ring[offset % self.capacity] = (offset, timestamp, line)
+                self._file.write(f"{offset} {timestamp} {line}\n")
+                self.next_offset += 1
+            self._buffered_from = max(self._buffered_from, self.next_offset - self.capacity)
+            self._file.flush()
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+            self._cond.notify_all()
+
+    def read(self, since: Optional[int] = None, limit: int = 100) -> Dict[str, Any]:
+        """Up to `limit` lines from offset `since` (default: the last `limit` lines)"""
+        limit = max(0, limit)
+        with self._cond:
+            end = self.next_offset
+            start = max(0, end - limit) if since is None else max(0, since)
+            stop = min(end, start + limit)
+            if start >= self._buffered_from:
+                lines = [self._ring[offset % self.capacity] for offset in range(start, stop)]
+            else:
+                lines = self._read_files(start, stop - start)
+            first = self._first_offset()
+        if lines:
+            next_offset = lines[-1][0] + 1
+        elif start < end:
+            # The requested window has been rotated away; resume at the oldest line kept
+            next_offset = max(start, first)
+        else:
+            next_offset = end
+        return {
+            "lines": [{"offset": offset, "timestamp": timestamp, "text": text}
+                      for offset, timestamp, text in lines],
+            "first_offset": first,
+            "next_offset": next_offset,
+        }
+
+    def wait(self, after: int, timeout: float) -> bool:
+        """Block until a line at offset >= after exists; False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.next_offset <= after:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self):
+        with self._cond:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._cond.notify_all()
+
+    def _files(self) -> List[str]:
+        """Existing log files, oldest first"""
+        paths = [f"{self.path}.{i}" for i in range(self.backups, 0, -1)] + [self.path]
+        return [path for path in paths if os.path.exists(path)]
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _first_offset(self) -> int:
+        if self._first is None:
+            self._first = self._buffered_from
+            for path in self._files():
+                with open(path, "rb") as f:
+                    line = self._parse(f.readline())
+                if line is not None:
+                    self._first = line[0]
+                    break
+        return self._first
+
+    def _read_files(self, start: int, count: int) -> List[_Line]:
+        lines: List[_Line] = []
+        for path in self._files():
+            if len(lines) >= count:
+                break
+            with open(path, "rb") as f:
+                if not lines:
+                    last = self._last_line(f)
+                    if last is None or last[0] < start:
+                        continue
+                    self._seek(f, start)
+                for raw in f:
+                    line = self._parse(raw)
+                    if line is None or line[0] < start:
+                        continue
+                    lines.append(line)
+                    if len(lines) >= count:
+                        break
+        return lines
+
+    def _seek(self, f, offset: int):
+        """Position f at the first line whose offset is >= offset"""
+        low, high = 0, os.fstat(f.fileno()).st_size
+        while low < high:
+            mid = (low + high) // 2
+            f.seek(mid)
+            if mid:
+                f.readline()
+            position = f.tell()
+            line = self._parse(f.readline())
+            if line is None or line[0] >= offset:
+                high = mid
+            else:
+                low = max(position, mid + 1)
+        f.seek(low)
+        if low:
+            f.readline()
+
+    def _last_line(self, f) -> Optional[_Line]:
+        size = os.fstat(f.fileno()).st_size
+        f.seek(max(0, size - 8192))
+        tail = f.read().splitlines()
+        f.seek(0)
+        for raw in reversed(tail):
+            line = self._parse(raw)
+            if line is not None:
+                return line
+        return None
+
+    @staticmethod
+    def _parse(raw: bytes) -> Optional[_Line]:
+        parts = raw.decode("utf-8", "replace").rstrip("\n").split(" ", 2)
+        if len(parts) < 2 or not parts[0].isdigit():
+            return None
+        return int(parts[0]), parts[1], parts[2] if len(parts) > 2 else ""
+
+    def _recover_next_offset(self) -> int:
+        """Continue numbering after the last line written by an earlier run"""
+        for path in reversed(self._files()):
+            with open(path, "rb") as f:
+                line = self._last_line(f)
+            if line is not None:
+                return line[0] + 1
+        return 0
+
+
+class DeploymentLogs:
+    """One DeploymentLog per deployment under `directory`"""
+
+    def __init__(self, directory: str = "logs", capacity: int = 1000, max_bytes: int = 1024 * 1024,
+                 backups: int = 3):
+        self.directory = directory
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._logs: Dict[str, DeploymentLog] = {}
+        self._lock = threading.Lock()
+
+    def path(self, algorithm_id: str) -> str:
+        return os.path.join(self.directory, f"algorithm_{algorithm_id}.log")
+
+    def get(self, algorithm_id: str, create: bool = True) -> Optional[DeploymentLog]:
+        with self._lock:
+            log = self._logs.get(algorithm_id)
+            if log is None:
+                path = self.path(algorithm_id)
+                if not create and not os.path.exists(path):
+                    return None
+                os.makedirs(self.directory, exist_ok=True)
+                log = self._logs[algorithm_id] = DeploymentLog(path, self.capacity, self.max_bytes, self.backups)
+            return log
+
+    def append(self, algorithm_id: str, text: str):
+        try:
+            self.get(algorithm_id).append(text)
+        except Exception as e:
+            logger.error(f"Could not write log for {algorithm_id}: {e}")
+
+    def read(self, algorithm_id: str, since: Optional[int] = None, limit: int = 100) -> Dict[str, Any]:
+        log = self.get(algorithm_id, create=False)
+        if log is None:
+            return {"lines": [], "first_offset": 0, "next_offset": 0}
+        return log.read(since, limit)
+
+    def close(self):
+        with self._lock:
+            logs = list(self._logs.values())
+        for log in logs:
+            log.close()
+
+
+def follow_stream(log: DeploymentLog, since: Optional[int] = None, heartbeat: float = 15.0,
+                  batch: int = 500) -> Iterator[str]:
+    """Render a deployment's log as a text/event-stream body, starting at `since`"""
+    yield "retry: 2000\n\n"
+    offset = log.next_offset if since is None else since
+    while True:
+        page = log.read(offset, batch)
+        for line in page["lines"]:
+            yield f"id: {line['offset']}\nevent: log\ndata: {json.dumps(line)}\n\n"
+        offset = page["next_offset"]
+        if not page["lines"] and not log.wait(offset, heartbeat):
+            yield ": keepalive\n\n"
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Deployment Store
+SQLite (WAL) storage for deployments, algorithm runs and TradeResult rows,
+with indexed, pageable status, listing and history queries
+"""
+
+import os
+import json
+import time
+import sqlite3
+import datetime
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from deployment_journal import DeploymentJournal
+from metrics import JOURNAL_WRITE_SECONDS, JOURNAL_COMPACT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deployments (
+    algorithm_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at TEXT,
+    updated_at REAL NOT NULL,
+    fence INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deployments_status ON deployments (status, algorithm_id);
+CREATE INDEX IF NOT EXISTS idx_deployments_created ON deployments (created_at);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    algorithm_id TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    duration REAL NOT NULL,
+    mode TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_algorithm ON runs (algorithm_id, id);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    algorithm_id TEXT NOT NULL,
+    order_id TEXT,
+    symbol TEXT,
+    transaction_type TEXT,
+    quantity INTEGER,
+    price REAL,
+    status TEXT,
+    timestamp TEXT NOT NULL,
+    error TEXT,
+    queue_latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_trades_algorithm ON trades (algorithm_id, id);
+CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades (timestamp);
+CREATE INDEX IF NOT EXISTS idx_trades_order ON trades (order_id);
+"""
+
+TRADE_COLUMNS = ("order_id", "symbol", "transaction_type", "quantity", "price", "status",
+                 "timestamp", "error", "queue_latency_ms")
+RUN_COLUMNS = ("started_at", "duration", "mode", "outcome", "error")
+
+_Statement = Tuple[str, tuple]
+
+# Path of the store; point several nodes at one database to coordinate them
+DEPLOYMENT_STORE_ENV = "EXECUTOR_STORE"
+
+# Runs older than this are deleted (trades are kept); checked once per PRUNE_INTERVAL
+RUN_RETENTION_DAYS = 7
+PRUNE_INTERVAL = 3600.0
+# Rows deleted per transaction while pruning, so other writes are not held up
+PRUNE_CHUNK = 5000
+
+
+class DeploymentStore:
+    """Deployments, runs and trades in one SQLite database in WAL mode.
+
+    Writes keep the DeploymentJournal interface (put, update, delete, sync,
+    compact, close): they are queued and a background thread commits
+    everything pending in one transaction, so a burst of changes costs one
+    fsync. If that transaction fails, its statements are retried one at a
+    time so a single bad write only loses itself. A "put" stores the whole deployment as JSON next to indexed
+    status/created_at columns; an "update" patches only the changed fields
+    in place. Reads go through a separate connection and, thanks to WAL,
+    never wait for the writer; they see what has been committed.
+
+    On first open, deployments from a legacy deployments.json snapshot and
+    journal are imported and the old files renamed to *.migrated.
+
+    Deployment writes may carry a lease fencing token (see deployment_leases);
+    a write whose token is older than the row's is dropped.
+
+    Runs older than `run_retention_days` are pruned by the writer once an hour.
+    """
+
+    # A write with fencing token ? applies unless the row holds a newer one
+    _FENCED = "(? IS NULL OR fence IS NULL OR fence <= ?)"
+
+    def __init__(self, db_path: str = "deployments.db", flush_interval: float = 0.05,
+                 legacy_snapshot: str = "deployments.json", legacy_journal: str = "deployments.journal",
+                 run_retention_days: Optional[float] = RUN_RETENTION_DAYS):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.run_retention_days = run_retention_days
+        self.legacy_snapshot = legacy_snapshot
+        self.legacy_journal = legacy_journal
+        self._pending: List[_Statement] = []
+        self._appended = 0
+        self._flushed = 0
+        self._cond = threading.Condition()
+        # Serializes use of the write connection; appends only need _cond
+        self._write_lock = threading.Lock()
+        self._pruned_at = 0.0
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._read_lock = threading.Lock()
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Open the database (once), import legacy state if needed and return every deployment"""
+        if self._write_conn is None:
+            self._write_conn = self._connect()
+            self._write_conn.executescript(SCHEMA)
+            columns = [row["name"] for row in self._write_conn.execute("PRAGMA table_info(deployments)")]
+            if "fence" not in columns:
+                self._write_conn.execute("ALTER TABLE deployments ADD COLUMN fence INTEGER")
+            self._read_conn = self._connect()
+            self._read_conn.execute("PRAGMA query_only = ON")
+            self._migrate_legacy()
+            self._writer = threading.Thread(target=self._write_loop, name="deployment-store", daemon=True)
+            self._writer.start()
+        else:
+            self.sync()
+        with self._read_lock:
+            rows = self._read_conn.execute("SELECT algorithm_id, data FROM deployments").fetchall()
+        return {row["algorithm_id"]: json.loads(row["data"]) for row in rows}
+
+    # Writes
+
+    def put(self, algorithm_id: str, data: Dict[str, Any], wait: bool = False, fence: Optional[int] = None):
+        """Record a full deployment (new deploy or redeploy).
+
+        With a lease fencing token, the write is dropped if the row already
+        carries a higher token, i.e. another node has taken the deployment over.
+        """
+        self._append(("INSERT INTO deployments (algorithm_id, status, created_at, updated_at, fence, data) "
+                      "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (algorithm_id) DO UPDATE SET "
+                      "status = excluded.status, created_at = excluded.created_at, "
+                      "updated_at = excluded.updated_at, fence = coalesce(excluded.fence, fence), "
+                      "data = excluded.data WHERE " + self._FENCED.replace("?", "excluded.fence"),
+                      (algorithm_id, data.get("status", ""), data.get("created_at") or None, time.time(), fence,
+                       json.dumps(data, default=str))), wait)
+
+    def update(self, algorithm_id: str, wait: bool = False, fence: Optional[int] = None, **fields):
+        """Record changed fields of an existing deployment (fenced like put)"""
+        if not fields:
+            return
+        paths = ", ".join("?, json(?)" for _ in fields)
+        params: List[Any] = []
+        for name, value in fields.items():
+            params += [f'$."{name}"', json.dumps(value, default=str)]
+        sql = f"UPDATE deployments SET data = json_set(data, {paths}), updated_at = ?"
+        params.append(time.time())
+        if "status" in fields:
+            sql += ", status = ?"
+            params.append(fields["status"])
+        if "created_at" in fields:
+            sql += ", created_at = ?"
+            params.append(fields["created_at"])
+        self._append((sql + f" WHERE algorithm_id = ? AND {self._FENCED}", tuple(params) + (algorithm_id, fence, fence)),
+                     wait)
+
+    def delete(self, algorithm_id: str, wait: bool = False):
+        self._append(("DELETE FROM deployments WHERE algorithm_id = ?", (algorithm_id,)), wait)
+
+    def record_run(self, algorithm_id: str, started_at: str, duration: float, mode: str,
+                   outcome: str, error: Optional[str] = None):
+        """Record one algorithm run; outcome is 'ok', 'failed', 'timeout' or 'error'"""
+        self._append((f"INSERT INTO runs (algorithm_id, {', '.join(RUN_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                      (algorithm_id, started_at, round(duration, 6), mode, outcome,
+                       error[:4000] if error else None)), False)
+
+    def record_trade(self, algorithm_id: str, trade: Dict[str, Any]):
+        """Record one TradeResult (as a dict)"""
+        self._append((f"INSERT INTO trades (algorithm_id, {', '.join(TRADE_COLUMNS)}) "
+                      f"VALUES (?, {', '.join('?' * len(TRADE_COLUMNS))})",
+                      (algorithm_id,) + tuple(trade.get(column) for column in TRADE_COLUMNS)), False)
+
+    def update_trade(self, algorithm_id: str, order_id: str, /, **fields):
+        """Change a recorded trade, e.g. its status and price once the order has filled.
+
+        fields may include a new order_id, for a trade recorded under a gateway reference.
+        """
+        fields = {name: value for name, value in fields.items() if name in TRADE_COLUMNS}
+        if not fields or not order_id:
+            return
+        self._append((f"UPDATE trades SET {', '.join(f'{name} = ?' for name in fields)} "
+                      "WHERE algorithm_id = ? AND order_id = ?",
+                      tuple(fields.values()) + (algorithm_id, str(order_id))), False)
+
+    def import_history(self, algorithm_id: str, history: Dict[str, List[Dict[str, Any]]]):
+        """Append runs and trades exported from another store, e.g. when a deployment moves"""
+        for run in history.get("runs", ()):
+            self.record_run(algorithm_id, run["started_at"], run["duration"], run["mode"], run["outcome"],
+                            run.get("error"))
+        for trade in history.get("trades", ()):
+            self.record_trade(algorithm_id, trade)
+
+    def prune_runs(self, older_than_days: Optional[float] = None) -> int:
+        """Delete runs that started more than `older_than_days` ago (default: the retention); returns the count"""
+        days = self.run_retention_days if older_than_days is None else older_than_days
+        if not days:
+            return 0
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+        deleted = 0
+        while True:
+            with self._write_lock:
+                if self._write_conn is None:
+                    break
+                count = self._write_conn.execute(
+                    "DELETE FROM runs WHERE id IN (SELECT id FROM runs WHERE started_at < ? LIMIT ?)",
+                    (cutoff, PRUNE_CHUNK)).rowcount
+            deleted += count
+            if count < PRUNE_CHUNK:
+                break
+        if deleted:
+            logger.info(f"Pruned {deleted} runs older than {days} days from {self.db_path}")
+        return deleted
+
+    def sync(self):
+        """Block until everything appended so far is committed"""
+        with self._cond:
+            target = self._appended
+            self._cond.notify_all()
+            while self._flushed < target and self._writer is not None and self._writer.is_alive():
+                self._cond.wait(1.0)
+
+    def compact(self):
+        """Commit pending writes and checkpoint the WAL into the database file"""
+        self._write_pending()
+        with self._write_lock:
+            if self._write_conn is None:
+                return
+            started = time.perf_counter()
+            self._write_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            JOURNAL_COMPACT_SECONDS.observe(time.perf_counter() - started)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join(timeout=5)
+        self._write_pending()
+        with self._write_lock:
+            if self._write_conn is not None:
+                self._write_conn.close()
+                self._write_conn = None
+        with self._read_lock:
+            if self._read_conn is not None:
+                self._read_conn.close()
+                self._read_conn = None
+
+    # Queries
+
+    def get(self, algorithm_id: str) -> Optional[Dict[str, Any]]:
+        row = self._query_one("SELECT data FROM deployments WHERE algorithm_id = ?", (algorithm_id,))
+        return json.loads(row["data"]) if row is not None else None
+
+    def deployments(self, status: Optional[str] = None, after: Optional[str] = None, limit: int = 100,
+                    include_code: bool = True) -> List[Dict[str, Any]]:
+        """One page of deployments ordered by algorithm_id; pass the last id as `after` for the next"""
+        data = "data" if include_code else "json_remove(data, '$.algorithm_code')"
+        sql, params = f"SELECT {data} AS data FROM deployments WHERE 1 = 1", []
+        if status is not None:
+            sql += " AND status = ?"
+            params.append(status)
+        if after is not None:
+            sql += " AND algorithm_id > ?"
+            params.append(after)
+        sql += " ORDER BY algorithm_id LIMIT ?"
+        params.append(limit)
+        return [json.loads(row["data"]) for row in self._query(sql, tuple(params))]
+
+    def statuses(self, algorithm_ids: List[str]) -> Dict[str, str]:
+        """Stored status of each of these deployments"""
+        result: Dict[str, str] = {}
+        for start in range(0, len(algorithm_ids), 500):
+            chunk = algorithm_ids[start:start + 500]
+            rows = self._query(f"SELECT algorithm_id, status FROM deployments WHERE algorithm_id IN "
+                               f"({', '.join('?' * len(chunk))})", tuple(chunk))
+            result.update({row["algorithm_id"]: row["status"] for row in rows})
+        return result
+
+    def count(self, status: Optional[str] = None) -> int:
+        if status is None:
+            row = self._query_one("SELECT COUNT(*) AS n FROM deployments", ())
+        else:
+            row = self._query_one("SELECT COUNT(*) AS n FROM deployments WHERE status = ?", (status,))
+        return row["n"] if row is not None else 0
+
+    def runs(self, algorithm_id: str, before: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """A deployment's runs, newest first; pass the last id as `before` for the next page"""
+        return self._history("runs", RUN_COLUMNS, algorithm_id, before, limit)
+
+    def trades(self, algorithm_id: str, before: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """A deployment's trades, newest first; pass the last id as `before` for the next page"""
+        return self._history("trades", TRADE_COLUMNS, algorithm_id, before, limit)
+
+    def export_history(self, algorithm_id: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Every run and trade of a deployment, oldest first, for import_history()"""
+        return {table: [dict(row) for row in self._query(
+                    f"SELECT {', '.join(columns)} FROM {table} WHERE algorithm_id = ? ORDER BY id", (algorithm_id,))]
+                for table, columns in (("runs", RUN_COLUMNS), ("trades", TRADE_COLUMNS))}
+
+    def _history(self, table: str, columns: Tuple[str, ...], algorithm_id: str, before: Optional[int],
+                 limit: int) -> List[Dict[str, Any]]:
+        sql = f"SELECT id, {', '.join(columns)} FROM {table} WHERE algorithm_id = ?"
+        params: List[Any] = [algorithm_id]
+        if before is not None:
+            sql += " AND id < ?"
+            params.append(before)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._query(sql, tuple(params))]
+
+    def _query(self, sql: str, params: tuple) -> List[sqlite3.Row]:
+        with self._read_lock:
+            if self._read_conn is None:
+                return []
+            return self._read_conn.execute(sql, params).fetchall()
+
+    def _query_one(self, sql: str, params: tuple) -> Optional[sqlite3.Row]:
+        rows = self._query(sql, params)
+        return rows[0] if rows else None
+
+    # Writer
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = FULL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    def _append(self, statement: _Statement, wait: bool):
+        with self._cond:
+            self._pending.append(statement)
+            self._appended += 1
+            if wait:
+                self._cond.notify_all()
+        if wait:
+            self.sync()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                if not self._pending and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self._write_pending()
+                if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL:
+                    self._pruned_at = time.monotonic()
+                    self.prune_runs()
+            except Exception as e:
+                logger.error(f"Error writing deployment store: {e}")
+
+    def _write_pending(self):
+        """Commit every pending statement in one transaction.
+
+        The pending list is swapped out under _cond, so appends never wait
+        for the commit; _write_lock keeps batches in order.
+        """
+        with self._write_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                if self._write_conn is not None:
+                    self._commit(batch)
+            finally:
+                # Count the batch as done even if it failed so sync() callers are not left waiting
+                with self._cond:
+                    self._flushed += len(batch)
+                    self._cond.notify_all()
+
+    def _commit(self, batch: List[_Statement]):
+        started = time.perf_counter()
+        try:
+            self._write_conn.execute("BEGIN")
+            for sql, params in batch:
+                self._write_conn.execute(sql, params)
+            self._write_conn.execute("COMMIT")
+        except Exception as e:
+            self._write_conn.execute("ROLLBACK")
+            logger.warning(f"Batch of {len(batch)} store writes failed ({e}); retrying one at a time")
+            # Autocommit connection: each statement is its own transaction
+            for sql, params in batch:
+                try:
+                    self._write_conn.execute(sql, params)
+                except Exception as e:
+                    logger.error(f"Error writing deployment store: {e} ({sql.split(' (')[0]})")
+        JOURNAL_WRITE_SECONDS.observe(time.perf_counter() - started)
+
+    def _migrate_legacy(self):
+        """Import deployments.json and its journal into an empty database"""
+        if not (os.path.exists(self.legacy_snapshot) or os.path.exists(self.legacy_journal)):
+            return
+        if self._write_conn.execute("SELECT 1 FROM deployments LIMIT 1").fetchone() is not None:
+            return
+        journal = DeploymentJournal(self.legacy_snapshot, self.legacy_journal)
+        try:
+            state = journal.load()
+        finally:
+            journal.close()
+        now = time.time()
+        self._write_conn.execute("BEGIN")
+        self._write_conn.executemany(
+            "INSERT OR REPLACE INTO deployments (algorithm_id, status, created_at, updated_at, data) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(dep_id, data.get("status", ""), data.get("created_at") or None, now,
+              json.dumps(data, default=str)) for dep_id, data in state.items()]
+        )
+        self._write_conn.execute("COMMIT")
+        for path in (self.legacy_snapshot, self.legacy_journal):
+            if os.path.exists(path):
+                os.replace(path, f"{path}.migrated")
+        logger.info(f"Imported {len(state)} deployments from {self.legacy_snapshot} into {self.db_path}")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Deployment Event Stream
+In-process publish/subscribe bus for deployment state transitions, trades
+and P&L changes, rendered as server-sent events by the API server
+"""
+
+import json
+import queue
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One subscriber's queue of pending events"""
+
+    def __init__(self, bus: "EventBus", maxsize: int):
+        self.bus = bus
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next event, or None if nothing arrived within timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """Fans events out to subscribers without ever blocking the publisher.
+
+    Every event gets an increasing id and is kept in a short history so a
+    client that reconnects with Last-Event-ID receives what it missed. A
+    subscriber that falls more than `queue_size` events behind is dropped;
+    its stream ends and the client resumes from its last id.
+    """
+
+    def __init__(self, history: int = 1000, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self._history: deque = deque(maxlen=history)
+        self._subscribers: List[Subscription] = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def publish(self, event_type: str, data: Dict[str, Any]):
+        with self._lock:
+            event = {"id": self._next_id, "type": event_type, "data": data}
+            self._next_id += 1
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                subscription.overflowed = True
+                self.unsubscribe(subscription)
+                logger.warning("Dropped a slow event stream subscriber")
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        """Subscribe; with last_event_id, missed events still in history are queued first"""
+        subscription = Subscription(self, self.queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._history:
+                    if event["id"] > last_event_id and not subscription.queue.full():
+                        subscription.queue.put_nowait(event)
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+
+def sse_stream(subscription: Subscription, heartbeat: float = 15.0) -> Iterator[str]:
+    """Render a subscription as a text/event-stream body"""
+    try:
+        yield "retry: 2000\n\n"
+        while not subscription.overflowed:
+            event = subscription.get(timeout=heartbeat)
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+    finally:
+        subscription.close()
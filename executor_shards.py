@@ -0,0 +1,712 @@
+#!/usr/bin/env python3
+"""
+Sharded Executor
+Spreads deployments over N executor processes, each running its own
+AlgorithmExecutor, store and logs, with calls routed by algorithm_id
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import socket
+import secrets
+import logging
+import argparse
+import threading
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from algorithm_worker import FrameChannel, WorkerError, CONNECT_TIMEOUT
+from deployment_store import DeploymentStore, DEPLOYMENT_STORE_ENV
+from deployment_leases import NODE_ID_ENV
+from event_stream import EventBus
+from instrument_store import INSTRUMENTS_DB_ENV
+from positions_service import PositionsService
+from kite_sessions import shared_sessions, KITE_ROOT_ENV
+from metrics import registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+SHARD_ADDRESS_ENV = "EXECUTOR_SHARD_ADDRESS"
+SHARD_TOKEN_ENV = "EXECUTOR_SHARD_TOKEN"
+SHARD_INDEX_ENV = "EXECUTOR_SHARD_INDEX"
+# Number of executor processes the API server starts; 0 keeps the in-process executor
+SHARDS_ENV = "EXECUTOR_SHARDS"
+CALL_TIMEOUT = 60  # seconds; a deploy includes the broker profile check
+RESPAWN_DELAY = 1.0  # seconds between restarts of a crashing shard
+
+
+def shard_score(algorithm_id: str, shard: int) -> int:
+    """Rendezvous hash weight; the live shard with the highest score owns the id"""
+    return zlib.crc32(f"{shard}:{algorithm_id}".encode("utf-8"))
+
+
+class ShardDown(WorkerError):
+    """Raised for calls to a shard whose process has exited"""
+
+
+class ExecutorShard:
+    """Supervisor-side handle to one executor process.
+
+    The process runs in its own directory (deployments.db, logs) with the
+    supervisor's instruments.db shared by every shard, and serves request frames {"id", "op", "args"} with
+    {"type": "reply", "id", "result"|"error"}. It also pushes
+    {"type": "event"} frames for everything published on its EventBus.
+    """
+
+    def __init__(self, index: int, directory: str, on_event, on_exit, instruments_db: Optional[str] = None):
+        self.index = index
+        self.directory = directory
+        self.instruments_db = instruments_db
+        self.on_event = on_event
+        self.on_exit = on_exit
+        self.process: Optional[subprocess.Popen] = None
+        self.channel: Optional[FrameChannel] = None
+        self._pending: Dict[int, Future] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None and self.channel is not None
+
+    def start(self):
+        """Spawn the executor process and wait for its handshake"""
+        os.makedirs(self.directory, exist_ok=True)
+        token = secrets.token_hex(16)
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            listener.bind(("127.0.0.1", 0))
+            listener.listen(1)
+            listener.settimeout(CONNECT_TIMEOUT)
+            host, port = listener.getsockname()
+
+            env = dict(os.environ)
+            env[SHARD_ADDRESS_ENV] = f"{host}:{port}"
+            env[SHARD_TOKEN_ENV] = token
+            env[SHARD_INDEX_ENV] = str(self.index)
+            if env.get(DEPLOYMENT_STORE_ENV):
+                # A shared store: shards coordinate through leases like separate nodes
+                env[DEPLOYMENT_STORE_ENV] = os.path.abspath(env[DEPLOYMENT_STORE_ENV])
+                env.setdefault(NODE_ID_ENV, socket.gethostname())
+            if shared_sessions.root:
+                env[KITE_ROOT_ENV] = shared_sessions.root
+            if self.instruments_db:
+                # One daily download for all shards
+                env.setdefault(INSTRUMENTS_DB_ENV, self.instruments_db)
+            self.process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--shard-worker"],
+                cwd=self.directory,
+                env=env,
+                stdin=subprocess.DEVNULL,
+            )
+
+            try:
+                sock, _ = listener.accept()
+            except socket.timeout:
+                self.kill()
+                raise WorkerError(f"Executor shard {self.index} did not connect")
+        finally:
+            listener.close()
+
+        channel = FrameChannel(sock)
+        try:
+            hello = channel.recv(timeout=CONNECT_TIMEOUT)
+        except (OSError, ValueError, ConnectionError) as e:
+            channel.close()
+            self.kill()
+            raise WorkerError(f"Executor shard {self.index} failed to start: {e}")
+        if hello.get("token") != token:
+            channel.close()
+            self.kill()
+            raise WorkerError(f"Executor shard {self.index} handshake failed")
+
+        self.channel = channel
+        threading.Thread(target=self._read_loop, args=(channel,), name=f"executor-shard-{self.index}",
+                         daemon=True).start()
+        logger.info(f"Executor shard {self.index} started (pid {self.process.pid}) in {self.directory}")
+
+    def call(self, op: str, timeout: float = CALL_TIMEOUT, **args) -> Any:
+        """Send one request and wait for its reply"""
+        future = self.submit(op, **args)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            raise WorkerError(f"Executor shard {self.index} did not answer {op} within {timeout}s")
+
+    def submit(self, op: str, **args) -> Future:
+        future: Future = Future()
+        with self._lock:
+            if not self.alive:
+                raise ShardDown(f"Executor shard {self.index} is not running")
+            self._next_id += 1
+            request_id = self._next_id
+            self._pending[request_id] = future
+        try:
+            with self._send_lock:
+                self.channel.send({"id": request_id, "op": op, "args": args})
+        except (OSError, AttributeError) as e:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise ShardDown(f"Executor shard {self.index} is not reachable: {e}")
+        return future
+
+    def stop(self, timeout: float = 30):
+        """Ask the process to flush its state and exit, killing it if it does not"""
+        channel = self.channel
+        if channel is not None:
+            try:
+                with self._send_lock:
+                    channel.send({"op": "shutdown"})
+            except OSError:
+                pass
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.kill()
+        if channel is not None:
+            channel.close()
+
+    def kill(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def _read_loop(self, channel: FrameChannel):
+        try:
+            while True:
+                message = channel.recv()
+                kind = message.get("type")
+                if kind == "reply":
+                    with self._lock:
+                        future = self._pending.pop(message.get("id"), None)
+                    if future is None:
+                        continue
+                    if "error" in message:
+                        future.set_exception(WorkerError(message["error"]))
+                    else:
+                        future.set_result(message.get("result"))
+                elif kind == "event":
+                    self.on_event(message["event_type"], message["data"])
+        except (OSError, ValueError, ConnectionError):
+            pass
+        finally:
+            with self._lock:
+                self.channel = None
+                pending, self._pending = self._pending, {}
+            channel.close()
+            for future in pending.values():
+                future.set_exception(ShardDown(f"Executor shard {self.index} exited"))
+            if self.process is not None:
+                try:
+                    self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.kill()
+            self.on_exit(self)
+
+
+class _RemoteLog:
+    """DeploymentLog look-alike served by the owning shard, for follow_stream"""
+
+    def __init__(self, executor: "ShardedExecutor", algorithm_id: str):
+        self.executor = executor
+        self.algorithm_id = algorithm_id
+
+    @property
+    def next_offset(self) -> int:
+        return self.read(None, 0)["next_offset"]
+
+    def read(self, since: Optional[int] = None, limit: int = 100) -> Dict[str, Any]:
+        return self.executor._call(self.algorithm_id, "logs_read", since=since, limit=limit)
+
+    def wait(self, after: int, timeout: float) -> bool:
+        return self.executor._call(self.algorithm_id, "logs_wait", timeout=timeout + CALL_TIMEOUT,
+                                   after=after, wait_timeout=timeout)
+
+
+class _ShardLogs:
+    """DeploymentLogs look-alike that routes to the owning shard"""
+
+    def __init__(self, executor: "ShardedExecutor"):
+        self.executor = executor
+
+    def get(self, algorithm_id: str, create: bool = True) -> Optional[_RemoteLog]:
+        if not create and not self.executor._call(algorithm_id, "logs_exists"):
+            return None
+        return _RemoteLog(self.executor, algorithm_id)
+
+    def read(self, algorithm_id: str, since: Optional[int] = None, limit: int = 100) -> Dict[str, Any]:
+        return _RemoteLog(self.executor, algorithm_id).read(since, limit)
+
+    def close(self):
+        pass
+
+
+class ShardedExecutor:
+    """Drop-in for AlgorithmExecutor in the API server that uses every core.
+
+    Deployments live in `shards` executor processes under directory/<n>/.
+    A deployment stays on the shard that holds it; new ids go to the live
+    shard with the highest rendezvous hash. When a shard process dies, its
+    deployments (stored state and history, logs and indicator state) are handed to the
+    remaining shards, which restart the running ones, and the shard is
+    respawned empty for new deployments.
+
+    Deployments of an unsharded executor (deployments.db in
+    `unsharded_directory`) are split over the shards by the same hash the
+    first time it starts, and the running ones resume there.
+    """
+
+    def __init__(self, shards: Optional[int] = None, directory: str = "shards", kite_root: Optional[str] = None,
+                 unsharded_directory: str = ".", instruments_db: str = "instruments.db"):
+        if kite_root:
+            shared_sessions.set_root(kite_root)
+        self.directory = os.path.abspath(directory)
+        self.shards = [ExecutorShard(index, os.path.join(self.directory, str(index)),
+                                     self._forward_event, self._shard_exited, os.path.abspath(instruments_db))
+                       for index in range(max(1, shards or os.cpu_count() or 1))]
+        self.owners: Dict[str, int] = {}
+        self._owners_lock = threading.Lock()
+        self._rebalance_lock = threading.Lock()
+        self._closing = False
+        # Merged events of every shard, with ids assigned here
+        self.events = EventBus()
+        self.logs = _ShardLogs(self)
+        # Account-level polling does not belong to any shard
+        self.positions = PositionsService(shared_sessions.get)
+        self._pool = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard-fanout")
+
+        if not os.environ.get(DEPLOYMENT_STORE_ENV):
+            # With a shared store the shards lease deployments from it instead
+            self._split_unsharded(os.path.abspath(unsharded_directory))
+        for shard in self.shards:
+            shard.start()
+        for shard, ids in zip(self.shards, self._fan_out("ids")):
+            with self._owners_lock:
+                for algorithm_id in ids or ():
+                    self.owners.setdefault(algorithm_id, shard.index)
+        logger.info(f"Sharded executor running {len(self.owners)} deployments on {len(self.shards)} shards")
+
+    # Routing
+
+    def shard_for(self, algorithm_id: str) -> ExecutorShard:
+        with self._owners_lock:
+            index = self.owners.get(algorithm_id)
+        if index is not None:
+            return self.shards[index]
+        live = [shard for shard in self.shards if shard.alive] or self.shards
+        return max(live, key=lambda shard: shard_score(algorithm_id, shard.index))
+
+    def _call(self, algorithm_id: str, op: str, timeout: float = CALL_TIMEOUT, **args) -> Any:
+        return self.shard_for(algorithm_id).call(op, timeout=timeout, algorithm_id=algorithm_id, **args)
+
+    def _fan_out(self, op: str, **args) -> List[Any]:
+        """Call op on every shard in parallel; a shard that is down contributes None"""
+        futures = [self._pool.submit(shard.call, op, **args) for shard in self.shards]
+        results = []
+        for shard, future in zip(self.shards, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"Executor shard {shard.index} failed {op}: {e}")
+                results.append(None)
+        return results
+
+    # AlgorithmExecutor interface used by AlgorithmAPI and the API server
+
+    def deploy_algorithm(self, config) -> bool:
+        shard = self.shard_for(config.algorithm_id)
+        try:
+            deployed = shard.call("deploy", config=asdict(config))
+        except WorkerError as e:
+            logger.error(f"Error deploying algorithm on shard {shard.index}: {e}")
+            return False
+        if deployed:
+            with self._owners_lock:
+                self.owners[config.algorithm_id] = shard.index
+        return deployed
+
+    def stop_algorithm(self, algorithm_id: str) -> bool:
+        try:
+            return self._call(algorithm_id, "stop")
+        except WorkerError as e:
+            logger.error(f"Error stopping algorithm: {e}")
+            return False
+
+    def deploy_algorithms(self, configs) -> Dict[str, bool]:
+        """One deploy_many request per shard, sent to all shards at once"""
+        groups: Dict[int, List[Dict[str, Any]]] = {}
+        for config in configs:
+            groups.setdefault(self.shard_for(config.algorithm_id).index, []).append(asdict(config))
+        results = self._batch("deploy_many", {index: {"configs": group} for index, group in groups.items()},
+                              {index: [config["algorithm_id"] for config in group] for index, group in groups.items()})
+        with self._owners_lock:
+            for index, group in groups.items():
+                for config in group:
+                    if results.get(config["algorithm_id"]):
+                        self.owners[config["algorithm_id"]] = index
+        return results
+
+    def stop_algorithms(self, algorithm_ids: List[str]) -> Dict[str, bool]:
+        """One stop_many request per shard, sent to all shards at once"""
+        groups: Dict[int, List[str]] = {}
+        for algorithm_id in dict.fromkeys(algorithm_ids):
+            groups.setdefault(self.shard_for(algorithm_id).index, []).append(algorithm_id)
+        return self._batch("stop_many", {index: {"algorithm_ids": group} for index, group in groups.items()}, groups)
+
+    def _batch(self, op: str, requests: Dict[int, Dict[str, Any]], ids: Dict[int, List[str]]) -> Dict[str, bool]:
+        """Send each shard its request in parallel and merge the per-id results; ids of a failed shard are False"""
+        futures = {index: self._pool.submit(self.shards[index].call, op, timeout=CALL_TIMEOUT * 2, **args)
+                   for index, args in requests.items()}
+        results: Dict[str, bool] = {}
+        for index, future in futures.items():
+            try:
+                results.update(future.result())
+            except Exception as e:
+                logger.error(f"Executor shard {index} failed {op}: {e}")
+                results.update(dict.fromkeys(ids[index], False))
+        return results
+
+    def is_running(self, algorithm_id: str) -> bool:
+        return self._call(algorithm_id, "is_running")
+
+    def get_deployment_status(self, algorithm_id: str) -> Optional[Dict[str, Any]]:
+        _, data = self.serialized_deployment(algorithm_id)
+        return json.loads(data) if data is not None else None
+
+    def get_all_deployments(self) -> Dict[str, Dict[str, Any]]:
+        return json.loads(self.serialized_deployments()[1])
+
+    def get_trade_results(self, algorithm_id: str, before: Optional[int] = None,
+                          limit: int = 100) -> List[Dict[str, Any]]:
+        return self._call(algorithm_id, "trades", before=before, limit=limit)
+
+    def get_runs(self, algorithm_id: str, before: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        return self._call(algorithm_id, "runs", before=before, limit=limit)
+
+    def query_deployments(self, status: Optional[str] = None, after: Optional[str] = None, limit: int = 100,
+                          include_code: bool = True) -> List[Dict[str, Any]]:
+        """Merge each shard's page; every shard returns its first `limit` ids after the cursor"""
+        pages = self._fan_out("query", status=status, after=after, limit=limit, include_code=include_code)
+        rows = [row for page in pages for row in page or ()]
+        return sorted(rows, key=lambda row: row["algorithm_id"])[:limit]
+
+    def serialized_deployment(self, algorithm_id: str, include_code: bool = True) -> Tuple[str, Optional[str]]:
+        shard = self.shard_for(algorithm_id)
+        version, data = shard.call("status", algorithm_id=algorithm_id, include_code=include_code)
+        return f"{shard.index}.{version}", data
+
+    def serialized_deployments(self, include_code: bool = True) -> Tuple[str, str]:
+        """Shard listings joined into one object; the version changes when any shard's does"""
+        versions, parts = [], []
+        for shard, listing in zip(self.shards, self._fan_out("list", include_code=include_code)):
+            if listing is None:
+                versions.append("x")
+                continue
+            version, data = listing
+            versions.append(str(version))
+            if data != "{}":
+                parts.append(data[1:-1])
+        return ".".join(versions), "{" + ",".join(parts) + "}"
+
+    def running_count(self) -> int:
+        return sum(count or 0 for count in self._fan_out("running_count"))
+
+    def reconcile(self) -> int:
+        return sum(count or 0 for count in self._fan_out("reconcile"))
+
+    def render_metrics(self) -> str:
+        """This process's metrics merged with every shard's, which carry shard="<n>" """
+        sources = [(None, metrics_registry.render())]
+        sources += [(str(shard.index), text) for shard, text in zip(self.shards, self._fan_out("metrics"))]
+        headers: Dict[str, List[str]] = {}
+        samples: Dict[str, List[str]] = {}
+        for shard, text in sources:
+            name = ""
+            for line in (text or "").splitlines():
+                if line.startswith("# "):
+                    name = line.split(" ", 3)[2]
+                    if len(headers.setdefault(name, [])) < 2:
+                        headers[name].append(line)
+                    samples.setdefault(name, [])
+                elif line:
+                    samples[name].append(line if shard is None else _add_label(line, "shard", shard))
+        return "".join(line + "\n" for name in headers for line in headers[name] + samples[name])
+
+    def close(self):
+        self._closing = True
+        for shard in self.shards:
+            shard.stop()
+        self._pool.shutdown(wait=False)
+        self.positions.close()
+
+    # Failover
+
+    def _forward_event(self, event_type: str, data: Dict[str, Any]):
+        self.events.publish(event_type, data)
+
+    def _shard_exited(self, shard: ExecutorShard):
+        if self._closing:
+            return
+        logger.error(f"Executor shard {shard.index} exited with code "
+                     f"{shard.process.returncode if shard.process else None}; rebalancing")
+        threading.Thread(target=self._recover, args=(shard,), name=f"shard-recover-{shard.index}",
+                         daemon=True).start()
+
+    def _recover(self, shard: ExecutorShard):
+        with self._rebalance_lock:
+            try:
+                self._rebalance(shard)
+            except Exception as e:
+                logger.error(f"Error rebalancing shard {shard.index}: {e}")
+            while not self._closing:
+                try:
+                    shard.start()
+                    return
+                except Exception as e:
+                    logger.error(f"Could not restart executor shard {shard.index}: {e}")
+                    time.sleep(RESPAWN_DELAY)
+
+    def _rebalance(self, dead: ExecutorShard):
+        """Hand the dead shard's deployments to the live shards and clear its state"""
+        if os.environ.get(DEPLOYMENT_STORE_ENV):
+            logger.info(f"Deployments of shard {dead.index} fail over through their leases")
+            return
+        live = [shard for shard in self.shards if shard.alive]
+        if not live:
+            # Nothing to move to; the respawned shard reloads its own state
+            logger.error("No live executor shards; shard state left in place")
+            return
+
+        db_path = os.path.join(dead.directory, "deployments.db")
+        store = DeploymentStore(db_path, legacy_snapshot=os.path.join(dead.directory, "deployments.json"),
+                                legacy_journal=os.path.join(dead.directory, "deployments.journal"))
+        try:
+            state = store.load()
+            histories = {algorithm_id: store.export_history(algorithm_id) for algorithm_id in state}
+        finally:
+            store.close()
+
+        moved = 0
+        for algorithm_id, data in state.items():
+            target = max(live, key=lambda shard: shard_score(algorithm_id, shard.index))
+            self._move_files(algorithm_id, dead.directory, target.directory)
+            try:
+                adopted = target.call("adopt", config=data, history=histories[algorithm_id])
+            except WorkerError as e:
+                adopted = False
+                logger.error(f"Shard {target.index} could not adopt {algorithm_id}: {e}")
+            if not adopted:
+                logger.error(f"Deployment {algorithm_id} moved to shard {target.index} but did not restart")
+            with self._owners_lock:
+                self.owners[algorithm_id] = target.index
+            moved += 1
+
+        # The respawned shard starts empty; keep the old state for inspection
+        for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+            if os.path.exists(path):
+                os.replace(path, f"{path}.handed-off")
+        logger.info(f"Moved {moved} deployments off executor shard {dead.index}")
+
+    def _split_unsharded(self, source: str):
+        """Move an unsharded executor's deployments into the shard stores before the shards start"""
+        db_path = os.path.join(source, "deployments.db")
+        legacy_snapshot = os.path.join(source, "deployments.json")
+        legacy_journal = os.path.join(source, "deployments.journal")
+        if not any(os.path.exists(path) for path in (db_path, legacy_snapshot, legacy_journal)):
+            return
+        store = DeploymentStore(db_path, legacy_snapshot=legacy_snapshot, legacy_journal=legacy_journal)
+        try:
+            state = store.load()
+            histories = {algorithm_id: store.export_history(algorithm_id) for algorithm_id in state}
+        finally:
+            store.close()
+
+        stores: Dict[int, DeploymentStore] = {}
+        existing: Dict[str, int] = {}
+        try:
+            for shard in self.shards:
+                os.makedirs(shard.directory, exist_ok=True)
+                stores[shard.index] = DeploymentStore(
+                    os.path.join(shard.directory, "deployments.db"),
+                    legacy_snapshot=os.path.join(shard.directory, "deployments.json"),
+                    legacy_journal=os.path.join(shard.directory, "deployments.journal"))
+                for algorithm_id in stores[shard.index].load():
+                    existing[algorithm_id] = shard.index
+
+            for algorithm_id, data in state.items():
+                # A deployment a shard already holds stays there
+                index = existing.get(algorithm_id)
+                if index is None:
+                    index = max(range(len(self.shards)), key=lambda i: shard_score(algorithm_id, i))
+                stores[index].put(algorithm_id, data)
+                stores[index].import_history(algorithm_id, histories[algorithm_id])
+                self._move_files(algorithm_id, source, self.shards[index].directory)
+        finally:
+            for shard_store in stores.values():
+                shard_store.close()
+
+        # Keep the unsharded database for inspection; it is not read again
+        for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+            if os.path.exists(path):
+                os.replace(path, f"{path}.sharded")
+        logger.info(f"Split {len(state)} deployments from {db_path} over {len(self.shards)} shards")
+
+    @staticmethod
+    def _move_files(algorithm_id: str, source: str, target: str):
+        """Carry a deployment's logs and indicator state to its new shard"""
+        names = [f"indicators_{algorithm_id}.pkl"]
+        log_name = f"algorithm_{algorithm_id}.log"
+        names += [os.path.join("logs", name) for name in os.listdir(os.path.join(source, "logs"))
+                  if name == log_name or name.startswith(log_name + ".")] \
+            if os.path.isdir(os.path.join(source, "logs")) else []
+        for name in names:
+            path = os.path.join(source, name)
+            if os.path.exists(path):
+                os.makedirs(os.path.dirname(os.path.join(target, name)), exist_ok=True)
+                os.replace(path, os.path.join(target, name))
+
+
+def _add_label(sample: str, name: str, value: str) -> str:
+    """Insert name="value" into one Prometheus sample line"""
+    metric, _, rest = sample.rpartition(" ")
+    if metric.endswith("}"):
+        return f'{metric[:-1]},{name}="{value}"}} {rest}'
+    return f'{metric}{{{name}="{value}"}} {rest}'
+
+
+def create_executor(shards: int = 0, kite_root: Optional[str] = None):
+    """An in-process AlgorithmExecutor, or a ShardedExecutor when shards > 0"""
+    if shards > 0:
+        return ShardedExecutor(shards, kite_root=kite_root)
+    from algorithm_executor import AlgorithmExecutor
+    executor = AlgorithmExecutor(kite_root=kite_root)
+    executor.resume_in_background()
+    return executor
+
+
+def forward_events(executor, send, stopped: Optional[threading.Event] = None):
+    """Send everything published on a shard's EventBus to the supervisor as event frames.
+
+    A burst larger than the subscription's queue drops the subscription;
+    the forwarder then subscribes again and sends every deployment's
+    current status, so the supervisor's stream catches up instead of
+    going quiet for the rest of the process's life.
+    """
+    subscription = executor.events.subscribe()
+    while stopped is None or not stopped.is_set():
+        if subscription.overflowed:
+            logger.warning("Shard event subscription overflowed; resubscribing and resending statuses")
+            subscription = executor.events.subscribe()
+            for data in executor.status_events():
+                send({"type": "event", "event_type": "status", "data": data})
+        event = subscription.get(timeout=1.0)
+        if event is not None:
+            send({"type": "event", "event_type": event["type"], "data": event["data"]})
+    subscription.close()
+
+
+def shard_worker_main():
+    """Entry point of one executor shard process"""
+    from algorithm_executor import AlgorithmExecutor, DeploymentConfig
+
+    host, port = os.environ[SHARD_ADDRESS_ENV].rsplit(":", 1)
+    channel = FrameChannel(socket.create_connection((host, int(port))))
+    send_lock = threading.Lock()
+
+    def send(message: Dict[str, Any]):
+        try:
+            with send_lock:
+                channel.send(message)
+        except OSError:
+            pass
+
+    channel.send({"token": os.environ.get(SHARD_TOKEN_ENV)})
+    node_id = os.environ.get(NODE_ID_ENV)
+    executor = AlgorithmExecutor(node_id=f"{node_id}-shard{os.environ[SHARD_INDEX_ENV]}" if node_id else None)
+
+    threading.Thread(target=forward_events, args=(executor, send), name="shard-events", daemon=True).start()
+    executor.resume_in_background()
+
+    def logs_wait(algorithm_id: str, after: int, wait_timeout: float) -> bool:
+        log = executor.logs.get(algorithm_id, create=False)
+        return log is not None and log.wait(after, wait_timeout)
+
+    handlers = {
+        "ids": lambda: list(executor.deployments),
+        "deploy": lambda config: executor.deploy_algorithm(DeploymentConfig(**config)),
+        "adopt": lambda config, history: executor.adopt_deployment(DeploymentConfig(**config), history),
+        "stop": lambda algorithm_id: executor.stop_algorithm(algorithm_id),
+        "deploy_many": lambda configs: executor.deploy_algorithms([DeploymentConfig(**config) for config in configs]),
+        "stop_many": lambda algorithm_ids: executor.stop_algorithms(algorithm_ids),
+        "is_running": lambda algorithm_id: executor.is_running(algorithm_id),
+        "status": lambda algorithm_id, include_code: executor.serialized_deployment(algorithm_id, include_code),
+        "list": lambda include_code: executor.serialized_deployments(include_code),
+        "trades": lambda algorithm_id, before, limit: executor.get_trade_results(algorithm_id, before, limit),
+        "runs": lambda algorithm_id, before, limit: executor.get_runs(algorithm_id, before, limit),
+        "query": lambda **page: executor.query_deployments(**page),
+        "running_count": lambda: executor.running_count(),
+        "reconcile": lambda: executor.reconcile(),
+        "metrics": lambda: executor.render_metrics(),
+        "logs_read": lambda algorithm_id, since, limit: executor.logs.read(algorithm_id, since, limit),
+        "logs_wait": logs_wait,
+        "logs_exists": lambda algorithm_id: executor.logs.get(algorithm_id, create=False) is not None,
+    }
+
+    def handle(message: Dict[str, Any]):
+        reply = {"type": "reply", "id": message.get("id")}
+        try:
+            reply["result"] = handlers[message["op"]](**message.get("args", {}))
+        except Exception as e:
+            reply["error"] = f"{type(e).__name__}: {e}"
+        send(reply)
+
+    pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="shard-request")
+    try:
+        while True:
+            message = channel.recv()
+            if message.get("op") == "shutdown":
+                break
+            pool.submit(handle, message)
+    except (OSError, ValueError, ConnectionError):
+        logger.warning("Supervisor connection lost; shutting down")
+    finally:
+        pool.shutdown(wait=False)
+        executor.close()
+        channel.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded Algorithm Executor")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1,
+                        help="Number of executor processes (default: one per core)")
+    parser.add_argument("--directory", default="shards", help="Directory holding each shard's state")
+    parser.add_argument("--kite-root", default=None,
+                        help=f"Kite API base URL (default: ${KITE_ROOT_ENV} or api.kite.trade)")
+    parser.add_argument("--shard-worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.shard_worker:
+        shard_worker_main()
+        return
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    executor = ShardedExecutor(args.shards, args.directory, kite_root=args.kite_root)
+    try:
+        while True:
+            time.sleep(10)
+            executor.reconcile()
+    except KeyboardInterrupt:
+        logger.info("Shutting down sharded executor")
+    finally:
+        executor.close()
+
+
+if __name__ == "__main__":
+    main()
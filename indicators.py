@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+"""
+Incremental Indicators
+O(1)-per-tick technical indicators over array-backed ring buffers, with
+NumPy batch versions used to warm them up from history
+"""
+
+import os
+import math
+import pickle
+import logging
+import datetime
+from array import array
+from collections import deque
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# NumPy batch versions (NaN until the indicator has enough data)
+# ---------------------------------------------------------------------------
+
+def _recursive_filter(values: np.ndarray, alpha: float, initial: float) -> np.ndarray:
+    """y[t] = (1 - alpha) * y[t-1] + alpha * x[t], vectorized block by block.
+
+    Blocks are sized so the decay powers inside one block stay well within
+    float range, which keeps the closed form numerically stable.
+    """
+    decay = 1.0 - alpha
+    out = np.empty(len(values), dtype=np.float64)
+    if decay <= 0.0:
+        out[:] = values
+        return out
+    block = max(1, int(27.6 / -math.log(decay))) if decay < 1.0 else len(values)
+    previous = initial
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        weighted = np.cumsum(chunk / powers) * powers
+        out[start:start + len(chunk)] = powers * previous + alpha * weighted
+        previous = out[start + len(chunk) - 1]
+    return out
+
+
+def sma(values: Iterable[float], period: int) -> np.ndarray:
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if len(x) >= period:
+        sums = np.cumsum(np.insert(x, 0, 0.0))
+        out[period - 1:] = (sums[period:] - sums[:-period]) / period
+    return out
+
+
+def ema(values: Iterable[float], period: int) -> np.ndarray:
+    """EMA seeded with the SMA of the first `period` values"""
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if len(x) >= period:
+        seed = x[:period].mean()
+        out[period - 1] = seed
+        out[period:] = _recursive_filter(x[period:], 2.0 / (period + 1), seed)
+    return out
+
+
+def _wilder(values: np.ndarray, period: int) -> np.ndarray:
+    """Wilder smoothing seeded with the mean of the first `period` values"""
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        seed = values[:period].mean()
+        out[period - 1] = seed
+        out[period:] = _recursive_filter(values[period:], 1.0 / period, seed)
+    return out
+
+
+def _rsi_from_averages(avg_gain: np.ndarray, avg_loss: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+
+
+def rsi(values: Iterable[float], period: int = 14) -> np.ndarray:
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if len(x) > period:
+        change = np.diff(x)
+        avg_gain = _wilder(np.clip(change, 0, None), period)
+        avg_loss = _wilder(np.clip(-change, 0, None), period)
+        out[1:] = _rsi_from_averages(avg_gain, avg_loss)
+    return out
+
+
+def true_range(high: Iterable[float], low: Iterable[float], close: Iterable[float]) -> np.ndarray:
+    h, l, c = (np.asarray(v, dtype=np.float64) for v in (high, low, close))
+    previous = np.concatenate(([np.nan], c[:-1]))
+    return np.fmax(h - l, np.fmax(np.abs(h - previous), np.abs(l - previous)))
+
+
+def atr(high: Iterable[float], low: Iterable[float], close: Iterable[float], period: int = 14) -> np.ndarray:
+    return _wilder(true_range(high, low, close), period)
+
+
+def vwap(prices: Iterable[float], volumes: Iterable[float],
+         timestamps: Optional[Iterable[float]] = None) -> np.ndarray:
+    """Cumulative VWAP, restarting each calendar day when timestamps are given"""
+    p, v = np.asarray(prices, dtype=np.float64), np.asarray(volumes, dtype=np.float64)
+    pv, cv = np.cumsum(p * v), np.cumsum(v)
+    if timestamps is not None and len(p):
+        days = np.array([datetime.date.fromtimestamp(t).toordinal() for t in timestamps])
+        starts = np.flatnonzero(np.diff(days, prepend=days[0] - 1))
+        session = np.repeat(starts, np.diff(np.append(starts, len(p))))
+        pv = pv - np.concatenate(([0.0], pv))[session]
+        cv = cv - np.concatenate(([0.0], cv))[session]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(cv > 0, pv / cv, np.nan)
+
+
+def rolling_max(values: Iterable[float], period: int) -> np.ndarray:
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if len(x) >= period:
+        out[period - 1:] = np.lib.stride_tricks.sliding_window_view(x, period).max(axis=1)
+    return out
+
+
+def rolling_min(values: Iterable[float], period: int) -> np.ndarray:
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if len(x) >= period:
+        out[period - 1:] = np.lib.stride_tricks.sliding_window_view(x, period).min(axis=1)
+    return out
+
+
+def bollinger(values: Iterable[float], period: int = 20,
+              width: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(middle, upper, lower) bands using the population standard deviation"""
+    x = np.asarray(values, dtype=np.float64)
+    middle = sma(x, period)
+    mean_sq = sma(x * x, period)
+    std = np.sqrt(np.maximum(mean_sq - middle * middle, 0.0))
+    return middle, middle + width * std, middle - width * std
+
+
+# ---------------------------------------------------------------------------
+# Incremental versions: update() is O(1) per tick
+# ---------------------------------------------------------------------------
+
+class RingBuffer:
+    """Fixed-size circular buffer of floats backed by array('d')"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.data = array("d", bytes(8 * size))
+        self.head = 0
+        self.count = 0
+
+    def push(self, value: float) -> Optional[float]:
+        """Append a value; returns the value it displaced once the buffer is full"""
+        evicted = self.data[self.head] if self.count == self.size else None
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        return evicted
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.size
+
+    def values(self) -> np.ndarray:
+        """Contents, oldest first"""
+        data = np.frombuffer(self.data, dtype=np.float64)
+        if self.count < self.size:
+            return data[:self.count].copy()
+        return np.concatenate((data[self.head:], data[:self.head]))
+
+
+class SMA:
+    def __init__(self, period: int):
+        self.period = period
+        self.window = RingBuffer(period)
+        self.total = 0.0
+        self.value: Optional[float] = None
+
+    def update(self, price: float) -> Optional[float]:
+        evicted = self.window.push(price)
+        self.total += price - (evicted or 0.0)
+        if self.window.full:
+            self.value = self.total / self.period
+        return self.value
+
+    def warm_up(self, prices: Iterable[float]) -> "SMA":
+        x = np.asarray(prices, dtype=np.float64)[-self.period:]
+        for price in x:
+            self.window.push(float(price))
+        self.total = float(self.window.values().sum())
+        self.value = self.total / self.period if self.window.full else None
+        return self
+
+
+class EMA:
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.seed = SMA(period)
+        self.value: Optional[float] = None
+
+    def update(self, price: float) -> Optional[float]:
+        if self.value is None:
+            self.value = self.seed.update(price)
+        else:
+            self.value += self.alpha * (price - self.value)
+        return self.value
+
+    def warm_up(self, prices: Iterable[float]) -> "EMA":
+        x = np.asarray(prices, dtype=np.float64)
+        if self.value is None and len(x) < self.period:
+            for price in x:
+                self.update(float(price))
+        elif self.value is None:
+            self.value = float(ema(x, self.period)[-1])
+        else:
+            self.value = float(_recursive_filter(x, self.alpha, self.value)[-1]) if len(x) else self.value
+        return self
+
+
+class RSI:
+    """Wilder's RSI"""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.previous: Optional[float] = None
+        self.gains = SMA(period)
+        self.losses = SMA(period)
+        self.avg_gain: Optional[float] = None
+        self.avg_loss: Optional[float] = None
+        self.value: Optional[float] = None
+
+    def update(self, price: float) -> Optional[float]:
+        if self.previous is None:
+            self.previous = price
+            return None
+        change, self.previous = price - self.previous, price
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        if self.avg_gain is None:
+            self.avg_gain, self.avg_loss = self.gains.update(gain), self.losses.update(loss)
+            if self.avg_gain is None:
+                return None
+        else:
+            self.avg_gain += (gain - self.avg_gain) / self.period
+            self.avg_loss += (loss - self.avg_loss) / self.period
+        self.value = 100.0 if self.avg_loss == 0 else 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+        return self.value
+
+    def warm_up(self, prices: Iterable[float]) -> "RSI":
+        x = np.asarray(prices, dtype=np.float64)
+        if self.previous is not None or len(x) <= self.period:
+            for price in x:
+                self.update(float(price))
+            return self
+        change = np.diff(x)
+        self.avg_gain = float(_wilder(np.clip(change, 0, None), self.period)[-1])
+        self.avg_loss = float(_wilder(np.clip(-change, 0, None), self.period)[-1])
+        self.previous = float(x[-1])
+        self.value = float(_rsi_from_averages(np.array([self.avg_gain]), np.array([self.avg_loss]))[0])
+        return self
+
+
+class ATR:
+    """Wilder's average true range"""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.previous_close: Optional[float] = None
+        self.seed = SMA(period)
+        self.value: Optional[float] = None
+
+    def update(self, high: float, low: float, close: float) -> Optional[float]:
+        if self.previous_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.previous_close), abs(low - self.previous_close))
+        self.previous_close = close
+        if self.value is None:
+            self.value = self.seed.update(tr)
+        else:
+            self.value += (tr - self.value) / self.period
+        return self.value
+
+    def warm_up(self, high: Iterable[float], low: Iterable[float], close: Iterable[float]) -> "ATR":
+        h, l, c = (np.asarray(v, dtype=np.float64) for v in (high, low, close))
+        if self.previous_close is not None or len(c) < self.period:
+            for values in zip(h, l, c):
+                self.update(*map(float, values))
+            return self
+        tr = true_range(h, l, c)
+        tr[0] = h[0] - l[0]
+        self.value = float(_wilder(tr, self.period)[-1])
+        self.previous_close = float(c[-1])
+        return self
+
+
+class VWAP:
+    """Session VWAP; restarts when the calendar day of the timestamp changes"""
+
+    def __init__(self):
+        self.day: Optional[int] = None
+        self.pv = 0.0
+        self.volume = 0.0
+        self.value: Optional[float] = None
+
+    def update(self, price: float, volume: float, timestamp: Optional[float] = None) -> Optional[float]:
+        day = datetime.date.fromtimestamp(timestamp).toordinal() if timestamp is not None else self.day
+        if day != self.day:
+            self.day, self.pv, self.volume = day, 0.0, 0.0
+        self.pv += price * volume
+        self.volume += volume
+        if self.volume > 0:
+            self.value = self.pv / self.volume
+        return self.value
+
+    def warm_up(self, prices: Iterable[float], volumes: Iterable[float],
+                timestamps: Optional[Iterable[float]] = None) -> "VWAP":
+        p, v = np.asarray(prices, dtype=np.float64), np.asarray(volumes, dtype=np.float64)
+        if timestamps is not None and len(p):
+            t = np.asarray(timestamps, dtype=np.float64)
+            self.day = datetime.date.fromtimestamp(t[-1]).toordinal()
+            days = np.array([datetime.date.fromtimestamp(ts).toordinal() for ts in t])
+            today = days == self.day
+            p, v = p[today], v[today]
+            self.pv, self.volume = 0.0, 0.0
+        self.pv += float(np.dot(p, v))
+        self.volume += float(v.sum())
+        self.value = self.pv / self.volume if self.volume > 0 else None
+        return self
+
+
+class _RollingExtreme:
+    """Rolling max/min via a monotonic deque: amortized O(1) per update"""
+
+    def __init__(self, period: int, sign: float):
+        self.period = period
+        self.sign = sign  # +1 for max, -1 for min
+        self.index = 0
+        self.candidates: deque = deque()
+        self.value: Optional[float] = None
+
+    def update(self, price: float) -> Optional[float]:
+        key = self.sign * price
+        while self.candidates and self.candidates[-1][1] <= key:
+            self.candidates.pop()
+        self.candidates.append((self.index, key))
+        if self.candidates[0][0] <= self.index - self.period:
+            self.candidates.popleft()
+        self.index += 1
+        if self.index >= self.period:
+            self.value = self.sign * self.candidates[0][1]
+        return self.value
+
+    def warm_up(self, prices: Iterable[float]) -> "_RollingExtreme":
+        x = np.asarray(prices, dtype=np.float64)
+        # Only the last `period` values can still matter
+        self.index += max(0, len(x) - self.period)
+        self.candidates.clear()
+        for price in x[-self.period:]:
+            self.update(float(price))
+        return self
+
+
+class RollingMax(_RollingExtreme):
+    def __init__(self, period: int):
+        super().__init__(period, 1.0)
+
+
+class RollingMin(_RollingExtreme):
+    def __init__(self, period: int):
+        super().__init__(period, -1.0)
+
+
+class BollingerBands:
+    """(middle, upper, lower) from running sums over a ring buffer"""
+
+    def __init__(self, period: int = 20, width: float = 2.0):
+        self.period = period
+        self.width = width
+        self.window = RingBuffer(period)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.value: Optional[Tuple[float, float, float]] = None
+
+    def update(self, price: float) -> Optional[Tuple[float, float, float]]:
+        evicted = self.window.push(price)
+        if evicted is not None:
+            self.total -= evicted
+            self.total_sq -= evicted * evicted
+        self.total += price
+        self.total_sq += price * price
+        if self.window.full:
+            middle = self.total / self.period
+            std = math.sqrt(max(self.total_sq / self.period - middle * middle, 0.0))
+            self.value = (middle, middle + self.width * std, middle - self.width * std)
+        return self.value
+
+    def warm_up(self, prices: Iterable[float]) -> "BollingerBands":
+        for price in np.asarray(prices, dtype=np.float64)[-self.period:]:
+            self.window.push(float(price))
+        values = self.window.values()
+        self.total, self.total_sq = float(values.sum()), float(np.dot(values, values))
+        if self.window.full:
+            middle, upper, lower = (float(band[-1]) for band in bollinger(values, self.period, self.width))
+            self.value = (middle, upper, lower)
+        return self
+
+
+# Layout of the pickled state written by Indicators.save()
+STATE_VERSION = 1
+
+INDICATORS = {
+    "sma": SMA,
+    "ema": EMA,
+    "rsi": RSI,
+    "atr": ATR,
+    "vwap": VWAP,
+    "rolling_max": RollingMax,
+    "rolling_min": RollingMin,
+    "bollinger": BollingerBands,
+}
+
+
+class Indicators:
+    """Named indicator instances for one algorithm, persisted between runs.
+
+    indicators.sma("fast", 10) returns the same SMA on every run (creating
+    it the first time, warmed up from `history` if given), so a strategy
+    only feeds it the newest price. Asking for it with other parameters,
+    e.g. after a redeploy changed the period, replaces it with a fresh one.
+    save()/load() keep the state in a pickle file for runs that start a
+    fresh interpreter.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.items: Dict[Tuple[str, str], Any] = {}
+        # Constructor arguments each instance was built with
+        self.params: Dict[Tuple[str, str], Tuple] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "Indicators":
+        indicators = cls(path)
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    state = pickle.load(f)
+                if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+                    raise ValueError("unknown state format")
+                indicators.items, indicators.params = state["items"], state["params"]
+            except Exception as e:
+                logger.warning(f"Could not restore indicator state from {path}: {e}")
+        return indicators
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": STATE_VERSION, "items": self.items, "params": self.params}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def get(self, kind: str, name: str, *args, history: Optional[Any] = None, **kwargs):
+        key = (kind, name)
+        params = (args, tuple(sorted(kwargs.items())))
+        indicator = self.items.get(key)
+        if indicator is not None and self.params.get(key) != params:
+            logger.info(f"Rebuilding indicator {kind} '{name}' with parameters {args} {kwargs}")
+            indicator = None
+        if indicator is None:
+            indicator = self.items[key] = INDICATORS[kind](*args, **kwargs)
+            self.params[key] = params
+            if history is not None:
+                if isinstance(history, dict):
+                    indicator.warm_up(**history)
+                elif isinstance(history, (tuple, list)) and kind in ("atr", "vwap"):
+                    indicator.warm_up(*history)
+                else:
+                    indicator.warm_up(history)
+        return indicator
+
+    def sma(self, name: str, period: int, history=None) -> SMA:
+        return self.get("sma", name, period, history=history)
+
+    def ema(self, name: str, period: int, history=None) -> EMA:
+        return self.get("ema", name, period, history=history)
+
+    def rsi(self, name: str, period: int = 14, history=None) -> RSI:
+        return self.get("rsi", name, period, history=history)
+
+    def atr(self, name: str, period: int = 14, history=None) -> ATR:
+        return self.get("atr", name, period, history=history)
+
+    def vwap(self, name: str, history=None) -> VWAP:
+        return self.get("vwap", name, history=history)
+
+    def rolling_max(self, name: str, period: int, history=None) -> RollingMax:
+        return self.get("rolling_max", name, period, history=history)
+
+    def rolling_min(self, name: str, period: int, history=None) -> RollingMin:
+        return self.get("rolling_min", name, period, history=history)
+
+    def bollinger(self, name: str, period: int = 20, width: float = 2.0, history=None) -> BollingerBands:
+        return self.get("bollinger", name, period, width, history=history)
+
+    def reset(self, name: Optional[str] = None):
+        if name is None:
+            self.items.clear()
+            self.params.clear()
+        else:
+            for key in [key for key in self.items if key[1] == name]:
+                del self.items[key]
+                self.params.pop(key, None)
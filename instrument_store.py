@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Instrument Master Store
+Keeps the daily Kite instruments dump in a local SQLite index so symbol
+validation and contract rollover need no network round trip
+"""
+
+import os
+import sqlite3
+import logging
+import datetime
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from kite_sessions import shared_sessions
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent refreshes each download, but never share a temp file
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Path of the instrument master; executor shards point this at one shared file
+INSTRUMENTS_DB_ENV = "EXECUTOR_INSTRUMENTS_DB"
+
+COLUMNS = [
+    "instrument_token", "exchange_token", "tradingsymbol", "name", "last_price", "expiry",
+    "strike", "tick_size", "lot_size", "instrument_type", "segment", "exchange",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS instruments (
+    instrument_token INTEGER PRIMARY KEY,
+    exchange_token TEXT,
+    tradingsymbol TEXT NOT NULL,
+    name TEXT,
+    last_price REAL,
+    expiry TEXT,
+    strike REAL,
+    tick_size REAL,
+    lot_size INTEGER,
+    instrument_type TEXT,
+    segment TEXT,
+    exchange TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_instruments_symbol ON instruments (exchange, tradingsymbol);
+CREATE INDEX IF NOT EXISTS idx_instruments_underlying ON instruments (name, exchange, instrument_type, expiry);
+"""
+
+
+class InstrumentStore:
+    """Local instrument master backed by a memory-mapped SQLite file.
+
+    With preload=True the "EXCHANGE:SYMBOL" -> instrument_token map is also
+    held in memory, making existence checks a dict lookup.
+
+    Several processes may share one file: a refresh holds an exclusive lock
+    on db_path + ".lock", and a process that finds today's dump already
+    written by another one just reopens it instead of downloading again.
+    """
+
+    def __init__(self, db_path: str = "instruments.db",
+                 session_factory: Callable[[str, str], Any] = shared_sessions.get,
+                 preload: bool = True):
+        self.db_path = db_path
+        self.session_factory = session_factory
+        self.preload = preload
+        self._tokens: Dict[str, int] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._open()
+
+    @property
+    def loaded(self) -> bool:
+        return self._conn is not None
+
+    @property
+    def trading_day(self) -> Optional[str]:
+        """Date of the dump currently on disk"""
+        with self._lock:
+            if self._conn is None:
+                return None
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'downloaded_on'").fetchone()
+            return row[0] if row else None
+
+    def is_stale(self) -> bool:
+        return self.trading_day != datetime.date.today().isoformat()
+
+    def refresh(self, api_key: str, access_token: str, force: bool = False) -> bool:
+        """Download today's dump unless it is already on disk"""
+        if not force and not self.is_stale():
+            return False
+
+        with open(f"{self.db_path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Another process may have written today's dump while we waited
+                self._reopen()
+                if not force and not self.is_stale():
+                    return False
+                return self._download(api_key, access_token)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _download(self, api_key: str, access_token: str) -> bool:
+        """Write the dump to a private temp file and swap it in (refresh lock held)"""
+        kite = self.session_factory(api_key, access_token)
+        records = kite.instruments()
+
+        tmp_path = f"{self.db_path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.executescript(SCHEMA)
+            conn.executemany(
+                f"INSERT OR REPLACE INTO instruments ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                (self._row(record) for record in records)
+            )
+            conn.execute("INSERT INTO meta VALUES ('downloaded_on', ?)", (datetime.date.today().isoformat(),))
+            conn.commit()
+        finally:
+            conn.close()
+
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            os.replace(tmp_path, self.db_path)
+        self._open()
+        logger.info(f"Instrument master refreshed with {len(records)} instruments")
+        return True
+
+    def refresh_async(self, api_key: str, access_token: str):
+        """Refresh in the background if today's dump is missing"""
+        if self._refreshing or not self.is_stale():
+            return
+
+        def run():
+            try:
+                self.refresh(api_key, access_token)
+            except Exception as e:
+                logger.error(f"Error refreshing instrument master: {e}")
+            finally:
+                self._refreshing = False
+
+        self._refreshing = True
+        threading.Thread(target=run, name="instrument-refresh", daemon=True).start()
+
+    def exists(self, instrument: str) -> Optional[bool]:
+        """True/False for an "EXCHANGE:SYMBOL" instrument, None if no dump is loaded"""
+        if not self.loaded:
+            return None
+        if self.preload:
+            return instrument in self._tokens
+        return self.lookup(instrument) is not None
+
+    def lookup(self, instrument: str) -> Optional[Dict[str, Any]]:
+        """Instrument record for "EXCHANGE:SYMBOL" """
+        exchange, _, tradingsymbol = instrument.partition(":")
+        if self.preload:
+            token = self._tokens.get(instrument)
+            return self.by_token(token) if token is not None else None
+        return self._query_one("SELECT * FROM instruments WHERE exchange = ? AND tradingsymbol = ?",
+                               (exchange, tradingsymbol))
+
+    def by_token(self, instrument_token: int) -> Optional[Dict[str, Any]]:
+        return self._query_one("SELECT * FROM instruments WHERE instrument_token = ?", (instrument_token,))
+
+    def nearest_expiry(self, underlying: str, exchange: str = "NFO", instrument_type: str = "FUT",
+                       on_or_after: Optional[datetime.date] = None) -> Optional[Dict[str, Any]]:
+        """Contract of `underlying` with the nearest expiry that has not passed yet"""
+        day = (on_or_after or datetime.date.today()).isoformat()
+        return self._query_one(
+            "SELECT * FROM instruments WHERE name = ? AND exchange = ? AND instrument_type = ? "
+            "AND expiry >= ? ORDER BY expiry LIMIT 1",
+            (underlying, exchange, instrument_type, day)
+        )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _reopen(self):
+        self.close()
+        self._open()
+
+    def _open(self):
+        if not os.path.exists(self.db_path):
+            return
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA mmap_size = 268435456")
+        conn.execute("PRAGMA query_only = ON")
+        tokens = {}
+        if self.preload:
+            tokens = {f"{exchange}:{symbol}": token for token, exchange, symbol in
+                      conn.execute("SELECT instrument_token, exchange, tradingsymbol FROM instruments")}
+        with self._lock:
+            self._conn = conn
+            self._tokens = tokens
+
+    def _query_one(self, sql: str, params: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._conn is None:
+                return None
+            row = self._conn.execute(sql, params).fetchone()
+        return dict(row) if row is not None else None
+
+    @staticmethod
+    def _row(record: Dict[str, Any]) -> List[Any]:
+        row = [record.get(column) for column in COLUMNS]
+        expiry = record.get("expiry")
+        row[COLUMNS.index("expiry")] = expiry.isoformat() if hasattr(expiry, "isoformat") else (expiry or None)
+        return row
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Shared KiteConnect Sessions
+Registry of pooled KiteConnect clients keyed by (api_key, access_token) so
+the API server, executor and algorithm workers reuse keep-alive connections
+"""
+
+import os
+import time
+import logging
+import datetime
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+from kiteconnect import KiteConnect
+
+logger = logging.getLogger(__name__)
+
+# Base URL of the Kite REST API; set it to a kite_stub_server.py address for paper trading
+KITE_ROOT_ENV = "KITE_API_ROOT"
+
+
+class _PooledSession:
+    """A KiteConnect client together with its last use time"""
+
+    def __init__(self, kite: KiteConnect):
+        self.kite = kite
+        self.last_used = time.monotonic()
+
+
+class KiteSessionRegistry:
+    """Hands out one shared KiteConnect client per set of credentials.
+
+    Each client owns a requests.Session with a keep-alive connection pool.
+    Sessions that have not been used for idle_timeout seconds are closed.
+    Profiles of verified access tokens are remembered until the end of the
+    day, since Kite access tokens do not outlive the trading day.
+    """
+
+    def __init__(self, idle_timeout: float = 900.0, pool_connections: int = 4,
+                 pool_maxsize: int = 16, root: Optional[str] = None):
+        self.idle_timeout = idle_timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.root = root
+        self._sessions: Dict[Tuple[str, str], _PooledSession] = {}
+        # (api_key, access_token) -> (day it was verified, profile)
+        self._profiles: Dict[Tuple[str, str], Tuple[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        # Called with the new root whenever set_root changes it
+        self._root_listeners: List[Callable[[Optional[str]], None]] = []
+
+    def get(self, api_key: str, access_token: str) -> KiteConnect:
+        """Return the shared client for these credentials, creating it if needed"""
+        key = (api_key, access_token)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                entry = _PooledSession(self._create(api_key, access_token))
+                self._sessions[key] = entry
+            entry.last_used = now
+
+            if now - self._last_sweep > self.idle_timeout / 4:
+                self._evict_idle_locked(now)
+            return entry.kite
+
+    def verified_profile(self, api_key: str, access_token: str) -> Optional[Dict[str, Any]]:
+        """Profile remembered for these credentials today, if any"""
+        with self._lock:
+            entry = self._profiles.get((api_key, access_token))
+        if entry is None or entry[0] != datetime.date.today().isoformat():
+            return None
+        return entry[1]
+
+    def remember_profile(self, api_key: str, access_token: str, profile: Dict[str, Any]):
+        """Record that the broker accepted these credentials today"""
+        today = datetime.date.today().isoformat()
+        with self._lock:
+            self._profiles = {key: entry for key, entry in self._profiles.items() if entry[0] == today}
+            self._profiles[(api_key, access_token)] = (today, profile)
+
+    def set_root(self, root: Optional[str]):
+        """Send new sessions to another API base URL, closing the existing ones"""
+        if root != self.root:
+            self.root = root
+            self.close_all()
+            with self._lock:
+                self._profiles.clear()
+                listeners = list(self._root_listeners)
+            logger.info(f"Kite API root set to {root or 'the default'}")
+            for listener in listeners:
+                try:
+                    listener(root)
+                except Exception as e:
+                    logger.error(f"Error applying new Kite API root: {e}")
+
+    def add_root_listener(self, listener: Callable[[Optional[str]], None]):
+        with self._lock:
+            self._root_listeners.append(listener)
+
+    def remove_root_listener(self, listener: Callable[[Optional[str]], None]):
+        with self._lock:
+            if listener in self._root_listeners:
+                self._root_listeners.remove(listener)
+
+    def discard(self, api_key: str, access_token: str):
+        """Drop a session, e.g. after the broker rejected its access token"""
+        with self._lock:
+            entry = self._sessions.pop((api_key, access_token), None)
+            self._profiles.pop((api_key, access_token), None)
+        if entry is not None:
+            self._close(entry)
+
+    def evict_idle(self) -> int:
+        """Close sessions idle for longer than idle_timeout; returns how many"""
+        with self._lock:
+            return self._evict_idle_locked(time.monotonic())
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._sessions.values())
+            self._sessions.clear()
+        for entry in entries:
+            self._close(entry)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _create(self, api_key: str, access_token: str) -> KiteConnect:
+        kite = KiteConnect(api_key=api_key, root=self.root)
+        kite.set_access_token(access_token)
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        kite.reqsession.mount("https://", adapter)
+        kite.reqsession.mount("http://", adapter)
+        return kite
+
+    def _evict_idle_locked(self, now: float) -> int:
+        self._last_sweep = now
+        idle = [key for key, entry in self._sessions.items() if now - entry.last_used > self.idle_timeout]
+        for key in idle:
+            self._close(self._sessions.pop(key))
+        if idle:
+            logger.info(f"Evicted {len(idle)} idle Kite sessions")
+        return len(idle)
+
+    @staticmethod
+    def _close(entry: _PooledSession):
+        try:
+            entry.kite.reqsession.close()
+        except Exception:
+            pass
+
+
+# Process-wide registry shared by the API server and the executor
+shared_sessions = KiteSessionRegistry(root=os.environ.get(KITE_ROOT_ENV) or None)
@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+"""
+Kite Paper Exchange
+Local stand-in for the Kite Connect REST endpoints used by this project,
+with a matching engine, configurable latency, price paths and fill rules,
+so executors and algorithms can be exercised and load-tested offline
+"""
+
+import csv
+import json
+import heapq
+import random
+import threading
+import time
+import uuid
+import zlib
+import datetime
+import argparse
+import calendar
+from collections import deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Dict, Any, List, Optional, Tuple
+
+TICK_SIZE = 0.05
+
+
+def _round_tick(price: float) -> float:
+    return round(max(TICK_SIZE, round(price / TICK_SIZE) * TICK_SIZE), 2)
+
+
+def _now() -> str:
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class PricePath:
+    """Produces the next last price of an instrument on every exchange tick"""
+
+    def start(self, instrument: str, base_price: float) -> float:
+        return base_price
+
+    def step(self, instrument: str, last: float) -> float:
+        raise NotImplementedError
+
+
+class RandomWalk(PricePath):
+    """Multiplicative random walk: each tick moves by up to +/- `volatility`"""
+
+    def __init__(self, volatility: float = 0.001, drift: float = 0.0, seed: Optional[int] = None):
+        self.volatility = volatility
+        self.drift = drift
+        self.random = random.Random(seed)
+
+    def step(self, instrument: str, last: float) -> float:
+        return _round_tick(last * (1 + self.drift + self.random.uniform(-self.volatility, self.volatility)))
+
+
+class ConstantPrice(PricePath):
+    def step(self, instrument: str, last: float) -> float:
+        return last
+
+
+class ReplayPath(PricePath):
+    """Replays prices from a CSV, looping at the end.
+
+    Rows need a `last_price` or `close` column; an optional `instrument`
+    column ("EXCHANGE:SYMBOL") gives instruments their own series, and
+    instruments without one follow the rows that have no instrument.
+    """
+
+    def __init__(self, path: str):
+        self.series: Dict[str, List[float]] = {}
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                price = row.get("last_price") or row.get("close")
+                if price:
+                    self.series.setdefault(row.get("instrument") or "", []).append(float(price))
+        if not self.series:
+            raise ValueError(f"No prices in {path}")
+        self.position: Dict[str, int] = {}
+
+    def _series(self, instrument: str) -> List[float]:
+        return self.series.get(instrument) or self.series.get("") or next(iter(self.series.values()))
+
+    def start(self, instrument: str, base_price: float) -> float:
+        self.position[instrument] = 0
+        return self._series(instrument)[0]
+
+    def step(self, instrument: str, last: float) -> float:
+        series = self._series(instrument)
+        index = (self.position.get(instrument, 0) + 1) % len(series)
+        self.position[instrument] = index
+        return series[index]
+
+
+def make_price_path(spec: str, volatility: float = 0.001, seed: Optional[int] = None) -> PricePath:
+    """"random", "constant" or "replay:<file.csv>" as a PricePath"""
+    if spec == "constant":
+        return ConstantPrice()
+    if spec.startswith("replay:"):
+        return ReplayPath(spec[len("replay:"):])
+    if spec == "random":
+        return RandomWalk(volatility, seed=seed)
+    raise ValueError(f"Unknown price path: {spec}")
+
+
+@dataclass
+class FillRules:
+    """How the exchange fills orders against the simulated price"""
+    spread: float = 0.10           # Bid/ask spread around the last price
+    slippage_bps: float = 0.0      # Extra adverse slippage on market fills
+    depth: int = 0                 # Quantity available per side per tick (0 = unlimited)
+    reject_rate: float = 0.0       # Probability an order is rejected outright
+    fill_latency: float = 0.0      # Seconds before a new order can first be matched
+
+
+class StubBroker:
+    """Paper exchange state shared by all requests.
+
+    Every instrument has a last price driven by a PricePath. The matching
+    engine keeps resting orders per instrument in price-time priority and
+    matches them on each exchange tick against the touch (last price +/-
+    half the spread), filling at most FillRules.depth per side per tick, so
+    large or aggressive flow sees partial fills. Marketable orders with no
+    fill latency are matched as soon as they arrive.
+    """
+
+    def __init__(self, base_price: float = 21500.0, seed: Optional[int] = None,
+                 order_rate_limit: int = 0, price_path: Optional[PricePath] = None,
+                 fill_rules: Optional[FillRules] = None, tick_interval: float = 0.0):
+        self.base_price = base_price
+        self.random = random.Random(seed)
+        self.price_path = price_path or RandomWalk(seed=seed)
+        self.fill_rules = fill_rules or FillRules()
+        self.tick_interval = tick_interval
+        self.prices: Dict[str, float] = {}
+        self.orders: List[Dict[str, Any]] = []
+        self.orders_by_id: Dict[str, Dict[str, Any]] = {}
+        # Resting orders per instrument: (priority key, seq, order)
+        self.books: Dict[str, Tuple[list, list]] = {}
+        self.order_rate_limit = order_rate_limit
+        self.order_times: Dict[str, deque] = {}
+        self.rejected_orders = 0
+        self.fills = 0
+        self.started = time.monotonic()
+        self._seq = 0
+        self.lock = threading.RLock()
+        self._closed = threading.Event()
+        if tick_interval > 0:
+            threading.Thread(target=self._tick_loop, name="paper-exchange", daemon=True).start()
+
+    def close(self):
+        self._closed.set()
+
+    def allow_order(self, api_key: str) -> bool:
+        """Enforce the per-key orders-per-second limit, like the real API"""
+        if not self.order_rate_limit:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            times = self.order_times.setdefault(api_key, deque())
+            while times and now - times[0] >= 1.0:
+                times.popleft()
+            if len(times) >= self.order_rate_limit:
+                self.rejected_orders += 1
+                return False
+            times.append(now)
+            return True
+
+    def price(self, instrument: str) -> float:
+        """Last price of an "EXCHANGE:SYMBOL" instrument.
+
+        Without a tick thread, every read is an exchange tick: the path
+        advances and resting orders are matched.
+        """
+        if instrument not in self.prices:
+            self.prices[instrument] = self.price_path.start(instrument, self.base_price)
+            return self.prices[instrument]
+        if self.tick_interval <= 0:
+            self._tick(instrument)
+        return self.prices[instrument]
+
+    def touch(self, instrument: str) -> Tuple[float, float]:
+        """(bid, ask) around the last price"""
+        last = self.prices[instrument]
+        half = self.fill_rules.spread / 2
+        return _round_tick(last - half), _round_tick(last + half)
+
+    def quote(self, instruments: List[str]) -> Dict[str, Any]:
+        with self.lock:
+            depth = self.fill_rules.depth or 1_000_000
+            data = {}
+            for instrument in instruments:
+                last = self.price(instrument)
+                bid, ask = self.touch(instrument)
+                data[instrument] = {
+                    "instrument_token": zlib.crc32(instrument.encode("utf-8")) % 10_000_000,
+                    "timestamp": _now(),
+                    "last_price": last,
+                    "volume": self.random.randint(100_000, 2_000_000),
+                    "ohlc": {"open": last, "high": last, "low": last, "close": last},
+                    "depth": {"buy": [{"price": bid, "quantity": depth, "orders": 1}],
+                              "sell": [{"price": ask, "quantity": depth, "orders": 1}]},
+                }
+            return data
+
+    def ltp(self, instruments: List[str]) -> Dict[str, Any]:
+        return {k: {"instrument_token": v["instrument_token"], "last_price": v["last_price"]}
+                for k, v in self.quote(instruments).items()}
+
+    def place_order(self, variety: str, params: Dict[str, str]) -> Dict[str, Any]:
+        exchange = params.get("exchange", "NSE")
+        symbol = params.get("tradingsymbol", "")
+        instrument = f"{exchange}:{symbol}"
+        with self.lock:
+            self.price(instrument)
+            order = {
+                "order_id": uuid.uuid4().hex[:15],
+                "variety": variety,
+                "exchange": exchange,
+                "tradingsymbol": symbol,
+                "transaction_type": params.get("transaction_type", "BUY"),
+                "quantity": int(params.get("quantity", 0)),
+                "product": params.get("product", "MIS"),
+                "order_type": params.get("order_type", "MARKET"),
+                "price": float(params.get("price") or 0),
+                "trigger_price": float(params.get("trigger_price") or 0),
+                "tag": params.get("tag"),
+                "status": "OPEN",
+                "status_message": None,
+                "filled_quantity": 0,
+                "pending_quantity": int(params.get("quantity", 0)),
+                "cancelled_quantity": 0,
+                "average_price": 0.0,
+                "order_timestamp": _now(),
+                "exchange_timestamp": None,
+            }
+            self.orders.append(order)
+            self.orders_by_id[order["order_id"]] = order
+
+            if order["quantity"] <= 0:
+                self._reject(order, "Quantity should be greater than zero")
+            elif order["order_type"] in ("LIMIT", "SL") and order["price"] <= 0:
+                self._reject(order, "Price is required for LIMIT orders")
+            elif self.fill_rules.reject_rate and self.random.random() < self.fill_rules.reject_rate:
+                self._reject(order, "Simulated exchange rejection")
+            else:
+                if order["order_type"] in ("SL", "SL-M"):
+                    order["status"] = "TRIGGER PENDING"
+                order["_eligible_at"] = time.monotonic() + self.fill_rules.fill_latency
+                self._rest(instrument, order)
+                if not self.fill_rules.fill_latency:
+                    self._match(instrument)
+        return {"order_id": order["order_id"]}
+
+    def modify_order(self, order_id: str, params: Dict[str, str]) -> Dict[str, Any]:
+        with self.lock:
+            order = self._open_order(order_id)
+            if "quantity" in params:
+                quantity = int(params["quantity"])
+                if quantity < order["filled_quantity"]:
+                    raise ValueError("Quantity is less than the filled quantity")
+                order["quantity"] = quantity
+                order["pending_quantity"] = quantity - order["filled_quantity"]
+            for field in ("price", "trigger_price"):
+                if params.get(field):
+                    order[field] = float(params[field])
+            if params.get("order_type"):
+                order["order_type"] = params["order_type"]
+            instrument = f"{order['exchange']}:{order['tradingsymbol']}"
+            # A modified order loses its time priority
+            self._unrest(instrument, order)
+            self._rest(instrument, order)
+            self._match(instrument)
+        return {"order_id": order_id}
+
+    def cancel_order(self, order_id: str) -> Dict[str, Any]:
+        with self.lock:
+            order = self._open_order(order_id)
+            self._unrest(f"{order['exchange']}:{order['tradingsymbol']}", order)
+            order["cancelled_quantity"] = order["pending_quantity"]
+            order["pending_quantity"] = 0
+            order["status"] = "CANCELLED"
+        return {"order_id": order_id}
+
+    def order(self, order_id: str) -> Dict[str, Any]:
+        with self.lock:
+            order = self.orders_by_id.get(order_id)
+            if order is None:
+                raise KeyError(order_id)
+            return self._public(order)
+
+    def order_list(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [self._public(order) for order in self.orders]
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for load tests"""
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            by_status: Dict[str, int] = {}
+            for order in self.orders:
+                by_status[order["status"]] = by_status.get(order["status"], 0) + 1
+            return {
+                "orders": len(self.orders),
+                "by_status": by_status,
+                "fills": self.fills,
+                "rate_limited": self.rejected_orders,
+                "resting": sum(len(buys) + len(sells) for buys, sells in self.books.values()),
+                "instruments": len(self.prices),
+                "uptime_seconds": round(elapsed, 3),
+                "orders_per_second": round(len(self.orders) / elapsed, 2) if elapsed > 0 else 0.0,
+            }
+
+    # -- matching engine -------------------------------------------------
+
+    def _tick_loop(self):
+        while not self._closed.wait(self.tick_interval):
+            with self.lock:
+                for instrument in list(self.prices):
+                    self._tick(instrument)
+
+    def _tick(self, instrument: str):
+        self.prices[instrument] = self.price_path.step(instrument, self.prices[instrument])
+        if instrument in self.books:
+            self._match(instrument)
+
+    def _rest(self, instrument: str, order: Dict[str, Any]):
+        """Queue an order in price-time priority; market orders come first"""
+        self._seq += 1
+        buys, sells = self.books.setdefault(instrument, ([], []))
+        aggressive = order["order_type"] in ("MARKET", "SL-M")
+        if order["transaction_type"] == "BUY":
+            key = -float("inf") if aggressive else -order["price"]
+            heapq.heappush(buys, (key, self._seq, order))
+        else:
+            key = -float("inf") if aggressive else order["price"]
+            heapq.heappush(sells, (key, self._seq, order))
+
+    def _unrest(self, instrument: str, order: Dict[str, Any]):
+        buys, sells = self.books.get(instrument, ([], []))
+        for side in (buys, sells):
+            for i, entry in enumerate(side):
+                if entry[2] is order:
+                    side[i] = side[-1]
+                    side.pop()
+                    heapq.heapify(side)
+                    return
+
+    def _match(self, instrument: str):
+        """Fill marketable resting orders against the touch, best priority first"""
+        depth_used = {"BUY": 0, "SELL": 0}
+        buys, sells = self.books.get(instrument, ([], []))
+        bid, ask = self.touch(instrument)
+        last = self.prices[instrument]
+        now = time.monotonic()
+        for side, book, touch in (("BUY", buys, ask), ("SELL", sells, bid)):
+            deferred = []
+            while book:
+                depth_left = (self.fill_rules.depth - depth_used[side]) if self.fill_rules.depth else None
+                if depth_left is not None and depth_left <= 0:
+                    break
+                _, _, order = book[0]
+                if order["_eligible_at"] > now or not self._triggered(order, last):
+                    deferred.append(heapq.heappop(book))
+                    continue
+                price = self._fill_price(order, side, touch)
+                if price is None:
+                    # Best resting limit is not marketable, so none behind it is either
+                    break
+                quantity = order["pending_quantity"] if depth_left is None else min(order["pending_quantity"],
+                                                                                    depth_left)
+                self._fill(order, quantity, price)
+                depth_used[side] += quantity
+                if order["pending_quantity"] == 0:
+                    heapq.heappop(book)
+            for entry in deferred:
+                heapq.heappush(book, entry)
+
+    @staticmethod
+    def _triggered(order: Dict[str, Any], last: float) -> bool:
+        if order["order_type"] not in ("SL", "SL-M"):
+            return True
+        if order["transaction_type"] == "BUY":
+            triggered = last >= order["trigger_price"]
+        else:
+            triggered = last <= order["trigger_price"]
+        if triggered and order["status"] == "TRIGGER PENDING":
+            order["status"] = "OPEN"
+        return triggered
+
+    def _fill_price(self, order: Dict[str, Any], side: str, touch: float) -> Optional[float]:
+        if order["order_type"] in ("MARKET", "SL-M"):
+            slip = touch * self.fill_rules.slippage_bps / 10_000
+            return _round_tick(touch + slip if side == "BUY" else touch - slip)
+        if side == "BUY":
+            return touch if touch <= order["price"] else None
+        return touch if touch >= order["price"] else None
+
+    def _fill(self, order: Dict[str, Any], quantity: int, price: float):
+        filled = order["filled_quantity"]
+        order["average_price"] = round((order["average_price"] * filled + price * quantity) / (filled + quantity), 2)
+        order["filled_quantity"] = filled + quantity
+        order["pending_quantity"] -= quantity
+        order["exchange_timestamp"] = _now()
+        if order["pending_quantity"] == 0:
+            order["status"] = "COMPLETE"
+        self.fills += 1
+
+    def _reject(self, order: Dict[str, Any], message: str):
+        order["status"] = "REJECTED"
+        order["status_message"] = message
+        order["pending_quantity"] = 0
+
+    def _open_order(self, order_id: str) -> Dict[str, Any]:
+        order = self.orders_by_id.get(order_id)
+        if order is None:
+            raise KeyError(order_id)
+        if order["status"] not in ("OPEN", "TRIGGER PENDING"):
+            raise ValueError(f"Order is {order['status']} and can no longer be changed")
+        return order
+
+    @staticmethod
+    def _public(order: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in order.items() if not k.startswith("_")}
+
+    # -- reference data --------------------------------------------------
+
+    def instruments_csv(self) -> str:
+        """Small instruments dump: a few equities and three monthly index futures"""
+        rows = ["instrument_token,exchange_token,tradingsymbol,name,last_price,expiry,strike,"
+                "tick_size,lot_size,instrument_type,segment,exchange"]
+        for symbol in ("TCS", "INFY", "RELIANCE", "HDFCBANK", "SBIN"):
+            token = zlib.crc32(f"NSE:{symbol}".encode("utf-8")) % 10_000_000
+            rows.append(f"{token},{token // 256},{symbol},{symbol},0,,0,0.05,1,EQ,NSE,NSE")
+
+        today = datetime.date.today()
+        for name, lot_size in (("NIFTY", 50), ("BANKNIFTY", 15)):
+            year, month = today.year, today.month
+            for _ in range(3):
+                # Monthly index futures expire on the last Thursday of the month
+                last_day = datetime.date(year, month, calendar.monthrange(year, month)[1])
+                expiry = last_day - datetime.timedelta(days=(last_day.weekday() - 3) % 7)
+                if expiry >= today:
+                    symbol = f"{name}{expiry:%y}{expiry:%b}FUT".upper()
+                    token = zlib.crc32(f"NFO:{symbol}".encode("utf-8")) % 10_000_000
+                    rows.append(f"{token},{token // 256},{symbol},{name},0,{expiry.isoformat()},0,0.05,"
+                                f"{lot_size},FUT,NFO-FUT,NFO")
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return "\n".join(rows) + "\n"
+
+    def positions(self) -> Dict[str, Any]:
+        with self.lock:
+            book: Dict[tuple, Dict[str, Any]] = {}
+            for order in self.orders:
+                if not order["filled_quantity"]:
+                    continue
+                key = (order["exchange"], order["tradingsymbol"], order["product"])
+                pos = book.setdefault(key, {
+                    "exchange": key[0], "tradingsymbol": key[1], "product": key[2],
+                    "quantity": 0, "buy_quantity": 0, "sell_quantity": 0,
+                    "buy_value": 0.0, "sell_value": 0.0,
+                })
+                value = order["filled_quantity"] * order["average_price"]
+                if order["transaction_type"] == "BUY":
+                    pos["buy_quantity"] += order["filled_quantity"]
+                    pos["buy_value"] += value
+                else:
+                    pos["sell_quantity"] += order["filled_quantity"]
+                    pos["sell_value"] += value
+
+            net = []
+            for pos in book.values():
+                pos["quantity"] = pos["buy_quantity"] - pos["sell_quantity"]
+                last = self.price(f"{pos['exchange']}:{pos['tradingsymbol']}")
+                pos["last_price"] = last
+                pos["average_price"] = round(pos["buy_value"] / pos["buy_quantity"], 2) if pos["buy_quantity"] else 0.0
+                pos["pnl"] = round(pos["sell_value"] - pos["buy_value"] + pos["quantity"] * last, 2)
+                net.append(pos)
+            return {"net": net, "day": list(net)}
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Serves the Kite REST routes from the server's StubBroker"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        form = {}
+        if method in ("POST", "PUT"):
+            length = int(self.headers.get("Content-Length") or 0)
+            form = {k: v[-1] for k, v in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+
+        latency = self.server.latency
+        if self.server.jitter:
+            latency = max(0.0, latency + random.uniform(-self.server.jitter, self.server.jitter))
+        if latency:
+            time.sleep(latency)
+
+        broker: StubBroker = self.server.broker
+        path = url.path.rstrip("/")
+        parts = path.strip("/").split("/")
+        if method == "GET" and path == "/_stub/stats":
+            return self._send(200, {"status": "success", "data": broker.stats()})
+        if method == "POST" and path == "/session/token":
+            return self._send(200, {"status": "success", "data": {
+                "user_id": "STUB01", "user_name": "Stub User", "api_key": form.get("api_key", ""),
+                "access_token": uuid.uuid4().hex, "login_time": _now()}})
+
+        if not self.headers.get("Authorization", "").startswith("token "):
+            return self._send(403, {"status": "error", "error_type": "TokenException",
+                                    "message": "Incorrect `api_key` or `access_token`."})
+
+        try:
+            if method == "GET" and path == "/instruments":
+                return self._send_csv(broker.instruments_csv())
+            elif method == "GET" and path == "/user/profile":
+                data = {"user_id": "STUB01", "user_name": "Stub User", "broker": "ZERODHA"}
+            elif method == "GET" and path == "/user/margins":
+                data = {"equity": {"enabled": True, "net": 1_000_000.0}}
+            elif method == "GET" and path == "/quote":
+                data = broker.quote(query.get("i", []))
+            elif method == "GET" and path == "/quote/ltp":
+                data = broker.ltp(query.get("i", []))
+            elif method == "GET" and path == "/portfolio/positions":
+                data = broker.positions()
+            elif method == "GET" and path == "/orders":
+                data = broker.order_list()
+            elif method == "GET" and len(parts) == 2 and parts[0] == "orders":
+                data = [broker.order(parts[1])]
+            elif method == "POST" and len(parts) == 2 and parts[0] == "orders":
+                api_key = self.headers.get("Authorization", "")[len("token "):].split(":")[0]
+                if not broker.allow_order(api_key):
+                    return self._send(429, {"status": "error", "error_type": "NetworkException",
+                                            "message": "Too many requests"})
+                data = broker.place_order(parts[1], form)
+            elif method == "PUT" and len(parts) == 3 and parts[0] == "orders":
+                data = broker.modify_order(parts[2], form)
+            elif method == "DELETE" and len(parts) == 3 and parts[0] == "orders":
+                data = broker.cancel_order(parts[2])
+            else:
+                return self._send(404, {"status": "error", "error_type": "GeneralException",
+                                        "message": f"Route not found: {method} {url.path}"})
+        except KeyError as e:
+            return self._send(400, {"status": "error", "error_type": "InputException",
+                                    "message": f"Order not found: {e}"})
+        except ValueError as e:
+            return self._send(400, {"status": "error", "error_type": "InputException", "message": str(e)})
+        self._send(200, {"status": "success", "data": data})
+
+    def _send_csv(self, text: str):
+        payload = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send(self, status: int, body: Dict[str, Any]):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                      seed: Optional[int] = None, order_rate_limit: int = 0, jitter: float = 0.0,
+                      price_path: Optional[PricePath] = None, fill_rules: Optional[FillRules] = None,
+                      tick_interval: float = 0.0) -> ThreadingHTTPServer:
+    """Start the paper exchange on a background thread; server.root is its base URL"""
+    server = ThreadingHTTPServer((host, port), StubRequestHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.broker = StubBroker(seed=seed, order_rate_limit=order_rate_limit, price_path=price_path,
+                               fill_rules=fill_rules, tick_interval=tick_interval)
+    server.latency = latency
+    server.jitter = jitter
+    server.root = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Kite Connect paper exchange")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Artificial delay per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random +/- variation of the delay")
+    parser.add_argument("--order-rate-limit", type=int, default=0,
+                        help="Reject orders beyond this many per second per API key (Kite allows 10)")
+    parser.add_argument("--price-path", default="random", help="random, constant or replay:<file.csv>")
+    parser.add_argument("--volatility", type=float, default=0.001, help="Random walk step per tick")
+    parser.add_argument("--tick-ms", type=float, default=0.0,
+                        help="Advance prices on a timer (default: on every price read)")
+    parser.add_argument("--spread", type=float, default=0.10)
+    parser.add_argument("--slippage-bps", type=float, default=0.0)
+    parser.add_argument("--depth", type=int, default=0, help="Quantity filled per side per tick (0 = unlimited)")
+    parser.add_argument("--reject-rate", type=float, default=0.0)
+    parser.add_argument("--fill-latency-ms", type=float, default=0.0,
+                        help="Delay before a new order can be matched")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    fill_rules = FillRules(spread=args.spread, slippage_bps=args.slippage_bps, depth=args.depth,
+                           reject_rate=args.reject_rate, fill_latency=args.fill_latency_ms / 1000.0)
+    server = start_stub_server(args.host, args.port, latency=args.latency_ms / 1000.0, seed=args.seed,
+                               order_rate_limit=args.order_rate_limit, jitter=args.jitter_ms / 1000.0,
+                               price_path=make_price_path(args.price_path, args.volatility, args.seed),
+                               fill_rules=fill_rules, tick_interval=args.tick_ms / 1000.0)
+    print(f"Kite paper exchange listening on {server.root}")
+    print(f"Point the system at it with KITE_API_ROOT={server.root}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        server.broker.close()
+
+
+if __name__ == "__main__":
+    main()
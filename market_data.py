@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Market Data Subsystem
+One streaming connection per account writes ticks into a shared-memory ring
+buffer keyed by instrument token; algorithms read it without network calls
+"""
+
+import os
+import csv
+import json
+import time
+import struct
+import logging
+import argparse
+import threading
+from collections import namedtuple
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Tick = namedtuple("Tick", ["instrument_token", "timestamp", "last_price", "volume", "oi"])
+
+_HEADER = struct.Struct("<4sIII")  # magic, version, capacity, depth
+_TOKEN = struct.Struct("<Q")
+_SLOT_HEADER = struct.Struct("<QQ")  # seqlock version, ticks written
+_RECORD = struct.Struct("<ddqq")  # timestamp, last_price, volume, oi
+_MAGIC = b"TICK"
+_VERSION = 1
+
+
+class TickBuffer:
+    """Fixed-size ring of recent ticks per instrument in shared memory.
+
+    One process creates the buffer and is its only writer; any number of
+    processes attach by name and read. Every instrument slot is guarded by
+    a seqlock so readers never see a half-written tick.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.name = shm.name
+        magic, version, self.capacity, self.depth = _HEADER.unpack_from(shm.buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Shared memory block {shm.name} is not a tick buffer")
+        self._tokens_offset = _HEADER.size
+        self._slots_offset = self._tokens_offset + self.capacity * _TOKEN.size
+        self._slot_size = _SLOT_HEADER.size + self.depth * _RECORD.size
+        self._slot_cache: Dict[int, int] = {}
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def create(cls, name: Optional[str] = None, capacity: int = 1024, depth: int = 128) -> "TickBuffer":
+        size = _HEADER.size + capacity * _TOKEN.size + capacity * (_SLOT_HEADER.size + depth * _RECORD.size)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, capacity, depth)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "TickBuffer":
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            # Readers must not unlink the creator's block when they exit
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    def write(self, instrument_token: int, timestamp: float, last_price: float,
+              volume: int = 0, oi: int = 0):
+        with self._write_lock:
+            slot = self._slot(instrument_token, create=True)
+            if slot is None:
+                raise MemoryError("Tick buffer is full; increase capacity")
+            buf = self.shm.buf
+            version, written = _SLOT_HEADER.unpack_from(buf, slot)
+            _SLOT_HEADER.pack_into(buf, slot, version + 1, written)
+            _RECORD.pack_into(buf, slot + _SLOT_HEADER.size + (written % self.depth) * _RECORD.size,
+                              timestamp, last_price, int(volume), int(oi))
+            _SLOT_HEADER.pack_into(buf, slot, version + 2, written + 1)
+
+    def sequence(self, instrument_token: int) -> int:
+        """Number of ticks ever written for an instrument"""
+        slot = self._slot(instrument_token)
+        return _SLOT_HEADER.unpack_from(self.shm.buf, slot)[1] if slot is not None else 0
+
+    def latest(self, instrument_token: int) -> Optional[Tick]:
+        ticks = self.history(instrument_token, 1)
+        return ticks[0] if ticks else None
+
+    def history(self, instrument_token: int, count: int) -> List[Tick]:
+        """Up to `count` most recent ticks, oldest first"""
+        slot = self._slot(instrument_token)
+        if slot is None:
+            return []
+        buf = self.shm.buf
+        while True:
+            version, written = _SLOT_HEADER.unpack_from(buf, slot)
+            if version & 1:
+                time.sleep(0)
+                continue
+            n = min(count, written, self.depth)
+            records = [
+                _RECORD.unpack_from(buf, slot + _SLOT_HEADER.size + (i % self.depth) * _RECORD.size)
+                for i in range(written - n, written)
+            ]
+            if _SLOT_HEADER.unpack_from(buf, slot)[0] == version:
+                return [Tick(instrument_token, *record) for record in records]
+
+    def wait_for_update(self, instrument_token: int, after: int, timeout: float = 1.0,
+                        poll_interval: float = 0.001) -> int:
+        """Block until more than `after` ticks exist (or timeout); returns the sequence"""
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = self.sequence(instrument_token)
+            if seq > after or time.monotonic() >= deadline:
+                return seq
+            time.sleep(poll_interval)
+
+    def close(self):
+        self._slot_cache.clear()
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _slot(self, instrument_token: int, create: bool = False) -> Optional[int]:
+        cached = self._slot_cache.get(instrument_token)
+        if cached is not None:
+            return cached
+
+        buf = self.shm.buf
+        start = instrument_token % self.capacity
+        for probe in range(self.capacity):
+            index = (start + probe) % self.capacity
+            offset = self._tokens_offset + index * _TOKEN.size
+            (token,) = _TOKEN.unpack_from(buf, offset)
+            if token == 0:
+                if not create:
+                    return None
+                _TOKEN.pack_into(buf, offset, instrument_token)
+                token = instrument_token
+            if token == instrument_token:
+                slot = self._slots_offset + index * self._slot_size
+                self._slot_cache[instrument_token] = slot
+                return slot
+        return None
+
+
+def ticker_root(root: Optional[str]) -> Optional[str]:
+    """Websocket URL of the tick feed served alongside a Kite REST root (None: Kite's own feed)"""
+    if not root:
+        return None
+    if root.startswith("https://"):
+        return "wss://" + root[len("https://"):]
+    if root.startswith("http://"):
+        return "ws://" + root[len("http://"):]
+    return root
+
+
+class KiteTickerFeed:
+    """Streams ticks for one account from the Kite websocket into a TickBuffer"""
+
+    def __init__(self, api_key: str, access_token: str, buffer: TickBuffer,
+                 root: Optional[str] = None, on_tick: Optional[Callable[[Tick], None]] = None):
+        from kiteconnect import KiteTicker
+
+        self.buffer = buffer
+        self.on_tick = on_tick
+        self.tokens: set = set()
+        self.ticker = KiteTicker(api_key, access_token, root=root) if root else KiteTicker(api_key, access_token)
+        self.ticker.on_ticks = self._on_ticks
+        self.ticker.on_connect = self._on_connect
+        self.ticker.on_error = lambda ws, code, reason: logger.error(f"Tick feed error {code}: {reason}")
+
+    def start(self):
+        self.ticker.connect(threaded=True)
+
+    def subscribe(self, tokens: Iterable[int]):
+        new = set(tokens) - self.tokens
+        if not new:
+            return
+        self.tokens |= new
+        if self.ticker.is_connected():
+            self.ticker.subscribe(list(new))
+            self.ticker.set_mode(self.ticker.MODE_QUOTE, list(new))
+
+    def stop(self):
+        try:
+            self.ticker.close()
+        except Exception:
+            pass
+
+    def _on_connect(self, ws, response):
+        if self.tokens:
+            ws.subscribe(list(self.tokens))
+            ws.set_mode(ws.MODE_QUOTE, list(self.tokens))
+
+    def _on_ticks(self, ws, ticks: List[Dict[str, Any]]):
+        for tick in ticks:
+            timestamp = tick.get("exchange_timestamp") or tick.get("last_trade_time")
+            ts = timestamp.timestamp() if hasattr(timestamp, "timestamp") else time.time()
+            self.buffer.write(tick["instrument_token"], ts, tick.get("last_price", 0.0),
+                              tick.get("volume_traded", 0), tick.get("oi", 0))
+            if self.on_tick:
+                self.on_tick(self.buffer.latest(tick["instrument_token"]))
+
+
+class ReplayFeed:
+    """Feeds a TickBuffer from a CSV or JSON-lines tick file.
+
+    Each row needs instrument_token, timestamp (epoch seconds) and
+    last_price; volume and oi are optional. speed=0 replays as fast as
+    possible, speed=1 keeps the recorded spacing between ticks.
+    """
+
+    def __init__(self, path: str, buffer: TickBuffer, speed: float = 0.0,
+                 on_tick: Optional[Callable[[Tick], None]] = None):
+        self.path = path
+        self.buffer = buffer
+        self.speed = speed
+        self.on_tick = on_tick
+        self.count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="tick-replay", daemon=True)
+        self._thread.start()
+
+    def run(self) -> int:
+        first_ts = started = None
+        for token, ts, price, volume, oi in self._rows():
+            if self._stop.is_set():
+                break
+            if self.speed:
+                if first_ts is None:
+                    first_ts, started = ts, time.monotonic()
+                delay = (ts - first_ts) / self.speed - (time.monotonic() - started)
+                if delay > 0:
+                    self._stop.wait(delay)
+            self.buffer.write(token, ts, price, volume, oi)
+            self.count += 1
+            if self.on_tick:
+                self.on_tick(Tick(token, ts, price, volume, oi))
+        return self.count
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _rows(self) -> Iterator[Tuple[int, float, float, int, int]]:
+        with open(self.path, "r") as f:
+            if self.path.endswith((".jsonl", ".json")):
+                rows: Iterable[Dict[str, Any]] = (json.loads(line) for line in f if line.strip())
+            else:
+                rows = csv.DictReader(f)
+            for row in rows:
+                yield (int(row["instrument_token"]), float(row["timestamp"]), float(row["last_price"]),
+                       int(float(row.get("volume") or 0)), int(float(row.get("oi") or 0)))
+
+
+class MarketDataHub:
+    """Owns the shared tick buffer and one streaming feed per account.
+
+    root is the Kite REST root the accounts trade against; feeds stream from
+    the websocket on the same host, or Kite's own feed when it is None.
+    """
+
+    def __init__(self, capacity: int = 1024, depth: int = 128, root: Optional[str] = None):
+        self.buffer = TickBuffer.create(capacity=capacity, depth=depth)
+        self.root = root
+        self.feeds: Dict[Tuple[str, str], KiteTickerFeed] = {}
+        self.listeners: List[Callable[[Tick], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def buffer_name(self) -> str:
+        return self.buffer.name
+
+    def subscribe(self, api_key: str, access_token: str, tokens: Iterable[int]):
+        """Make sure the account's feed is running and streaming these tokens"""
+        key = (api_key, access_token)
+        with self._lock:
+            feed = self.feeds.get(key)
+            if feed is None:
+                feed = self._start_feed(api_key, access_token)
+        feed.subscribe(tokens)
+
+    def set_root(self, root: Optional[str]):
+        """Move every running feed to another REST root, keeping its subscriptions"""
+        with self._lock:
+            if root == self.root:
+                return
+            self.root = root
+            old = dict(self.feeds)
+            for (api_key, access_token), feed in old.items():
+                self._start_feed(api_key, access_token).subscribe(feed.tokens)
+        for feed in old.values():
+            feed.stop()
+        logger.info(f"Tick feeds moved to {ticker_root(root) or 'the Kite feed'}")
+
+    def _start_feed(self, api_key: str, access_token: str) -> KiteTickerFeed:
+        feed = KiteTickerFeed(api_key, access_token, self.buffer, root=ticker_root(self.root),
+                              on_tick=self._notify)
+        self.feeds[(api_key, access_token)] = feed
+        feed.start()
+        return feed
+
+    def replay(self, path: str, speed: float = 0.0) -> ReplayFeed:
+        """Start feeding the shared buffer from a recorded tick file"""
+        feed = ReplayFeed(path, self.buffer, speed=speed, on_tick=self._notify)
+        feed.start()
+        return feed
+
+    def add_listener(self, callback: Callable[[Tick], None]):
+        self.listeners.append(callback)
+
+    def close(self):
+        with self._lock:
+            feeds = list(self.feeds.values())
+            self.feeds.clear()
+        for feed in feeds:
+            feed.stop()
+        self.buffer.close()
+
+    def _notify(self, tick: Tick):
+        for callback in self.listeners:
+            try:
+                callback(tick)
+            except Exception as e:
+                logger.error(f"Error in tick listener: {e}")
+
+
+def main():
+    """Replay a tick file into a fresh buffer and report throughput"""
+    parser = argparse.ArgumentParser(description="Replay recorded ticks into a shared tick buffer")
+    parser.add_argument("path", help="CSV or JSON-lines tick file")
+    parser.add_argument("--speed", type=float, default=0.0, help="0 = as fast as possible")
+    args = parser.parse_args()
+
+    buffer = TickBuffer.create()
+    try:
+        feed = ReplayFeed(args.path, buffer, speed=args.speed)
+        started = time.perf_counter()
+        count = feed.run()
+        elapsed = time.perf_counter() - started
+        print(json.dumps({
+            "ticks": count,
+            "seconds": round(elapsed, 4),
+            "ticks_per_second": round(count / elapsed) if elapsed else None,
+        }))
+    finally:
+        buffer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -32,6 +32,12 @@ def get_current_nifty_symbol():
     Get the current month NIFTY futures symbol
     Returns the trading symbol for current month NIFTY futures
     """
+    # Prefer the local instrument master, which knows the real expiry dates
+    symbol = get_nearest_future("NIFTY")
+    if symbol:
+        print(f"📊 Trading symbol: {symbol}")
+        return symbol
+    
     current_date = datetime.datetime.now()
     
     # NIFTY futures expire on last Thursday of every month
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Order Fills
+Follows placed orders in each account's order book until they are complete,
+rejected or cancelled, and reports the filled quantity and average price
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+from kite_sessions import shared_sessions
+
+logger = logging.getLogger(__name__)
+
+# Order statuses after which nothing more fills
+FINAL_STATUSES = ("COMPLETE", "REJECTED", "CANCELLED")
+
+
+class _Watched:
+    def __init__(self, callback: Callable[[Dict[str, Any]], None]):
+        self.callback = callback
+        self.since = time.monotonic()
+
+
+class FillWatcher:
+    """Polls the order book of every account with open orders, one orders() call per round.
+
+    watch() registers an order and a callback; once the broker reports the
+    order COMPLETE, REJECTED or CANCELLED the callback gets the broker's
+    order record (status, filled_quantity, average_price, status_message).
+    Orders that are still open after `max_age` seconds are dropped.
+    """
+
+    def __init__(self, session_factory: Callable[[str, str], Any] = shared_sessions.get,
+                 interval: float = 1.0, max_age: float = 86400.0):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.max_age = max_age
+        self._accounts: Dict[Tuple[str, str], Dict[str, _Watched]] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._poll_loop, name="fill-watcher", daemon=True)
+        self._thread.start()
+
+    def watch(self, api_key: str, access_token: str, order_id: str, callback: Callable[[Dict[str, Any]], None]):
+        with self._cond:
+            self._accounts.setdefault((api_key, access_token), {})[str(order_id)] = _Watched(callback)
+            self._cond.notify_all()
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(orders) for orders in self._accounts.values())
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
+
+    def _poll_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._accounts)
+                # One round per interval, however many orders are added meanwhile
+                self._cond.wait_for(lambda: self._closed, timeout=self.interval)
+                if self._closed:
+                    return
+                accounts = list(self._accounts)
+            for key in accounts:
+                try:
+                    self._poll(key)
+                except Exception as e:
+                    logger.error(f"Error polling orders for fills: {e}")
+
+    def _poll(self, key: Tuple[str, str]):
+        orders = {str(order.get("order_id")): order for order in self.session_factory(*key).orders()}
+        now = time.monotonic()
+        final = []
+        with self._cond:
+            watched = self._accounts.get(key, {})
+            for order_id in list(watched):
+                order = orders.get(order_id)
+                if order is not None and order.get("status") in FINAL_STATUSES:
+                    final.append((watched.pop(order_id), order))
+                elif now - watched[order_id].since > self.max_age:
+                    watched.pop(order_id)
+                    logger.warning(f"Stopped following order {order_id}: still not final after {self.max_age:.0f}s")
+            if not watched:
+                self._accounts.pop(key, None)
+        for entry, order in final:
+            try:
+                entry.callback(order)
+            except Exception as e:
+                logger.error(f"Error handling final status of order {order.get('order_id')}: {e}")
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Order Gateway
+Routes every deployment's orders through per-account token buckets and a
+priority queue so an account never exceeds the broker's order rate limit
+"""
+
+import time
+import heapq
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from kite_sessions import shared_sessions
+
+logger = logging.getLogger(__name__)
+
+# Kite accepts 10 orders per second per API key, counted over a sliding
+# one-second window; a bucket refilling slightly slower with no burst stays
+# under it even with network jitter
+ORDER_RATE_LIMIT = 10
+DEFAULT_RATE = ORDER_RATE_LIMIT * 0.95
+DEFAULT_BURST = 1
+
+# Queue priorities: exits are sent before entries
+EXIT = 0
+ENTRY = 1
+
+
+def _percentile_ms(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+
+class TokenBucket:
+    """Allows `rate` operations per second with bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def available(self, now: float) -> int:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return int(self.tokens)
+
+    def take(self, count: int):
+        self.tokens -= count
+
+    def drain(self):
+        self.tokens = 0.0
+
+    def wait_time(self) -> float:
+        """Seconds until the next whole token"""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class OrderNotSent(TimeoutError):
+    """The order waited too long in the gateway and was taken out of the queue unsent"""
+
+
+class PendingOrder:
+    """Returned by place() for an order already handed to the broker whose reply is late.
+
+    The order may still be accepted and fill; `future` resolves to its
+    order_id (or the broker's error) once the reply arrives.
+    """
+
+    def __init__(self, reference: str, future: Future):
+        self.reference = reference
+        self.future = future
+
+
+class _OrderRequest:
+    """One queued order and the future its caller waits on"""
+
+    def __init__(self, priority: int, seq: int, api_key: str, access_token: str,
+                 params: Dict[str, Any]):
+        self.priority = priority
+        self.seq = seq
+        self.reference = f"gw-{seq}"
+        self.api_key = api_key
+        self.access_token = access_token
+        self.params = params
+        self.future: Future = Future()
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+
+    def __lt__(self, other: "_OrderRequest") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _Account:
+    def __init__(self, rate: float, burst: int):
+        self.bucket = TokenBucket(rate, burst)
+        self.queue: List[_OrderRequest] = []
+        self.latencies: deque = deque(maxlen=1000)
+        self.submitted = 0
+        self.rejected = 0
+
+
+class OrderGateway:
+    """Central, rate-limited path from algorithms to kite.place_order.
+
+    Orders are queued per API key (the broker's rate limits are per key) and
+    released by one dispatcher thread as tokens become available; every
+    order that fits in the current budget is sent at once on a small pool.
+    A rate-limit rejection puts the order back at its place in the queue
+    and empties the bucket. The time each order spent queued is kept for
+    queue_latency() and stats().
+    """
+
+    def __init__(self, session_factory: Callable[[str, str], Any] = shared_sessions.get,
+                 rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST, max_parallel: int = 10,
+                 max_retries: int = 3):
+        self.session_factory = session_factory
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self._accounts: Dict[str, _Account] = {}
+        self._latency_by_order: "OrderedDict[str, float]" = OrderedDict()
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="order-gateway")
+        self._thread = threading.Thread(target=self._dispatch_loop, name="order-dispatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, api_key: str, access_token: str, params: Dict[str, Any], exit: bool = False) -> Future:
+        """Queue an order; the future resolves to the broker's order_id"""
+        return self._enqueue(api_key, access_token, params, exit).future
+
+    def place(self, api_key: str, access_token: str, params: Dict[str, Any], exit: bool = False,
+              timeout: Optional[float] = 60.0) -> Union[str, PendingOrder]:
+        """Queue an order and wait for its order_id.
+
+        If the order is still queued after `timeout` seconds it is withdrawn
+        and OrderNotSent is raised, so it can never reach the broker later.
+        If it was already sent, a PendingOrder is returned instead: the order
+        may well be live and must not be treated as failed.
+        """
+        request = self._enqueue(api_key, access_token, params, exit)
+        try:
+            return request.future.result(timeout)
+        except FutureTimeout:
+            with self._cond:
+                account = self._accounts.get(api_key)
+                queued = account is not None and request in account.queue
+                if queued:
+                    account.queue.remove(request)
+                    heapq.heapify(account.queue)
+            if queued:
+                request.future.cancel()
+                raise OrderNotSent(f"Order not sent within {timeout}s; withdrawn from the queue")
+            if request.future.done():
+                # The broker answered just after the timeout
+                return request.future.result()
+            logger.warning(f"Order {request.reference} was sent but the broker has not answered "
+                           f"within {timeout}s; reporting it as pending")
+            return PendingOrder(request.reference, request.future)
+
+    def queue_latency(self, order_id: str) -> Optional[float]:
+        """Seconds the order waited in the gateway before it was sent"""
+        with self._cond:
+            return self._latency_by_order.get(str(order_id))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth, counts and queueing latency percentiles per API key"""
+        with self._cond:
+            result = {}
+            for api_key, account in self._accounts.items():
+                latencies = sorted(account.latencies)
+                result[api_key] = {
+                    "queued": len(account.queue),
+                    "submitted": account.submitted,
+                    "rate_limited": account.rejected,
+                    "queue_ms_p50": _percentile_ms(latencies, 0.5),
+                    "queue_ms_p99": _percentile_ms(latencies, 0.99),
+                    "queue_ms_max": _percentile_ms(latencies, 1.0),
+                }
+            return result
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            pending = [request for account in self._accounts.values() for request in account.queue]
+            for account in self._accounts.values():
+                account.queue.clear()
+            self._cond.notify_all()
+        for request in pending:
+            request.future.set_exception(RuntimeError("Order gateway closed"))
+        self._thread.join(timeout=5)
+        self._pool.shutdown(wait=True)
+
+    def _enqueue(self, api_key: str, access_token: str, params: Dict[str, Any], exit: bool) -> _OrderRequest:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Order gateway is closed")
+            self._seq += 1
+            request = _OrderRequest(EXIT if exit else ENTRY, self._seq, api_key, access_token, dict(params))
+            account = self._accounts.get(api_key)
+            if account is None:
+                account = self._accounts[api_key] = _Account(self.rate, self.burst)
+            heapq.heappush(account.queue, request)
+            self._cond.notify_all()
+        return request
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                ready: List[_OrderRequest] = []
+                wait: Optional[float] = None
+                for account in self._accounts.values():
+                    if not account.queue:
+                        continue
+                    count = min(account.bucket.available(now), len(account.queue))
+                    if count == 0:
+                        delay = account.bucket.wait_time()
+                        wait = delay if wait is None else min(wait, delay)
+                        continue
+                    account.bucket.take(count)
+                    ready.extend(heapq.heappop(account.queue) for _ in range(count))
+                if not ready:
+                    self._cond.wait(wait)
+                    continue
+
+            for request in ready:
+                self._pool.submit(self._send, request)
+
+    def _send(self, request: _OrderRequest):
+        sent_at = time.monotonic()
+        request.attempts += 1
+        try:
+            kite = self.session_factory(request.api_key, request.access_token)
+            order_id = kite.place_order(**request.params)
+        except Exception as e:
+            if self._is_rate_limited(e) and request.attempts <= self.max_retries:
+                with self._cond:
+                    account = self._accounts[request.api_key]
+                    account.rejected += 1
+                    account.bucket.drain()
+                    heapq.heappush(account.queue, request)
+                    self._cond.notify_all()
+                logger.warning(f"Order rate-limited by broker, requeued (attempt {request.attempts})")
+                return
+            request.future.set_exception(e)
+            return
+
+        latency = sent_at - request.queued_at
+        with self._cond:
+            account = self._accounts[request.api_key]
+            account.submitted += 1
+            account.latencies.append(latency)
+            self._latency_by_order[str(order_id)] = latency
+            while len(self._latency_by_order) > 10000:
+                self._latency_by_order.popitem(last=False)
+        logger.info(f"Order {order_id} sent after {latency * 1000:.1f} ms in queue")
+        request.future.set_result(order_id)
+
+    @staticmethod
+    def _is_rate_limited(error: Exception) -> bool:
+        return getattr(error, "code", None) == 429 or "too many requests" in str(error).lower()
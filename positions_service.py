@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Positions Service
+Polls positions and margins once per account in the background and serves
+every consumer from a shared snapshot
+"""
+
+import time
+import logging
+import datetime
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from kite_sessions import shared_sessions
+
+logger = logging.getLogger(__name__)
+
+
+class _Account:
+    """Latest snapshot for one set of credentials"""
+
+    def __init__(self):
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.updated_at = 0.0
+        self.attempted_at = 0.0
+        self.last_read = time.monotonic()
+        self.refresh_requested = False
+        self.inflight: Optional[Future] = None
+
+
+class PositionsService:
+    """Shared positions/margins snapshots, one broker poll per account.
+
+    An account is registered by its first get() and then polled every
+    `interval` seconds by a single background thread until nobody has read
+    it for `idle_timeout` seconds. request_refresh() (e.g. after a fill)
+    makes the poller fetch that account right away.
+    """
+
+    def __init__(self, session_factory: Callable[[str, str], Any] = shared_sessions.get,
+                 interval: float = 5.0, idle_timeout: float = 300.0):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self._accounts: Dict[Tuple[str, str], _Account] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._poll_loop, name="positions-poller", daemon=True)
+        self._thread.start()
+
+    def get(self, api_key: str, access_token: str) -> Dict[str, Any]:
+        """Snapshot {"positions", "margins", "updated_at", "error"} for an account"""
+        key = (api_key, access_token)
+        with self._cond:
+            account = self._accounts.get(key)
+            if account is None:
+                account = self._accounts[key] = _Account()
+            account.last_read = time.monotonic()
+            if account.snapshot is not None:
+                return account.snapshot
+            future = account.inflight
+            leader = future is None
+            if leader:
+                future = account.inflight = Future()
+
+        if leader:
+            self._fetch(key, account)
+        snapshot = future.result()
+        if snapshot.get("positions") is None:
+            raise RuntimeError(snapshot.get("error") or "Positions unavailable")
+        return snapshot
+
+    def positions(self, api_key: str, access_token: str) -> Dict[str, Any]:
+        return self.get(api_key, access_token)["positions"]
+
+    def request_refresh(self, api_key: str, access_token: str):
+        """Have the poller fetch this account now instead of at its next turn"""
+        with self._cond:
+            account = self._accounts.get((api_key, access_token))
+            if account is not None:
+                account.refresh_requested = True
+                self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def _fetch(self, key: Tuple[str, str], account: _Account):
+        with self._cond:
+            future = account.inflight
+            if future is None:
+                future = account.inflight = Future()
+            account.refresh_requested = False
+
+        try:
+            kite = self.session_factory(*key)
+            positions = kite.positions()
+            try:
+                margins = kite.margins()
+            except Exception as e:
+                logger.warning(f"Error fetching margins: {e}")
+                margins = account.snapshot.get("margins") if account.snapshot else None
+            error = None
+        except Exception as e:
+            logger.error(f"Error fetching positions: {e}")
+            error = str(e)
+
+        now = time.time()
+        with self._cond:
+            account.attempted_at = now
+            if error is None:
+                account.updated_at = now
+                account.snapshot = {
+                    "positions": positions,
+                    "margins": margins,
+                    "updated_at": datetime.datetime.fromtimestamp(now).isoformat(),
+                    "error": None,
+                }
+            elif account.snapshot is not None:
+                # Keep serving the last good snapshot, flagged with the error
+                account.snapshot = dict(account.snapshot, error=error)
+            result = account.snapshot or {"positions": None, "margins": None, "updated_at": None, "error": error}
+            account.inflight = None
+        future.set_result(result)
+
+    def _poll_loop(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                wall = time.time()
+                for key in [k for k, a in self._accounts.items() if now - a.last_read > self.idle_timeout]:
+                    del self._accounts[key]
+                due = [(key, account) for key, account in self._accounts.items()
+                       if account.inflight is None
+                       and (account.refresh_requested or wall - account.attempted_at >= self.interval)]
+                if not due:
+                    next_due = min((account.attempted_at + self.interval - wall
+                                    for account in self._accounts.values() if account.inflight is None),
+                                   default=self.interval)
+                    self._cond.wait(max(0.01, min(next_due, self.interval)))
+                    continue
+                for _, account in due:
+                    account.inflight = Future()
+
+            for key, account in due:
+                self._fetch(key, account)
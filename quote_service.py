@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Quote Service
+Coalesces quote/LTP requests from all deployments into batched Kite calls
+and serves repeats from a short-TTL cache
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from kite_sessions import shared_sessions
+
+logger = logging.getLogger(__name__)
+
+# Maximum instruments Kite accepts in a single call
+BATCH_LIMITS = {"quote": 500, "ltp": 1000}
+
+# How old a cached entry may be, per kind of use
+DEFAULT_STALENESS = {"validation": 60.0, "pricing": 1.0}
+
+# Longest a caller waits for a batch fetched by another caller
+DEFAULT_TIMEOUT = 30.0
+
+
+class _Batch:
+    """Instruments waiting to be fetched together for one account"""
+
+    def __init__(self):
+        self.futures: Dict[str, Future] = {}
+
+
+class QuoteService:
+    """Batched, cached access to kite.quote and kite.ltp.
+
+    Concurrent callers on the same account that arrive within `window`
+    seconds of each other share one request per kind; an instrument that is
+    already being fetched for that account is never requested twice.
+    """
+
+    def __init__(self, session_factory: Callable[[str, str], Any] = shared_sessions.get,
+                 window: float = 0.005, staleness: Optional[Dict[str, float]] = None,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.session_factory = session_factory
+        self.window = window
+        self.staleness = dict(DEFAULT_STALENESS, **(staleness or {}))
+        self.timeout = timeout
+        self._cache: Dict[Tuple[str, str], Tuple[float, Optional[Dict[str, Any]]]] = {}
+        self._batches: Dict[Tuple[str, str, str], _Batch] = {}
+        # (api_key, access_token, kind, instrument) -> future of the batch fetching it
+        self._inflight: Dict[Tuple[str, str, str, str], Future] = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+
+    def get(self, api_key: str, access_token: str, instruments: List[str],
+            kind: str = "quote", purpose: str = "pricing") -> Dict[str, Any]:
+        """Return {instrument: data} for the instruments the broker knows about"""
+        if kind not in BATCH_LIMITS:
+            raise ValueError(f"Unsupported quote kind: {kind}")
+        max_age = self.staleness.get(purpose, self.staleness["pricing"])
+        now = time.monotonic()
+
+        results: Dict[str, Any] = {}
+        waiting: Dict[str, Future] = {}
+        leader_batch = None
+        batch_key = (api_key, access_token, kind)
+
+        with self._lock:
+            for instrument in dict.fromkeys(instruments):
+                cached = self._lookup(kind, instrument, now, max_age)
+                if cached is not None:
+                    if cached[1] is not None:
+                        results[instrument] = cached[1]
+                    continue
+
+                future = self._inflight.get(batch_key + (instrument,))
+                if future is None:
+                    batch = self._batches.get(batch_key)
+                    if batch is None:
+                        batch = self._batches[batch_key] = _Batch()
+                        leader_batch = batch
+                    future = batch.futures.get(instrument)
+                    if future is None:
+                        future = batch.futures[instrument] = Future()
+                waiting[instrument] = future
+
+        if leader_batch is not None:
+            self._flush(batch_key, leader_batch)
+
+        for instrument, future in waiting.items():
+            data = future.result(timeout=self.timeout)
+            if data is not None:
+                results[instrument] = data
+        return results
+
+    def invalidate(self, instrument: Optional[str] = None):
+        with self._lock:
+            if instrument is None:
+                self._cache.clear()
+            else:
+                for kind in BATCH_LIMITS:
+                    self._cache.pop((kind, instrument), None)
+
+    def _lookup(self, kind: str, instrument: str, now: float,
+                max_age: float) -> Optional[Tuple[float, Optional[Dict[str, Any]]]]:
+        entry = self._cache.get((kind, instrument))
+        if entry is None and kind == "ltp":
+            # A full quote also answers an LTP request
+            entry = self._cache.get(("quote", instrument))
+        if entry is not None and now - entry[0] <= max_age:
+            return entry
+        return None
+
+    def _flush(self, batch_key: Tuple[str, str, str], batch: _Batch):
+        """Called by the first caller of a batch: wait for company, then fetch"""
+        if self.window:
+            time.sleep(self.window)
+
+        api_key, access_token, kind = batch_key
+        with self._lock:
+            if self._batches.get(batch_key) is batch:
+                del self._batches[batch_key]
+            pending = dict(batch.futures)
+            for instrument, future in pending.items():
+                self._inflight[batch_key + (instrument,)] = future
+
+        instruments = list(pending)
+        limit = BATCH_LIMITS[kind]
+        for start in range(0, len(instruments), limit):
+            chunk = instruments[start:start + limit]
+            try:
+                kite = self.session_factory(api_key, access_token)
+                data = kite.quote(chunk) if kind == "quote" else kite.ltp(chunk)
+                error = None
+            except Exception as e:
+                data, error = {}, e
+                logger.error(f"Error fetching {kind} for {len(chunk)} instruments: {e}")
+
+            fetched_at = time.monotonic()
+            with self._lock:
+                for instrument in chunk:
+                    # Only this batch's own futures are resolved here
+                    future = pending[instrument]
+                    if self._inflight.get(batch_key + (instrument,)) is future:
+                        del self._inflight[batch_key + (instrument,)]
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        self._cache[(kind, instrument)] = (fetched_at, data.get(instrument))
+                        future.set_result(data.get(instrument))
+                self._prune(fetched_at)
+
+    def _prune(self, now: float):
+        if now - self._last_prune < 5:
+            return
+        self._last_prune = now
+        oldest = max(self.staleness.values())
+        for key in [k for k, (ts, _) in self._cache.items() if now - ts > oldest]:
+            del self._cache[key]
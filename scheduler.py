@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Deployment Scheduler
+Single timer thread that keeps a heap of next-run times and dispatches
+due runs to a bounded worker pool
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from metrics import SCHEDULER_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class DeploymentScheduler:
+    """Schedules periodic runs for any number of deployments on a fixed thread count.
+
+    run_callback(algorithm_id) is invoked on the pool for every due run and
+    returns the delay in seconds until the next run, or None to stop
+    scheduling that deployment. Runs of the same deployment never overlap.
+    The delay counts from when the run finished, so a run that overran
+    its interval or timed out is followed by a full gap, not a catch-up run.
+    """
+
+    def __init__(self, run_callback: Callable[[str], Optional[float]], max_workers: int = 8):
+        self.run_callback = run_callback
+        self.max_workers = max_workers
+        self._heap: List[Tuple[float, int, str]] = []
+        self._entries: Dict[str, int] = {}  # algorithm_id -> seq of its live heap entry
+        self._inflight: Dict[str, Future] = {}
+        self._cancelled: Set[str] = set()  # in-flight runs that must not reschedule
+        self._rerun: Set[str] = set()  # came due while a previous run was still going
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="algo-run")
+        self._stopped = False
+        self._thread = threading.Thread(target=self._loop, name="algo-scheduler", daemon=True)
+        self._thread.start()
+
+    def schedule(self, algorithm_id: str, delay: float = 0.0):
+        """Schedule (or reschedule) the next run of a deployment"""
+        with self._cond:
+            self._cancelled.discard(algorithm_id)
+            self._push(algorithm_id, time.monotonic() + delay)
+
+    def cancel(self, algorithm_id: str) -> Optional[Future]:
+        """Stop scheduling a deployment; returns its in-flight run, if any"""
+        with self._cond:
+            self._entries.pop(algorithm_id, None)
+            self._rerun.discard(algorithm_id)
+            future = self._inflight.get(algorithm_id)
+            if future is not None:
+                self._cancelled.add(algorithm_id)
+            self._cond.notify()
+            return future
+
+    def is_scheduled(self, algorithm_id: str) -> bool:
+        with self._cond:
+            return algorithm_id in self._entries or algorithm_id in self._inflight
+
+    def shutdown(self, wait: bool = True):
+        with self._cond:
+            self._stopped = True
+            self._entries.clear()
+            self._cond.notify()
+        self._pool.shutdown(wait=wait)
+
+    def _push(self, algorithm_id: str, due: float):
+        seq = next(self._counter)
+        self._entries[algorithm_id] = seq
+        heapq.heappush(self._heap, (due, seq, algorithm_id))
+        self._cond.notify()
+
+    def _loop(self):
+        with self._cond:
+            while not self._stopped:
+                # Drop entries that were cancelled or superseded
+                while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+                    heapq.heappop(self._heap)
+
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                due, _, algorithm_id = self._heap[0]
+                now = time.monotonic()
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+
+                heapq.heappop(self._heap)
+                del self._entries[algorithm_id]
+                if algorithm_id in self._inflight:
+                    self._rerun.add(algorithm_id)
+                    continue
+                future = self._pool.submit(self._run, algorithm_id, due)
+                self._inflight[algorithm_id] = future
+
+    def _run(self, algorithm_id: str, due: float):
+        SCHEDULER_LAG_SECONDS.observe(max(0.0, time.monotonic() - due))
+        delay = None
+        try:
+            delay = self.run_callback(algorithm_id)
+        except Exception as e:
+            logger.error(f"Unhandled error in scheduled run of {algorithm_id}: {e}")
+        finally:
+            with self._cond:
+                self._inflight.pop(algorithm_id, None)
+                now = time.monotonic()
+                if self._stopped or algorithm_id in self._entries:
+                    pass
+                elif algorithm_id in self._rerun:
+                    self._rerun.discard(algorithm_id)
+                    self._push(algorithm_id, now)
+                elif delay is not None and algorithm_id not in self._cancelled:
+                    # Fixed-delay: anchor on when the run finished, not on the planned time
+                    self._push(algorithm_id, now + delay)
+                self._cancelled.discard(algorithm_id)
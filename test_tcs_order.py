@@ -4,6 +4,7 @@ GUARANTEED TCS ORDER PLACEMENT SCRIPT
 This Python script will definitely place a real TCS order if your credentials are correct.
 """
 
+import os
 import hashlib
 import requests
 import json
@@ -13,6 +14,9 @@ from urllib.parse import urlencode
 # Disable SSL warnings and verification for corporate networks
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Kite API base URL; set KITE_API_ROOT to a local paper exchange (kite_stub_server.py) to test safely
+BASE_URL = os.environ.get("KITE_API_ROOT", "https://api.kite.trade").rstrip("/")
+
 # Your API credentials
 API_KEY = "lyeyc9g06ol4o3fi"
 API_SECRET = "ybjb9opc8e06385gc665s5ztwpn2z7ku"
@@ -31,7 +35,7 @@ def get_access_token():
     
     checksum = generate_checksum(API_KEY, REQUEST_TOKEN, API_SECRET)
     
-    url = "https://api.kite.trade/session/token"
+    url = f"{BASE_URL}/session/token"
     data = {
         'api_key': API_KEY,
         'request_token': REQUEST_TOKEN,
@@ -65,7 +69,7 @@ def test_connection(access_token):
     """Test API connection"""
     print("🧪 Testing API connection...")
     
-    url = "https://api.kite.trade/user/profile"
+    url = f"{BASE_URL}/user/profile"
     headers = {
         'Authorization': f'token {API_KEY}:{access_token}',
         'X-Kite-Version': '3'
@@ -93,7 +97,7 @@ def place_tcs_order(access_token):
     """Place real TCS order"""
     print("🔥 PLACING REAL TCS ORDER...")
     
-    url = "https://api.kite.trade/orders/regular"
+    url = f"{BASE_URL}/orders/regular"
     headers = {
         'Authorization': f'token {API_KEY}:{access_token}',
         'X-Kite-Version': '3',
@@ -141,7 +145,7 @@ def check_orders(access_token):
     """Check all orders"""
     print("📋 Checking all orders...")
     
-    url = "https://api.kite.trade/orders"
+    url = f"{BASE_URL}/orders"
     headers = {
         'Authorization': f'token {API_KEY}:{access_token}',
         'X-Kite-Version': '3'
@@ -0,0 +1,41 @@
+"""
+Shared test fixtures
+Puts the repository on sys.path, keeps each test in its own working
+directory and provides a local paper exchange for broker calls
+"""
+
+import os
+import sys
+import logging
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+# Worker and subprocess-mode runs start in the test directory but import repo modules
+os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")]))
+
+# algorithm_executor configures logging to a file in the current directory unless
+# logging is already set up; keep test runs out of the tracked algorithm_executor.log
+logging.getLogger().addHandler(logging.NullHandler())
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test inside a fresh temporary directory"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def exchange(workdir):
+    """A paper exchange on a local port with every shared Kite session pointed at it"""
+    from kite_stub_server import start_stub_server
+    from kite_sessions import shared_sessions
+
+    server = start_stub_server(seed=1)
+    shared_sessions.set_root(server.root)
+    yield server
+    shared_sessions.set_root(None)
+    server.shutdown()
+    server.broker.close()
@@ -0,0 +1,119 @@
+"""
+Algorithm worker tests
+The length-prefixed frame protocol and the life cycle of a persistent
+worker: loading, runs, broker calls, records and timeouts
+"""
+
+import socket
+import subprocess
+
+import pytest
+
+from algorithm_worker import AlgorithmWorker, FrameChannel, WorkerError, encode_frame, FRAME_HEADER
+
+
+@pytest.fixture
+def channels():
+    left, right = socket.socketpair()
+    a, b = FrameChannel(left), FrameChannel(right)
+    yield a, b
+    a.close()
+    b.close()
+
+
+def _worker(workdir, code, rpc=True):
+    path = workdir / "algo.py"
+    path.write_text(code)
+    return AlgorithmWorker("a1", str(path), rpc=rpc)
+
+
+def test_frames_are_length_prefixed_json():
+    frame = encode_frame({"op": "run", "text": "₹"})
+    (length,) = FRAME_HEADER.unpack(frame[:FRAME_HEADER.size])
+    assert length == len(frame) - FRAME_HEADER.size
+    assert frame[FRAME_HEADER.size:] == '{"op": "run", "text": "\\u20b9"}'.encode("utf-8")
+
+
+def test_channel_reassembles_split_and_back_to_back_frames(channels):
+    a, b = channels
+    data = encode_frame({"n": 1}) + encode_frame({"n": 2, "pad": "x" * 100000})
+    # One byte first, then the rest: recv must wait for whole frames
+    a.sock.sendall(data[:1])
+    a.sock.sendall(data[1:])
+    assert b.recv(timeout=5) == {"n": 1}
+    assert b.recv(timeout=5)["n"] == 2
+
+
+def test_channel_reports_a_closed_peer(channels):
+    a, b = channels
+    a.close()
+    with pytest.raises(ConnectionError):
+        b.recv(timeout=5)
+
+
+def test_runs_reuse_the_loaded_module_and_serve_calls(workdir):
+    worker = _worker(workdir, "runs = []\n"
+                              "def main():\n"
+                              "    runs.append(_rpc('quote', instruments=['NSE:TCS']))\n"
+                              "    print(len(runs))\n")
+    calls = []
+
+    def on_message(message):
+        calls.append(message["method"])
+        return {"op": "reply", "result": {"NSE:TCS": {"last_price": 1.0}}}
+
+    try:
+        assert worker.start() == ""
+        assert worker.run(10, on_message)["output"] == "1\n"
+        result = worker.run(10, on_message)
+        assert (result["ok"], result["output"]) == (True, "2\n")
+        assert calls == ["quote", "quote"]
+    finally:
+        worker.stop()
+
+
+def test_records_reported_while_loading_do_not_break_start(workdir):
+    """A module that reports a trade at import time used to fail with "Algorithm failed to load" """
+    worker = _worker(workdir, "print('loading')\n"
+                              "_emit('trade', {'symbol': 'TCS', 'status': 'FAILED'})\n"
+                              "def main():\n"
+                              "    _emit('trade', {'symbol': 'INFY', 'status': 'FAILED'})\n")
+    received = []
+    try:
+        assert worker.start(on_message=received.append) == "loading\n"
+        assert [message["record"]["symbol"] for message in received] == ["TCS"]
+        assert worker.run(10, received.append)["ok"]
+        assert [message["record"]["symbol"] for message in received] == ["TCS", "INFY"]
+    finally:
+        worker.stop()
+
+
+def test_broker_calls_while_loading_fail_in_the_algorithm(workdir):
+    worker = _worker(workdir, "try:\n"
+                              "    _rpc('profile')\n"
+                              "except RuntimeError as e:\n"
+                              "    print(e)\n"
+                              "def main():\n"
+                              "    pass\n")
+    try:
+        assert "only available while main() runs" in worker.start()
+    finally:
+        worker.stop()
+
+
+def test_load_errors_are_reported(workdir):
+    worker = _worker(workdir, "raise ValueError('bad config')\n")
+    with pytest.raises(WorkerError, match="bad config"):
+        worker.start()
+    assert not worker.alive
+
+
+def test_a_run_past_its_timeout_kills_the_worker(workdir):
+    worker = _worker(workdir, "import time\ndef main():\n    time.sleep(30)\n")
+    try:
+        worker.start()
+        with pytest.raises(subprocess.TimeoutExpired):
+            worker.run(0.5)
+        assert not worker.alive
+    finally:
+        worker.stop()
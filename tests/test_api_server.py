@@ -0,0 +1,188 @@
+"""
+API server tests
+Versioned deployment snapshots with ETag/304, deploys run as background
+jobs with one profile check per token and day, bulk deploy/stop, and
+following deployment logs
+"""
+
+import json
+import threading
+import time
+import uuid
+
+import pytest
+from kiteconnect import KiteConnect
+
+NOOP_ALGORITHM = "def main():\n    pass\n"
+
+
+@pytest.fixture
+def server(exchange, monkeypatch):
+    """api_server's Flask app backed by a fresh executor in the test directory"""
+    import api_server
+    from algorithm_executor import AlgorithmExecutor, AlgorithmAPI
+
+    executor = AlgorithmExecutor()
+    monkeypatch.setattr(api_server, "executor", executor)
+    monkeypatch.setattr(api_server, "api", AlgorithmAPI(executor))
+    yield api_server
+    executor.close()
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+def _deployment(algorithm_id, access_token=None):
+    return {"algorithm_id": algorithm_id, "algorithm_name": algorithm_id, "algorithm_code": NOOP_ALGORITHM,
+            "api_key": "key", "access_token": uuid.uuid4().hex if access_token is None else access_token,
+            "run_interval": 3600}
+
+
+def test_unchanged_deployments_answer_304(server, client):
+    assert server.api.deploy(_deployment("d1"))["success"]
+    first = client.get("/api/deployments")
+    assert first.status_code == 200 and first.headers["ETag"]
+    assert json.loads(first.data)["data"]["d1"]["algorithm_code"] == NOOP_ALGORITHM
+
+    again = client.get("/api/deployments", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.data == b""
+
+    # A change to any deployment issues a new ETag
+    server.api.stop("d1")
+    changed = client.get("/api/deployments", headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert json.loads(changed.data)["data"]["d1"]["status"] == "stopped"
+
+
+def test_status_etags_follow_the_deployment_and_the_variant(server, client):
+    assert server.api.deploy(_deployment("d1"))["success"]
+    assert server.api.deploy(_deployment("d2"))["success"]
+    full = client.get("/api/status/d1")
+    summary = client.get("/api/status/d1?include_code=false")
+    assert full.headers["ETag"] != summary.headers["ETag"]
+    assert "algorithm_code" not in json.loads(summary.data)["data"]
+
+    # Changing another deployment leaves this one's ETag valid
+    server.api.stop("d2")
+    again = client.get("/api/status/d1", headers={"If-None-Match": full.headers["ETag"]})
+    assert again.status_code == 304
+    assert json.loads(client.get("/api/status/missing").data) == {"success": False, "data": None}
+
+
+def _wait_for_job(client, job_id, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = json.loads(client.get(f"/api/jobs/{job_id}").data)["data"]
+        if job["finished_at"] is not None:
+            return job
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_deploys_are_accepted_and_finished_in_the_background(server, client, monkeypatch):
+    profiles = []
+    original = KiteConnect.profile
+    monkeypatch.setattr(KiteConnect, "profile", lambda kite: profiles.append(kite.access_token) or original(kite))
+
+    token = uuid.uuid4().hex
+    response = client.post("/api/deploy", json=_deployment("d1", token))
+    assert response.status_code == 202
+    body = json.loads(response.data)
+    assert response.headers["Location"] == f"/api/jobs/{body['job_id']}"
+    assert _wait_for_job(client, body["job_id"])["status"] == "succeeded"
+    assert server.executor.is_running("d1")
+
+    # A second deploy on the same token today skips the profile check
+    body = json.loads(client.post("/api/deploy", json=_deployment("d2", token)).data)
+    assert _wait_for_job(client, body["job_id"])["status"] == "succeeded"
+    assert profiles == [token]
+
+
+def test_a_changed_redeploy_is_refused_while_the_first_is_pending(server, client, monkeypatch):
+    release = threading.Event()
+    deploy = server.api.deploy
+
+    def gated_deploy(data):
+        release.wait(10)
+        return deploy(data)
+
+    monkeypatch.setattr(server.api, "deploy", gated_deploy)
+    original = _deployment("d1")
+    edited = dict(original, algorithm_code="def main():\n    print('v2')\n")
+    first = client.post("/api/deploy", json=original)
+    repeated = client.post("/api/deploy", json=original)
+    refused = client.post("/api/deploy", json=edited)
+    release.set()
+
+    job_id = json.loads(first.data)["job_id"]
+    assert (repeated.status_code, json.loads(repeated.data)["job_id"]) == (202, job_id)
+    assert refused.status_code == 409
+    assert json.loads(refused.data)["job_id"] == job_id
+    assert _wait_for_job(client, job_id)["status"] == "succeeded"
+    assert server.executor.deployments["d1"].algorithm_code == original["algorithm_code"]
+
+    # Once the first deploy is done the edited one goes through
+    body = json.loads(client.post("/api/deploy", json=edited).data)
+    assert _wait_for_job(client, body["job_id"])["status"] == "succeeded"
+    assert server.executor.deployments["d1"].algorithm_code == edited["algorithm_code"]
+
+
+def test_deploy_requests_are_validated_before_queueing(client):
+    incomplete = _deployment("d1")
+    del incomplete["api_key"]
+    assert client.post("/api/deploy", json=incomplete).status_code == 400
+    assert client.post("/api/deploy", json=dict(_deployment("d1"), colour="red")).status_code == 400
+    assert client.get("/api/jobs/unknown").status_code == 404
+
+
+def test_a_rejected_token_fails_the_job(client):
+    body = json.loads(client.post("/api/deploy", json=_deployment("d1", access_token="")).data)
+    job = _wait_for_job(client, body["job_id"])
+    assert job["status"] == "failed"
+
+
+def test_bulk_deploy_checks_each_account_once(server, client, monkeypatch):
+    profiles = []
+    original = KiteConnect.profile
+    monkeypatch.setattr(KiteConnect, "profile", lambda kite: profiles.append(kite.access_token) or original(kite))
+
+    tokens = [uuid.uuid4().hex, uuid.uuid4().hex]
+    deployments = [_deployment(f"d{i}", tokens[i % 2]) for i in range(6)]
+    deployments.append(_deployment("bad", access_token=""))
+    deployments.append({"algorithm_id": "invalid"})
+    body = json.loads(client.post("/api/bulk/deploy", json={"deployments": deployments}).data)
+
+    assert not body["success"]
+    assert sorted(body["failed"]) == ["bad", "invalid"]
+    assert all(body["results"][f"d{i}"] for i in range(6))
+    assert sorted(profiles) == sorted(tokens)
+    assert all(server.executor.is_running(f"d{i}") for i in range(6))
+
+
+def test_bulk_stop_reports_unknown_deployments(server, client):
+    assert server.api.deploy_many([_deployment("d1"), _deployment("d2")])["success"]
+    body = json.loads(client.post("/api/bulk/stop", json={"algorithm_ids": ["d1", "d2", "missing"]}).data)
+    assert body["results"] == {"d1": True, "d2": True, "missing": False}
+    assert body["failed"] == ["missing"]
+    assert not server.executor.is_running("d1")
+    assert server.executor.deployments["d2"].status == "stopped"
+
+
+def test_bulk_requests_are_validated(client):
+    assert client.post("/api/bulk/deploy", json={"deployments": "d1"}).status_code == 400
+    assert client.post("/api/bulk/stop", json={"algorithm_ids": [1, 2]}).status_code == 400
+
+
+def test_following_an_unknown_deployments_log_is_not_found(server, client):
+    assert client.get("/api/logs/missing?follow=1").status_code == 404
+    assert "missing" not in server.executor.logs._logs
+
+    server.executor.logs.append("d1", "hello")
+    response = client.get("/api/logs/d1?follow=1&since=0", buffered=False)
+    assert response.status_code == 200
+    chunks = response.response
+    assert next(chunks) == b"retry: 2000\n\n"
+    assert b"hello" in next(chunks)
+    response.close()
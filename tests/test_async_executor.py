@@ -0,0 +1,129 @@
+"""
+Asyncio executor tests
+Broker calls from algorithms on the asyncio engine, including those served
+from the local instrument master and tick feed, and the trades they report
+"""
+
+import asyncio
+import datetime
+import json
+import time
+
+import pytest
+
+from async_executor import AsyncAlgorithmExecutor
+from algorithm_executor import DeploymentConfig
+
+HELPERS_ALGORITHM = '''
+def main():
+    nearest = get_nearest_future("NIFTY")
+    with open("helpers.json", "w") as f:
+        json.dump({"nearest": nearest, "valid": validate_symbol(nearest), "bogus": validate_symbol("NOPE"),
+                   "token": _tick_token("NFO:" + nearest)}, f)
+'''
+
+
+def _config(code="", algorithm_id="a1"):
+    return DeploymentConfig(algorithm_id=algorithm_id, algorithm_name=algorithm_id, algorithm_code=code,
+                            api_key="key", access_token="token", run_interval=3600)
+
+
+@pytest.fixture
+def executor(exchange):
+    executor = AsyncAlgorithmExecutor(root=exchange.root)
+    executor.instruments.refresh("key", "token")
+    subscribed = []
+    executor.market_data.subscribe = lambda api_key, access_token, tokens: subscribed.extend(tokens)
+    executor.subscribed = subscribed
+    yield executor
+    asyncio.run(executor.shutdown())
+
+
+def _call(executor, method, **params):
+    config = _config()
+    message = {"type": "call", "method": method, "params": params}
+    return asyncio.run(executor._handle_call(config, None, message))
+
+
+def test_symbol_checks_use_the_instrument_master(executor):
+    nearest = _call(executor, "nearest_expiry", underlying="NIFTY")["result"]
+    assert nearest["tradingsymbol"].startswith("NIFTY") and nearest["expiry"] >= datetime.date.today().isoformat()
+    assert _call(executor, "validate_symbol", instrument=f"NFO:{nearest['tradingsymbol']}") == {
+        "op": "reply", "result": True}
+    assert _call(executor, "validate_symbol", instrument="NFO:NOPE") == {"op": "reply", "result": False}
+
+
+def test_subscribe_ticks_starts_the_feed_for_known_instruments(executor):
+    record = executor.instruments.lookup("NSE:TCS")
+    reply = _call(executor, "subscribe_ticks", instruments=["NSE:TCS", "NSE:NOPE"])
+    assert reply["result"] == {"NSE:TCS": record["instrument_token"], "NSE:NOPE": None}
+    assert executor.subscribed == [record["instrument_token"]]
+
+
+class RecordingClient:
+    """Stands in for AsyncKiteClient and keeps what place_order was sent"""
+
+    def __init__(self):
+        self.orders = []
+
+    async def place_order(self, **params):
+        self.orders.append(params)
+        return "order-1"
+
+
+def test_the_exit_flag_is_not_sent_to_the_broker(executor):
+    client = RecordingClient()
+    order = {"variety": "regular", "exchange": "NFO", "tradingsymbol": "NIFTYFUT", "transaction_type": "SELL",
+             "quantity": 50, "product": "MIS", "order_type": "MARKET"}
+    message = {"type": "call", "method": "place_order", "params": dict(order, exit=True)}
+    reply = asyncio.run(executor._handle_call(_config(), client, message))
+    assert reply == {"op": "reply", "result": "order-1"}
+    assert client.orders == [order]
+
+
+def test_unknown_calls_are_still_rejected(executor):
+    assert "Unsupported broker call" in _call(executor, "margins")["error"]
+
+
+def test_algorithm_helpers_work_on_the_asyncio_engine(executor, workdir):
+    async def run():
+        assert await executor.deploy_algorithm(_config(HELPERS_ALGORITHM))
+        deadline = time.monotonic() + 30
+        while not (workdir / "helpers.json").exists():
+            assert time.monotonic() < deadline, "algorithm did not run"
+            await asyncio.sleep(0.1)
+        await executor.stop_algorithm("a1")
+
+    asyncio.run(run())
+    result = json.loads((workdir / "helpers.json").read_text())
+    assert result["nearest"].startswith("NIFTY") and result["valid"] is True and result["bogus"] is False
+    assert result["token"] == executor.instruments.lookup("NFO:" + result["nearest"])["instrument_token"]
+
+
+ROUND_TRIP_ALGORITHM = '''
+def main():
+    symbol = get_nearest_future("NIFTY")
+    place_order(symbol, "BUY", 50)
+    place_order(symbol, "SELL", 50)
+'''
+
+
+def test_trades_count_fills_reported_by_the_algorithm(executor, monkeypatch):
+    import async_executor
+    monkeypatch.setattr(async_executor, "FILL_POLL_INTERVAL", 0.05)
+    config = _config(ROUND_TRIP_ALGORITHM)
+
+    async def run():
+        assert await executor.deploy_algorithm(config)
+        deadline = time.monotonic() + 30
+        while config.trades < 2:
+            assert time.monotonic() < deadline, "orders did not fill"
+            await asyncio.sleep(0.05)
+        await executor.stop_algorithm("a1")
+
+    asyncio.run(run())
+    # One run, two fills: trades are orders that filled, not runs
+    assert config.trades == 2
+    sell, buy = executor.get_trade_results("a1")
+    assert (buy["status"], sell["status"]) == ("COMPLETE", "COMPLETE")
+    assert config.profit == round(50 * (sell["price"] - buy["price"]), 2)
@@ -0,0 +1,96 @@
+"""
+Backtester tests
+Loading history, the simulated clock and broker seen by algorithm code,
+and the vectorized fills and P&L
+"""
+
+import numpy as np
+import pytest
+
+from backtester import Backtester, Bars, load_bars, run_backtest
+
+# Buys once on the first bar and holds
+BUY_AND_HOLD = """
+placed = []
+def main():
+    if not placed:
+        placed.append(place_order("NIFTY", "BUY", 10))
+"""
+
+
+def _bars(closes, opens=None):
+    n = len(closes)
+    closes = np.asarray(closes, dtype=np.float64)
+    return Bars(timestamp=1767355200.0 + 86400 * np.arange(n, dtype=np.float64),
+                open=np.asarray(opens if opens is not None else closes, dtype=np.float64),
+                high=closes, low=closes, close=closes, volume=np.zeros(n))
+
+
+def test_history_is_loaded_sorted_with_dates_at_the_close(workdir):
+    path = workdir / "bars.csv"
+    path.write_text("Date,Open,High,Low,Close,Volume\n"
+                    "2026-01-06,101,103,100,102,500\n"
+                    "2026-01-05,99,101,98,100,400\n")
+    bars = load_bars(str(path))
+    assert bars.close.tolist() == [100.0, 102.0]
+    assert bars.volume.tolist() == [400.0, 500.0]
+    assert np.all(np.diff(bars.timestamp) > 0)
+
+
+def test_ticks_with_only_a_last_price_become_flat_bars(workdir):
+    path = workdir / "ticks.csv"
+    path.write_text("timestamp,last_price\n1767320100000,22000.5\n1767320101000,22001\n")
+    bars = load_bars(str(path))
+    assert bars.timestamp.tolist() == [1767320100.0, 1767320101.0]
+    assert bars.open.tolist() == bars.close.tolist() == [22000.5, 22001.0]
+
+
+def test_history_without_prices_is_rejected(workdir):
+    path = workdir / "bars.csv"
+    path.write_text("date,volume\n2026-01-05,1\n")
+    with pytest.raises(ValueError):
+        load_bars(str(path))
+
+
+def test_orders_fill_at_the_next_open():
+    result = Backtester(BUY_AND_HOLD).run(_bars([100, 110, 120], opens=[100, 105, 115]))
+    assert result.summary["orders"] == result.summary["filled"] == 1
+    assert result.position.tolist() == [0, 10, 10]
+    assert result.summary["net_pnl"] == pytest.approx(10 * (120 - 105))
+
+
+def test_close_fills_with_slippage_and_commission():
+    result = Backtester(BUY_AND_HOLD, fill="close", slippage_bps=100, commission_bps=10).run(_bars([100, 120]))
+    fill_price = 101.0
+    commission = 10 * fill_price * 0.001
+    assert result.summary["commission"] == pytest.approx(commission)
+    assert result.summary["net_pnl"] == pytest.approx(10 * (120 - fill_price) - commission)
+
+
+def test_algorithms_see_the_simulated_clock_and_positions():
+    code = ("import datetime\n"
+            "seen = []\n"
+            "def main():\n"
+            "    seen.append(datetime.date.today().day)\n"
+            "    if len(seen) == 2:\n"
+            "        assert get_positions()['net'][0]['quantity'] == 5, get_positions()\n"
+            "    if len(seen) == 1:\n"
+            "        place_order('NIFTY', 'BUY', 5)\n"
+            "    if len(seen) == 3:\n"
+            "        raise RuntimeError(f'days {seen}')\n")
+    result = Backtester(code).run(_bars([100, 101, 102]))
+    assert result.summary["errors"] == 1
+    assert "days [2, 3, 4]" in result.errors[0]
+
+
+def test_run_backtest_reads_the_history_file(workdir):
+    path = workdir / "bars.csv"
+    path.write_text("date,close\n2026-01-05,100\n2026-01-06,90\n")
+    result = run_backtest(BUY_AND_HOLD, str(path), fill="close")
+    assert result.summary["net_pnl"] == pytest.approx(-100)
+    assert result.summary["max_drawdown"] == pytest.approx(-100)
+
+
+def test_unknown_fill_models_are_rejected():
+    with pytest.raises(ValueError):
+        Backtester(BUY_AND_HOLD, fill="vwap")
@@ -0,0 +1,26 @@
+"""
+Benchmark report tests
+Latency summaries and the regression check against a baseline report
+"""
+
+from benchmarks import _summary, compare
+
+
+def test_latencies_are_summarized_in_milliseconds():
+    summary = _summary([i / 1000 for i in range(1, 101)])
+    assert summary["count"] == 100
+    assert (summary["p50_ms"], summary["p99_ms"], summary["max_ms"]) == (51.0, 100.0, 100.0)
+    assert summary["mean_ms"] == 50.5
+    assert _summary([]) == {"count": 0}
+
+
+def test_regressions_depend_on_the_metric_direction():
+    baseline = {"results": {"deploy": {"p50_ms": 10.0, "deploys_per_second": 100.0, "count": 50},
+                            "api": {"wall_seconds": 2.0}}}
+    current = {"results": {"deploy": {"p50_ms": 14.0, "deploys_per_second": 60.0, "count": 10},
+                           "api": {"wall_seconds": 2.2}, "new": {"p50_ms": 1.0}}}
+    regressions = compare(current, baseline, threshold=0.25)
+    assert [line.split(":")[0] for line in regressions] == ["deploy.deploys_per_second", "deploy.p50_ms"]
+
+    # Improvements never count
+    assert compare(baseline, current, threshold=0.25) == []
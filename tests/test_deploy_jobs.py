@@ -0,0 +1,89 @@
+"""
+Deploy job tests
+Background deploys, one in-flight job per deployment, refusing a
+different request while one is pending, and the bounded record of
+finished jobs
+"""
+
+import threading
+import time
+
+import pytest
+
+from deploy_jobs import DeployInProgress, DeployJobs
+
+
+@pytest.fixture
+def jobs():
+    jobs = DeployJobs(max_workers=2, keep=2)
+    yield jobs
+    jobs.close()
+
+
+def _wait_finished(jobs, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while jobs.get(job_id)["finished_at"] is None:
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+    return jobs.get(job_id)
+
+
+def test_a_job_reports_the_deploy_result(jobs):
+    job, created = jobs.submit("d1", lambda: {"success": True, "message": "deployed"})
+    assert created and job["status"] in ("queued", "running", "succeeded")
+    job = _wait_finished(jobs, job["job_id"])
+    assert (job["status"], job["message"]) == ("succeeded", "deployed")
+
+    failed, _ = jobs.submit("d1", lambda: {"success": False, "message": "bad token"})
+    assert _wait_finished(jobs, failed["job_id"])["status"] == "failed"
+
+    def explode():
+        raise RuntimeError("boom")
+
+    crashed, _ = jobs.submit("d1", explode)
+    assert _wait_finished(jobs, crashed["job_id"])["message"] == "Error: boom"
+
+
+def test_one_job_per_deployment_is_in_flight(jobs):
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return {"success": True}
+
+    first, created = jobs.submit("d1", slow)
+    again, created_again = jobs.submit("d1", lambda: {"success": True})
+    assert created and not created_again
+    assert again["job_id"] == first["job_id"]
+    release.set()
+    _wait_finished(jobs, first["job_id"])
+    assert jobs.submit("d1", lambda: {"success": True})[1]
+
+
+def test_a_different_request_for_a_pending_deploy_is_refused(jobs):
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return {"success": True}
+
+    first, _ = jobs.submit("d1", slow, request={"algorithm_code": "v1"})
+    again, created = jobs.submit("d1", slow, request={"algorithm_code": "v1"})
+    assert again["job_id"] == first["job_id"] and not created
+    with pytest.raises(DeployInProgress) as refused:
+        jobs.submit("d1", lambda: {"success": True}, request={"algorithm_code": "v2"})
+    assert refused.value.job["job_id"] == first["job_id"]
+    release.set()
+    _wait_finished(jobs, first["job_id"])
+    assert jobs.submit("d1", lambda: {"success": True}, request={"algorithm_code": "v2"})[1]
+
+
+def test_only_the_newest_finished_jobs_are_kept(jobs):
+    job_ids = []
+    for i in range(3):
+        job, _ = jobs.submit(f"d{i}", lambda: {"success": True})
+        _wait_finished(jobs, job["job_id"])
+        job_ids.append(job["job_id"])
+    jobs.submit("d3", lambda: {"success": True})
+    assert jobs.get(job_ids[0]) is None
+    assert jobs.get(job_ids[2]) is not None
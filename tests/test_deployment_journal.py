@@ -0,0 +1,88 @@
+"""
+Deployment journal tests
+Replaying the journal over the snapshot, cutting off a torn tail, and
+compaction
+"""
+
+import json
+
+import pytest
+
+from deployment_journal import DeploymentJournal
+
+
+@pytest.fixture
+def paths(workdir):
+    return str(workdir / "deployments.json"), str(workdir / "deployments.journal")
+
+
+def _open(paths, **kwargs):
+    journal = DeploymentJournal(*paths, **kwargs)
+    return journal, journal.load()
+
+
+def test_changes_survive_a_restart(paths):
+    journal, state = _open(paths)
+    assert state == {}
+    journal.put("d1", {"status": "running", "trades": 0})
+    journal.put("d2", {"status": "running"})
+    journal.update("d1", trades=2)
+    journal.delete("d2", wait=True)
+    journal.close()
+
+    journal, state = _open(paths)
+    journal.close()
+    assert state == {"d1": {"status": "running", "trades": 2}}
+
+
+def test_a_torn_tail_is_cut_off(paths):
+    journal, _ = _open(paths)
+    journal.put("d1", {"status": "running"})
+    journal.update("d1", status="stopped", wait=True)
+    journal.close()
+    with open(paths[1], "rb") as f:
+        lines = f.readlines()
+    # A crash halfway through the second record
+    with open(paths[1], "wb") as f:
+        f.write(lines[0] + lines[1][:10])
+
+    journal, state = _open(paths)
+    journal.close()
+    assert state == {"d1": {"status": "running"}}
+    with open(paths[1], "rb") as f:
+        assert f.read() == lines[0]
+
+
+def test_a_corrupt_record_stops_replay(paths):
+    journal, _ = _open(paths)
+    journal.put("d1", {"status": "running"})
+    journal.update("d1", trades=1)
+    journal.update("d1", trades=2, wait=True)
+    journal.close()
+    with open(paths[1], "rb") as f:
+        lines = f.readlines()
+    lines[1] = lines[1].replace(b'"trades":1', b'"trades":9')
+    with open(paths[1], "wb") as f:
+        f.writelines(lines)
+
+    journal, state = _open(paths)
+    journal.close()
+    assert state == {"d1": {"status": "running"}}
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(paths):
+    journal, _ = _open(paths, compact_every=3)
+    for i in range(3):
+        journal.put(f"d{i}", {"status": "running"})
+    journal.sync()
+    journal.update("d0", status="stopped", wait=True)
+    journal.compact()
+    journal.close()
+
+    with open(paths[0]) as f:
+        assert json.load(f)["d0"] == {"status": "stopped"}
+    with open(paths[1], "rb") as f:
+        assert f.read() == b""
+    journal, state = _open(paths)
+    journal.close()
+    assert sorted(state) == ["d0", "d1", "d2"]
@@ -0,0 +1,127 @@
+"""
+Lease and fencing tests
+LeaseManager ownership, expiry and fencing tokens, fenced store writes and
+two executor nodes sharing one store
+"""
+
+import time
+
+import pytest
+
+from deployment_leases import LeaseManager, NODE_ID_ENV
+from deployment_store import DeploymentStore, DEPLOYMENT_STORE_ENV
+
+NOOP_ALGORITHM = "def main():\n    pass\n"
+
+
+@pytest.fixture
+def store(workdir):
+    store = DeploymentStore(str(workdir / "deployments.db"))
+    store.load()
+    yield store
+    store.close()
+
+
+def _config(algorithm_id, **fields):
+    from algorithm_executor import DeploymentConfig
+    return DeploymentConfig(algorithm_id=algorithm_id, algorithm_name=algorithm_id, algorithm_code=NOOP_ALGORITHM,
+                            api_key="key", access_token="token", run_interval=3600, **fields)
+
+
+def test_lease_is_exclusive_until_released(store):
+    a = LeaseManager(store.db_path, "A")
+    b = LeaseManager(store.db_path, "B")
+    try:
+        assert a.acquire("d1") == 1
+        assert b.acquire("d1") is None
+        assert b.owner("d1") == "A"
+        # Re-acquiring a held lease keeps its token
+        assert a.acquire("d1") == 1
+
+        a.release("d1")
+        assert b.acquire("d1") == 2
+        assert not a.holds("d1")
+    finally:
+        a.close()
+        b.close()
+
+
+def test_expired_lease_is_taken_over_with_a_higher_token(store):
+    a = LeaseManager(store.db_path, "A", ttl=0.5, margin=0.1)
+    b = LeaseManager(store.db_path, "B", ttl=0.5, margin=0.1)
+    try:
+        assert a.acquire("d1") == 1
+        time.sleep(0.6)
+        # A's local deadline has passed, so it no longer acts for d1
+        assert not a.holds("d1")
+        assert b.acquire("d1") == 2
+        assert a.renew() == ["d1"]
+    finally:
+        a.close()
+        b.close()
+
+
+def test_claimable_is_limited_to_a_fair_share(store):
+    for i in range(4):
+        store.put(f"d{i}", {"status": "running"})
+    store.put("idle", {"status": "stopped"})
+    store.sync()
+    a = LeaseManager(store.db_path, "A")
+    b = LeaseManager(store.db_path, "B")
+    try:
+        claimable = a.claimable()
+        assert claimable == ["d0", "d1"]
+        for algorithm_id in claimable:
+            a.acquire(algorithm_id)
+        assert a.claimable() == []
+        assert b.claimable() == ["d2", "d3"]
+    finally:
+        a.close()
+        b.close()
+
+
+def test_store_drops_writes_with_an_older_fencing_token(store):
+    store.put("d1", {"status": "running", "owner": "A"}, wait=True, fence=1)
+    store.put("d1", {"status": "running", "owner": "B"}, wait=True, fence=2)
+    store.put("d1", {"status": "running", "owner": "A"}, wait=True, fence=1)
+    store.update("d1", wait=True, fence=1, status="stopped")
+    assert store.get("d1") == {"status": "running", "owner": "B"}
+
+    store.update("d1", wait=True, fence=2, status="stopped")
+    assert store.get("d1")["status"] == "stopped"
+
+
+def test_second_node_does_not_run_deployments_leased_by_the_first(exchange, workdir, monkeypatch):
+    """Starting the API server as node B must not resume node A's deployments"""
+    from algorithm_executor import AlgorithmExecutor
+    import api_server
+
+    db_path = str(workdir / "shared.db")
+    node_a = AlgorithmExecutor(store_path=db_path, node_id="A")
+    try:
+        for i in range(3):
+            assert node_a.deploy_algorithm(_config(f"d{i}"))
+
+        # Importing the API server does not create an executor; it is created once configured
+        assert api_server.executor is None
+        monkeypatch.setenv(DEPLOYMENT_STORE_ENV, db_path)
+        monkeypatch.setenv(NODE_ID_ENV, "B")
+        node_b = api_server.start_executor(0)
+        try:
+            assert not node_b.deploy_algorithm(_config("d0"))
+            # Give B a couple of coordination rounds
+            time.sleep(node_b.leases.ttl / 2)
+            assert node_b.deployments == {}
+            assert sorted(node_a.leases.held()) == ["d0", "d1", "d2"]
+            assert all(node_a.is_running(f"d{i}") for i in range(3))
+
+            # A stop requested on B is applied by A, the owner
+            assert node_b.stop_algorithm("d1")
+            node_a.coordinate()
+            assert node_a.deployments["d1"].status == "stopped"
+        finally:
+            node_b.close()
+            api_server.executor = None
+            api_server.api = None
+    finally:
+        node_a.close()
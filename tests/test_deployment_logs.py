@@ -0,0 +1,105 @@
+"""
+Deployment log tests
+Offset-based reads from the ring buffer and from rotated files, restart
+recovery, the cached oldest offset, and following a log as server-sent
+events
+"""
+
+import json
+
+import pytest
+
+from deployment_logs import DeploymentLog, DeploymentLogs, follow_stream
+
+
+@pytest.fixture
+def log(workdir):
+    # Small ring and files so reads quickly reach rotated data
+    log = DeploymentLog(str(workdir / "algo.log"), capacity=10, max_bytes=2000, backups=3)
+    yield log
+    log.close()
+
+
+def _texts(page):
+    return [line["text"] for line in page["lines"]]
+
+
+def test_recent_lines_are_read_from_the_buffer(log):
+    log.append("one\ntwo")
+    log.append("three")
+    page = log.read()
+    assert _texts(page) == ["one", "two", "three"]
+    assert [line["offset"] for line in page["lines"]] == [0, 1, 2]
+    assert page["next_offset"] == 3
+    assert _texts(log.read(since=1, limit=1)) == ["two"]
+    assert log.read(since=3)["lines"] == []
+
+
+def test_older_lines_are_found_in_rotated_files(log, workdir):
+    for i in range(300):
+        log.append(f"line {i}")
+    assert (workdir / "algo.log.1").exists()
+
+    page = log.read()
+    assert page["first_offset"] > 0
+    oldest = page["first_offset"]
+    assert _texts(log.read(since=oldest, limit=3)) == [f"line {i}" for i in range(oldest, oldest + 3)]
+    # A window that spans a rotation boundary is returned whole
+    middle = log.read(since=150, limit=60)
+    assert _texts(middle) == [f"line {i}" for i in range(150, 210)]
+
+
+def test_a_window_rotated_away_resumes_at_the_oldest_line(log):
+    for i in range(1000):
+        log.append(f"line {i}")
+    page = log.read(since=0, limit=5)
+    assert page["first_offset"] > 0
+    assert [line["offset"] for line in page["lines"]] == list(range(page["first_offset"], page["first_offset"] + 5))
+
+
+def test_the_oldest_offset_is_read_from_disk_only_after_a_rotation(log, workdir, monkeypatch):
+    log.append("first")
+    assert log.read()["first_offset"] == 0
+    opened, real_open = [], open
+
+    def recording_open(path, *args, **kwargs):
+        opened.append(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", recording_open)
+    for _ in range(5):
+        log.read()
+    assert opened == []
+
+    monkeypatch.undo()
+    for i in range(300):
+        log.append(f"line {i}")
+    # Rotation dropped the oldest lines, and the next read finds the new oldest one
+    page = log.read()
+    assert page["first_offset"] > 0
+    with open(workdir / "algo.log.3", "rb") as f:
+        assert int(f.readline().split()[0]) == page["first_offset"]
+
+
+def test_numbering_continues_after_a_restart(workdir):
+    first = DeploymentLog(str(workdir / "algo.log"))
+    first.append("a\nb")
+    first.close()
+    second = DeploymentLog(str(workdir / "algo.log"))
+    second.append("c")
+    assert [line["offset"] for line in second.read(since=0)["lines"]] == [0, 1, 2]
+    second.close()
+
+
+def test_logs_are_followed_as_sse(workdir):
+    logs = DeploymentLogs(str(workdir / "logs"))
+    assert logs.read("missing") == {"lines": [], "first_offset": 0, "next_offset": 0}
+    logs.append("d1", "hello")
+    assert logs.get("missing", create=False) is None
+    stream = follow_stream(logs.get("d1", create=False), since=0, heartbeat=0.01)
+    assert next(stream) == "retry: 2000\n\n"
+    event = next(stream)
+    assert event.startswith("id: 0\nevent: log\n")
+    assert json.loads(event.split("data: ", 1)[1])["text"] == "hello"
+    assert next(stream) == ": keepalive\n\n"
+    logs.close()
@@ -0,0 +1,116 @@
+"""
+Deployment store tests
+Batched writes, recovery from a failing statement, pageable queries,
+run pruning and legacy JSON import
+"""
+
+import datetime
+import json
+import threading
+import time
+
+import pytest
+
+import deployment_store
+from deployment_store import DeploymentStore
+
+
+@pytest.fixture
+def store(workdir):
+    store = DeploymentStore(str(workdir / "deployments.db"))
+    store.load()
+    yield store
+    store.close()
+
+
+def _started(days_ago):
+    return (datetime.datetime.now() - datetime.timedelta(days=days_ago)).isoformat()
+
+
+def test_writes_are_visible_after_sync(store):
+    for i in range(50):
+        store.put(f"d{i:02d}", {"status": "running" if i % 2 else "stopped", "algorithm_code": "x"})
+    store.update("d01", status="stopped", trades=3)
+    store.sync()
+
+    assert store.count() == 50
+    assert store.count("running") == 24
+    assert store.get("d01") == {"status": "stopped", "algorithm_code": "x", "trades": 3}
+
+
+def test_deployments_are_paged_by_id(store):
+    for i in range(5):
+        store.put(f"d{i}", {"status": "running", "algorithm_id": f"d{i}", "algorithm_code": "x"})
+    store.sync()
+
+    first = store.deployments(limit=2, include_code=False)
+    assert [d["algorithm_id"] for d in first] == ["d0", "d1"]
+    assert "algorithm_code" not in first[0]
+    rest = store.deployments(after="d1")
+    assert [d["algorithm_id"] for d in rest] == ["d2", "d3", "d4"]
+
+
+def test_a_failing_statement_does_not_lose_the_rest_of_its_batch(store):
+    store.put("d1", {"status": "running"})
+    # timestamp is NOT NULL, so this insert fails inside the same batch
+    store.record_trade("d1", {"order_id": "1", "status": "PLACED"})
+    store.record_run("d1", _started(0), 0.5, "worker", "ok")
+    store.sync()
+
+    assert store.get("d1") == {"status": "running"}
+    assert len(store.runs("d1")) == 1
+    assert store.trades("d1") == []
+
+
+def test_appends_do_not_wait_for_a_commit(store, monkeypatch):
+    entered, release = threading.Event(), threading.Event()
+    commit = store._commit
+
+    def slow_commit(batch):
+        entered.set()
+        release.wait(5)
+        commit(batch)
+
+    monkeypatch.setattr(store, "_commit", slow_commit)
+    store.put("d1", {"status": "running"})
+    assert entered.wait(5)
+    started = time.perf_counter()
+    store.put("d2", {"status": "running"})
+    assert time.perf_counter() - started < 0.5
+    release.set()
+    store.sync()
+    assert store.count() == 2
+
+
+def test_history_is_paged_newest_first(store):
+    for i in range(5):
+        store.record_trade("d1", {"order_id": str(i), "timestamp": _started(0), "status": "COMPLETE"})
+    store.sync()
+
+    page = store.trades("d1", limit=3)
+    assert [t["order_id"] for t in page] == ["4", "3", "2"]
+    assert [t["order_id"] for t in store.trades("d1", before=page[-1]["id"])] == ["1", "0"]
+
+
+def test_old_runs_are_pruned(store, monkeypatch):
+    monkeypatch.setattr(deployment_store, "PRUNE_CHUNK", 2)
+    # Not pruned by the writer during this test
+    monkeypatch.setattr(deployment_store, "PRUNE_INTERVAL", float("inf"))
+    for days_ago in (30, 20, 10, 8, 1, 0):
+        store.record_run("d1", _started(days_ago), 0.1, "worker", "ok")
+    store.sync()
+
+    assert store.prune_runs() == 4
+    assert len(store.runs("d1")) == 2
+    assert store.prune_runs(older_than_days=0.5) == 1
+
+
+def test_legacy_json_state_is_imported_once(workdir):
+    (workdir / "deployments.json").write_text(json.dumps({"d1": {"status": "running"}}))
+    store = DeploymentStore(str(workdir / "deployments.db"))
+    try:
+        assert store.load() == {"d1": {"status": "running"}}
+    finally:
+        store.close()
+    assert (workdir / "deployments.json.migrated").exists()
+    assert not (workdir / "deployments.json").exists()
@@ -0,0 +1,49 @@
+"""
+Event stream tests
+Fan-out to subscribers, catching up after a reconnect, dropping slow
+subscribers and the text/event-stream rendering
+"""
+
+from event_stream import EventBus, sse_stream
+
+
+def test_events_reach_every_subscriber_in_order():
+    bus = EventBus()
+    first, second = bus.subscribe(), bus.subscribe()
+    bus.publish("status", {"algorithm_id": "d1", "status": "running"})
+    bus.publish("trade", {"algorithm_id": "d1"})
+    for subscription in (first, second):
+        assert [subscription.get(1)["type"] for _ in range(2)] == ["status", "trade"]
+        assert subscription.get(0.01) is None
+
+
+def test_a_reconnect_receives_what_it_missed():
+    bus = EventBus(history=3)
+    for i in range(5):
+        bus.publish("pnl", {"n": i})
+    subscription = bus.subscribe(last_event_id=3)
+    assert [subscription.get(1)["id"] for _ in range(2)] == [4, 5]
+    assert subscription.get(0.01) is None
+
+
+def test_a_slow_subscriber_is_dropped_without_blocking_the_publisher():
+    bus = EventBus(queue_size=2)
+    slow = bus.subscribe()
+    for i in range(3):
+        bus.publish("pnl", {"n": i})
+    assert slow.overflowed
+    assert len(bus) == 0
+
+
+def test_events_are_rendered_as_sse():
+    bus = EventBus()
+    subscription = bus.subscribe()
+    stream = sse_stream(subscription, heartbeat=0.01)
+    assert next(stream) == "retry: 2000\n\n"
+    assert next(stream) == ": keepalive\n\n"
+    bus.publish("status", {"algorithm_id": "d1"})
+    assert next(stream) == 'id: 1\nevent: status\ndata: {"algorithm_id": "d1"}\n\n'
+
+    # Closing the stream unsubscribes
+    stream.close()
+    assert len(bus) == 0
@@ -0,0 +1,147 @@
+"""
+Sharded executor tests
+Rendezvous placement, splitting an unsharded executor's state over the
+shards, the instrument master shared by all shards, and event forwarding
+that survives an overflow
+"""
+
+import datetime
+import threading
+import time
+from dataclasses import asdict
+
+from deployment_store import DeploymentStore
+from event_stream import EventBus
+from executor_shards import ShardedExecutor, forward_events, shard_score
+
+NOOP_ALGORITHM = "def main():\n    pass\n"
+
+
+def _owner(algorithm_id, shards):
+    return max(range(shards), key=lambda index: shard_score(algorithm_id, index))
+
+
+def _config(algorithm_id, **fields):
+    from algorithm_executor import DeploymentConfig
+    return DeploymentConfig(algorithm_id=algorithm_id, algorithm_name=algorithm_id, algorithm_code=NOOP_ALGORITHM,
+                            api_key="key", access_token="token", run_interval=3600, **fields)
+
+
+def _wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.1)
+
+
+def test_rendezvous_placement_is_stable_and_spread():
+    ids = [f"algo-{i}" for i in range(400)]
+    owners = [_owner(algorithm_id, 4) for algorithm_id in ids]
+    assert all(owners.count(index) > 60 for index in range(4))
+    # Adding a shard only moves ids onto the new shard
+    for algorithm_id, before in zip(ids, owners):
+        assert _owner(algorithm_id, 5) in (before, 4)
+
+
+def test_unsharded_state_is_split_and_resumed(exchange, workdir):
+    store = DeploymentStore("deployments.db")
+    store.load()
+    ids = [f"d{i}" for i in range(6)]
+    for algorithm_id in ids:
+        status = "stopped" if algorithm_id == "d5" else "running"
+        store.put(algorithm_id, asdict(_config(algorithm_id, status=status, created_at="2026-01-02T09:15:00")))
+        store.record_run(algorithm_id, datetime.datetime.now().isoformat(), 0.1, "worker", "ok")
+    store.close()
+    (workdir / "indicators_d0.pkl").write_bytes(b"state")
+    (workdir / "logs").mkdir()
+    (workdir / "logs" / "algorithm_d0.log").write_text("earlier output\n")
+
+    executor = ShardedExecutor(2)
+    try:
+        assert not (workdir / "deployments.db").exists()
+        assert (workdir / "deployments.db.sharded").exists()
+        for algorithm_id in ids:
+            assert executor.shard_for(algorithm_id).index == _owner(algorithm_id, 2)
+            assert executor.get_runs(algorithm_id)[-1]["outcome"] == "ok"
+        _wait_for(lambda: all(executor.is_running(algorithm_id) for algorithm_id in ids[:5]))
+        assert not executor.is_running("d5")
+
+        shard_dir = workdir / "shards" / str(_owner("d0", 2))
+        assert (shard_dir / "indicators_d0.pkl").read_bytes() == b"state"
+        assert (shard_dir / "logs" / "algorithm_d0.log").exists()
+
+        # Every shard uses the supervisor's instrument master
+        _wait_for(lambda: (workdir / "instruments.db").exists())
+        assert not list((workdir / "shards").glob("*/instruments.db"))
+    finally:
+        executor.close()
+
+    # A second start finds nothing left to split
+    executor = ShardedExecutor(2)
+    try:
+        assert sorted(executor.owners) == ids
+    finally:
+        executor.close()
+
+
+def test_instrument_refresh_reuses_a_dump_written_by_another_process(exchange, workdir):
+    from instrument_store import InstrumentStore
+    from kite_sessions import shared_sessions
+
+    calls = []
+
+    def session_factory(api_key, access_token):
+        calls.append(api_key)
+        return shared_sessions.get(api_key, access_token)
+
+    first = InstrumentStore("instruments.db", session_factory)
+    second = InstrumentStore("instruments.db", session_factory)
+    try:
+        assert second.is_stale()
+        assert first.refresh("key", "token")
+        # second still sees no dump, but finds today's on disk once it takes the lock
+        assert second.refresh("key", "token") is False
+        assert calls == ["key"]
+        assert second.exists("NSE:TCS")
+    finally:
+        first.close()
+        second.close()
+
+
+class _EventSource:
+    """The parts of an executor forward_events uses"""
+
+    def __init__(self):
+        self.events = EventBus(queue_size=5)
+
+    def status_events(self):
+        return [{"algorithm_id": "d1", "status": "running"}]
+
+
+def test_event_forwarding_resumes_after_an_overflow():
+    source, sent = _EventSource(), []
+    blocked, release, stopped = threading.Event(), threading.Event(), threading.Event()
+
+    def send(frame):
+        if not blocked.is_set():
+            # Hold the forwarder on its first frame while a burst overflows its queue
+            blocked.set()
+            release.wait(5)
+        sent.append(frame)
+
+    thread = threading.Thread(target=forward_events, args=(source, send, stopped), daemon=True)
+    thread.start()
+    try:
+        source.events.publish("pnl", {"n": -1})
+        assert blocked.wait(5)
+        for i in range(10):
+            source.events.publish("pnl", {"n": i})
+        release.set()
+        _wait_for(lambda: {"type": "event", "event_type": "status",
+                           "data": {"algorithm_id": "d1", "status": "running"}} in sent)
+
+        source.events.publish("trade", {"algorithm_id": "d1"})
+        _wait_for(lambda: sent[-1]["event_type"] == "trade")
+    finally:
+        stopped.set()
+        thread.join(5)
@@ -0,0 +1,69 @@
+"""
+Indicator tests
+Incremental indicators against their NumPy batch versions, and named
+indicator state kept across runs
+"""
+
+import numpy as np
+import pytest
+
+import indicators as ind
+from indicators import Indicators, RingBuffer
+
+PRICES = 100 + np.cumsum(np.random.default_rng(7).normal(0, 1, 300))
+
+
+def test_ring_buffer_keeps_the_newest_values_in_order():
+    buffer = RingBuffer(3)
+    assert [buffer.push(value) for value in (1.0, 2.0, 3.0, 4.0)] == [None, None, None, 1.0]
+    assert buffer.full
+    assert buffer.values().tolist() == [2.0, 3.0, 4.0]
+
+
+@pytest.mark.parametrize("kind, batch", [
+    ("sma", lambda x: ind.sma(x, 20)),
+    ("ema", lambda x: ind.ema(x, 20)),
+    ("rsi", lambda x: ind.rsi(x, 20)),
+    ("rolling_max", lambda x: ind.rolling_max(x, 20)),
+    ("rolling_min", lambda x: ind.rolling_min(x, 20)),
+])
+def test_incremental_matches_batch(kind, batch):
+    indicator = ind.INDICATORS[kind](20)
+    values = [indicator.update(float(price)) for price in PRICES]
+    expected = batch(PRICES)
+    assert values[-1] == pytest.approx(expected[-1])
+    assert values[100] == pytest.approx(expected[100])
+
+
+def test_warm_up_continues_where_history_ends():
+    warmed = ind.EMA(20).warm_up(PRICES[:200])
+    for price in PRICES[200:]:
+        warmed.update(float(price))
+    assert warmed.value == pytest.approx(ind.ema(PRICES, 20)[-1])
+
+
+def test_named_indicators_survive_a_save_and_load(workdir):
+    path = str(workdir / "state.pkl")
+    indicators = Indicators(path)
+    indicators.sma("fast", 10, history=PRICES[:50])
+    indicators.save()
+
+    restored = Indicators.load(path)
+    fast = restored.sma("fast", 10)
+    assert fast.value == pytest.approx(ind.sma(PRICES[:50], 10)[-1])
+    assert restored.sma("fast", 10) is fast
+
+
+def test_changed_parameters_rebuild_the_indicator(workdir):
+    path = str(workdir / "state.pkl")
+    indicators = Indicators(path)
+    indicators.sma("fast", 10, history=PRICES)
+    indicators.save()
+
+    # A redeploy changes the period: the pickled 10-period SMA must not be reused
+    restored = Indicators.load(path)
+    fast = restored.sma("fast", 5)
+    assert fast.period == 5 and fast.value is None
+    assert restored.bollinger("bands", 20, 2.0) is restored.bollinger("bands", 20, 2.0)
+    assert restored.bollinger("bands", 20, 2.5).width == 2.5
+
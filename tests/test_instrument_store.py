@@ -0,0 +1,82 @@
+"""
+Instrument store tests
+Existence checks and lookups from the local instrument master, contract
+roll-over by expiry, and downloading at most once a day
+"""
+
+import datetime
+
+import pytest
+
+from instrument_store import InstrumentStore
+
+TODAY = datetime.date.today()
+
+
+class FakeKite:
+    """An instruments dump with an expired, a current and a next-month NIFTY future"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def instruments(self):
+        self.calls += 1
+        rows = [{"instrument_token": 2953217, "exchange": "NSE", "tradingsymbol": "TCS", "name": "TCS",
+                 "instrument_type": "EQ", "segment": "NSE", "lot_size": 1, "tick_size": 0.05}]
+        for token, days in ((1001, -3), (1002, 10), (1003, 40)):
+            expiry = TODAY + datetime.timedelta(days=days)
+            rows.append({"instrument_token": token, "exchange": "NFO", "tradingsymbol": f"NIFTY{token}FUT",
+                         "name": "NIFTY", "instrument_type": "FUT", "segment": "NFO-FUT", "expiry": expiry,
+                         "lot_size": 50, "tick_size": 0.05})
+        return rows
+
+
+@pytest.fixture
+def kite():
+    return FakeKite()
+
+
+@pytest.fixture(params=[True, False], ids=["preload", "sqlite"])
+def store(workdir, kite, request):
+    store = InstrumentStore(str(workdir / "instruments.db"), lambda api_key, access_token: kite,
+                            preload=request.param)
+    yield store
+    store.close()
+
+
+def test_nothing_is_known_before_the_first_download(store):
+    assert not store.loaded and store.is_stale()
+    assert store.exists("NSE:TCS") is None
+    assert store.nearest_expiry("NIFTY") is None
+
+
+def test_symbols_are_checked_against_the_dump(store):
+    assert store.refresh("key", "token")
+    assert store.exists("NSE:TCS") is True
+    assert store.exists("NSE:NOPE") is False
+    assert store.lookup("NSE:TCS")["instrument_token"] == 2953217
+    assert store.by_token(1002)["lot_size"] == 50
+
+
+def test_the_nearest_unexpired_contract_is_chosen(store):
+    store.refresh("key", "token")
+    assert store.nearest_expiry("NIFTY")["instrument_token"] == 1002
+    later = TODAY + datetime.timedelta(days=20)
+    assert store.nearest_expiry("NIFTY", on_or_after=later)["instrument_token"] == 1003
+    assert store.nearest_expiry("BANKNIFTY") is None
+
+
+def test_the_dump_is_downloaded_once_a_day(store, kite, workdir):
+    assert store.refresh("key", "token")
+    assert not store.refresh("key", "token")
+    assert store.trading_day == TODAY.isoformat()
+    assert kite.calls == 1
+
+    # A new store on the same file reuses today's dump
+    again = InstrumentStore(str(workdir / "instruments.db"), lambda api_key, access_token: kite)
+    try:
+        assert again.loaded and not again.is_stale()
+    finally:
+        again.close()
+    assert store.refresh("key", "token", force=True)
+    assert kite.calls == 2
@@ -0,0 +1,60 @@
+"""
+Kite session registry tests
+One pooled client per set of credentials, idle eviction and the
+per-day profile cache
+"""
+
+import time
+
+from kite_sessions import KiteSessionRegistry
+
+
+def test_clients_are_shared_per_credentials():
+    registry = KiteSessionRegistry(root="http://127.0.0.1:1")
+    try:
+        first = registry.get("key", "token")
+        assert registry.get("key", "token") is first
+        assert registry.get("key", "other") is not first
+        assert first.root == "http://127.0.0.1:1"
+        assert len(registry) == 2
+    finally:
+        registry.close_all()
+
+
+def test_idle_sessions_are_evicted():
+    registry = KiteSessionRegistry(idle_timeout=0.05)
+    try:
+        registry.get("key", "token")
+        time.sleep(0.1)
+        assert registry.evict_idle() == 1
+        assert len(registry) == 0
+
+        # Handing out a session also sweeps the idle ones
+        registry.get("key", "token")
+        time.sleep(0.1)
+        registry.get("key", "fresh")
+        assert len(registry) == 1
+    finally:
+        registry.close_all()
+
+
+def test_profiles_are_remembered_until_discarded():
+    registry = KiteSessionRegistry()
+    assert registry.verified_profile("key", "token") is None
+    registry.remember_profile("key", "token", {"user_id": "AB1234"})
+    assert registry.verified_profile("key", "token") == {"user_id": "AB1234"}
+
+    registry.discard("key", "token")
+    assert registry.verified_profile("key", "token") is None
+
+
+def test_changing_the_root_closes_sessions_and_forgets_profiles():
+    registry = KiteSessionRegistry()
+    old = registry.get("key", "token")
+    registry.remember_profile("key", "token", {"user_id": "AB1234"})
+
+    registry.set_root("http://127.0.0.1:1")
+    assert len(registry) == 0
+    assert registry.verified_profile("key", "token") is None
+    assert registry.get("key", "token") is not old
+    registry.close_all()
@@ -0,0 +1,145 @@
+"""
+Market data tests
+The shared-memory tick ring: wrap-around, readers attached by name,
+consistent reads while the writer runs, replaying recorded ticks, and
+feeds that follow the configured Kite root
+"""
+
+import threading
+
+import pytest
+
+import market_data
+from market_data import MarketDataHub, ReplayFeed, TickBuffer
+
+
+@pytest.fixture
+def buffer():
+    buffer = TickBuffer.create(capacity=8, depth=4)
+    yield buffer
+    buffer.close()
+
+
+def test_the_ring_keeps_the_newest_ticks(buffer):
+    for i in range(6):
+        buffer.write(256265, 1000.0 + i, 100.0 + i, volume=i)
+    assert buffer.sequence(256265) == 6
+    assert [tick.last_price for tick in buffer.history(256265, 10)] == [102.0, 103.0, 104.0, 105.0]
+    assert buffer.latest(256265).volume == 5
+    assert buffer.latest(738561) is None
+
+
+def test_readers_attach_by_name(buffer):
+    buffer.write(738561, 1000.0, 3500.5)
+    reader = TickBuffer.attach(buffer.name)
+    try:
+        assert reader.latest(738561).last_price == 3500.5
+        assert reader.wait_for_update(738561, after=1, timeout=0.05) == 1
+        buffer.write(738561, 1001.0, 3501.0)
+        assert reader.wait_for_update(738561, after=1, timeout=1) == 2
+    finally:
+        reader.close()
+    # Closing a reader leaves the block to its owner
+    assert buffer.latest(738561).last_price == 3501.0
+
+
+def test_a_full_buffer_refuses_new_instruments(buffer):
+    for token in range(1, 9):
+        buffer.write(token, 1000.0, 1.0)
+    with pytest.raises(MemoryError):
+        buffer.write(9, 1000.0, 1.0)
+
+
+def test_reads_never_see_a_half_written_tick(buffer):
+    done = threading.Event()
+
+    def writer():
+        for i in range(20000):
+            # Every field of a tick carries the same number
+            buffer.write(1, float(i), float(i), volume=i, oi=i)
+        done.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        while not done.is_set():
+            for tick in buffer.history(1, 4):
+                assert tick.timestamp == tick.last_price == tick.volume == tick.oi
+    finally:
+        thread.join()
+
+
+def test_recorded_ticks_are_replayed_into_the_hub(workdir):
+    path = workdir / "ticks.csv"
+    path.write_text("instrument_token,timestamp,last_price,volume\n"
+                    "256265,1000,22000.5,10\n"
+                    "738561,1001,3500,\n"
+                    "256265,1002,22001.0,12\n")
+    hub = MarketDataHub(capacity=8, depth=4)
+    seen = []
+    hub.add_listener(seen.append)
+    try:
+        feed = hub.replay(str(path))
+        feed.join(5)
+        assert feed.count == 3
+        assert [tick.instrument_token for tick in seen] == [256265, 738561, 256265]
+        assert hub.buffer.latest(256265).last_price == 22001.0
+    finally:
+        hub.close()
+
+
+def test_replay_reads_json_lines(workdir, buffer):
+    path = workdir / "ticks.jsonl"
+    path.write_text('{"instrument_token": 1, "timestamp": 1000, "last_price": 5.5, "oi": 7}\n\n')
+    assert ReplayFeed(str(path), buffer).run() == 1
+    assert buffer.latest(1).oi == 7
+
+
+class FakeFeed:
+    """KiteTickerFeed stand-in that records where it would connect"""
+
+    def __init__(self, api_key, access_token, buffer, root=None, on_tick=None):
+        self.root = root
+        self.tokens = set()
+        self.stopped = False
+
+    def start(self):
+        pass
+
+    def subscribe(self, tokens):
+        self.tokens |= set(tokens)
+
+    def stop(self):
+        self.stopped = True
+
+
+def test_feeds_move_with_the_kite_root(monkeypatch):
+    monkeypatch.setattr(market_data, "KiteTickerFeed", FakeFeed)
+    hub = MarketDataHub(capacity=8, depth=4, root="http://127.0.0.1:9000")
+    try:
+        hub.subscribe("key", "token", [256265])
+        first = hub.feeds[("key", "token")]
+        assert first.root == "ws://127.0.0.1:9000"
+
+        hub.set_root(None)
+        moved = hub.feeds[("key", "token")]
+        assert first.stopped and moved is not first
+        assert (moved.root, moved.tokens) == (None, {256265})
+    finally:
+        hub.close()
+
+
+def test_the_executor_feed_follows_the_shared_root(exchange):
+    from algorithm_executor import AlgorithmExecutor
+    from kite_sessions import shared_sessions
+
+    executor = AlgorithmExecutor()
+    try:
+        assert executor.market_data.root == exchange.root
+        shared_sessions.set_root("http://127.0.0.1:9")
+        assert executor.market_data.root == "http://127.0.0.1:9"
+    finally:
+        executor.close()
+    # A closed executor no longer listens for root changes
+    shared_sessions.set_root(exchange.root)
+    assert executor.market_data.root == "http://127.0.0.1:9"
@@ -0,0 +1,50 @@
+"""
+Metrics tests
+Counters and histograms per label set and their Prometheus text rendering
+"""
+
+import pytest
+
+from metrics import MetricsRegistry
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_counters_are_kept_per_label_set(registry):
+    errors = registry.counter("errors_total", "Errors", ("deployment",))
+    errors.inc(deployment="d1")
+    errors.inc(2, deployment="d1")
+    errors.inc(deployment='d"2')
+    assert errors.value(deployment="d1") == 3
+    assert registry.render() == ("# HELP errors_total Errors\n"
+                                 "# TYPE errors_total counter\n"
+                                 'errors_total{deployment="d\\"2"} 1\n'
+                                 'errors_total{deployment="d1"} 3\n')
+    with pytest.raises(ValueError):
+        errors.inc(method="quote")
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        latency.observe(value)
+    with latency.time():
+        pass
+    assert latency.count() == 5
+    lines = registry.render().splitlines()
+    assert lines[2:] == ['latency_seconds_bucket{le="0.1"} 3',
+                         'latency_seconds_bucket{le="1"} 4',
+                         'latency_seconds_bucket{le="+Inf"} 5',
+                         lines[5],
+                         "latency_seconds_count 5"]
+    assert lines[5].startswith("latency_seconds_sum 5.65")
+
+
+def test_metrics_register_once_per_name(registry):
+    first = registry.counter("runs_total", "Runs", ("mode",))
+    assert registry.counter("runs_total", "Runs", ("mode",)) is first
+    with pytest.raises(ValueError):
+        registry.histogram("runs_total", "Runs", ("mode",))
@@ -0,0 +1,114 @@
+"""
+Order fill tests
+Placed orders are followed until the broker reports them final, and only
+fills count as trades, at the broker's average price
+"""
+
+import threading
+import time
+from dataclasses import asdict
+
+from order_fills import FillWatcher
+
+
+class FakeKite:
+    def __init__(self):
+        self.book = {}
+        self.calls = 0
+
+    def orders(self):
+        self.calls += 1
+        return list(self.book.values())
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_watcher_reports_orders_once_they_are_final():
+    kite = FakeKite()
+    kite.book["1"] = {"order_id": "1", "status": "OPEN", "filled_quantity": 0, "average_price": 0.0}
+    watcher = FillWatcher(lambda api_key, access_token: kite, interval=0.05)
+    final = []
+    done = threading.Event()
+    try:
+        watcher.watch("key", "token", "1", lambda order: (final.append(order), done.set()))
+        _wait_for(lambda: kite.calls >= 2)
+        assert final == [] and watcher.pending() == 1
+
+        kite.book["1"] = {"order_id": "1", "status": "COMPLETE", "filled_quantity": 50, "average_price": 101.5}
+        assert done.wait(5)
+        assert final[0]["average_price"] == 101.5
+        assert watcher.pending() == 0
+    finally:
+        watcher.close()
+
+
+def test_watcher_drops_orders_that_never_finish():
+    kite = FakeKite()
+    kite.book["1"] = {"order_id": "1", "status": "OPEN"}
+    watcher = FillWatcher(lambda api_key, access_token: kite, interval=0.05, max_age=0.1)
+    try:
+        watcher.watch("key", "token", "1", lambda order: None)
+        _wait_for(lambda: watcher.pending() == 0)
+    finally:
+        watcher.close()
+
+
+def test_round_trip_realizes_pnl_at_fill_prices(exchange):
+    from kite_sessions import shared_sessions
+    from algorithm_executor import AlgorithmExecutor, DeploymentConfig
+
+    executor = AlgorithmExecutor()
+    try:
+        config = DeploymentConfig(algorithm_id="d1", algorithm_name="d1", algorithm_code="", api_key="key",
+                                  access_token="token")
+        executor.deployments["d1"] = config
+        kite = shared_sessions.get("key", "token")
+        placed = []
+        for side in ("BUY", "SELL"):
+            order_id = kite.place_order(variety="regular", exchange="NFO", tradingsymbol="NIFTY24JANFUT",
+                                        transaction_type=side, quantity=50, product="MIS", order_type="MARKET")
+            placed.append(order_id)
+            # The strategy only knows a stale quote when the order is placed
+            executor._record_trade(config, {"order_id": order_id, "symbol": "NIFTY24JANFUT",
+                                            "transaction_type": side, "quantity": 50, "price": 1.0,
+                                            "status": "PLACED"})
+        # Placed is not filled
+        assert config.trades == 0
+
+        _wait_for(lambda: config.trades == 2)
+        buy, sell = (kite.order_history(order_id)[-1]["average_price"] for order_id in placed)
+        assert config.profit == round(50 * (sell - buy), 2)
+
+        executor.store.sync()
+        trades = executor.get_trade_results("d1")
+        assert sorted((trade["status"], trade["price"]) for trade in trades) == sorted(
+            [("COMPLETE", buy), ("COMPLETE", sell)])
+    finally:
+        executor.close()
+
+
+def test_rejected_order_is_never_counted(exchange):
+    from algorithm_executor import AlgorithmExecutor, DeploymentConfig, TradeResult
+
+    executor = AlgorithmExecutor()
+    try:
+        config = DeploymentConfig(algorithm_id="d1", algorithm_name="d1", algorithm_code="", api_key="key",
+                                  access_token="token")
+        executor.deployments["d1"] = config
+        trade = TradeResult(order_id="X1", symbol="NIFTY24JANFUT", transaction_type="BUY", quantity=50,
+                            price=0.0, status="PLACED", timestamp="2026-01-02T09:15:00")
+        executor.store.record_trade("d1", asdict(trade))
+        executor._order_final(config, trade, {"order_id": "X1", "status": "REJECTED", "filled_quantity": 0,
+                                              "average_price": 0.0, "status_message": "Insufficient funds"})
+        assert config.trades == 0 and config.profit == 0
+
+        executor.store.sync()
+        [recorded] = executor.get_trade_results("d1")
+        assert (recorded["status"], recorded["error"]) == ("REJECTED", "Insufficient funds")
+    finally:
+        executor.close()
@@ -0,0 +1,193 @@
+"""
+Order gateway tests
+Token-bucket pacing, exits-first ordering, rate-limit retries and what
+happens to an order when its caller stops waiting
+"""
+
+import threading
+import time
+
+import pytest
+
+from order_gateway import OrderGateway, OrderNotSent, PendingOrder, TokenBucket
+
+
+class FakeKite:
+    """Records place_order calls; `gate` holds every call until it is set"""
+
+    def __init__(self, rate_limited: int = 0):
+        self.sent = []
+        self.sent_at = []
+        self.rate_limited = rate_limited
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+
+    def place_order(self, **params):
+        self.gate.wait(10)
+        with self._lock:
+            if self.rate_limited:
+                self.rate_limited -= 1
+                error = Exception("Too many requests")
+                error.code = 429
+                raise error
+            self.sent.append(params["tradingsymbol"])
+            self.sent_at.append(time.monotonic())
+            return f"order-{len(self.sent)}"
+
+
+@pytest.fixture
+def kite():
+    return FakeKite()
+
+
+@pytest.fixture
+def gateway(kite):
+    gateway = OrderGateway(lambda api_key, access_token: kite, rate=20, burst=1)
+    yield gateway
+    kite.gate.set()
+    gateway.close()
+
+
+@pytest.fixture
+def slow_gateway(kite):
+    """Two orders a second, so orders submitted together wait in the queue"""
+    gateway = OrderGateway(lambda api_key, access_token: kite, rate=2, burst=1)
+    yield gateway
+    kite.gate.set()
+    gateway.close()
+
+
+def _order(symbol):
+    return {"tradingsymbol": symbol, "transaction_type": "BUY", "quantity": 1}
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate=10, burst=2)
+    now = bucket.updated
+    assert bucket.available(now) == 2
+    bucket.take(2)
+    assert bucket.available(now + 0.05) == 0
+    assert bucket.wait_time() == pytest.approx(0.05, abs=1e-6)
+    assert bucket.available(now + 0.1) == 1
+    # Never more than the burst
+    assert bucket.available(now + 10) == 2
+
+
+def test_orders_are_paced_by_the_bucket(gateway, kite):
+    futures = [gateway.submit("key", "token", _order(f"S{i}")) for i in range(6)]
+    assert [future.result(5) for future in futures] == [f"order-{i}" for i in range(1, 7)]
+    # 20 orders/second with no burst: at least 50 ms between sends
+    gaps = [later - earlier for earlier, later in zip(kite.sent_at, kite.sent_at[1:])]
+    assert min(gaps) >= 0.04
+    assert gateway.stats()["key"]["submitted"] == 6
+
+
+def test_exits_are_sent_before_queued_entries(slow_gateway, kite):
+    first = slow_gateway.submit("key", "token", _order("ENTRY0"))
+    first.result(5)  # the bucket is empty now, so the rest queue
+    entries = [slow_gateway.submit("key", "token", _order(f"ENTRY{i}")) for i in range(1, 4)]
+    exit_order = slow_gateway.submit("key", "token", _order("EXIT"), exit=True)
+    for future in [exit_order] + entries:
+        future.result(5)
+    assert kite.sent == ["ENTRY0", "EXIT", "ENTRY1", "ENTRY2", "ENTRY3"]
+
+
+def test_rate_limited_orders_are_retried():
+    kite = FakeKite(rate_limited=2)
+    gateway = OrderGateway(lambda api_key, access_token: kite, rate=50, burst=1)
+    try:
+        assert gateway.place("key", "token", _order("S")) == "order-1"
+        assert gateway.stats()["key"]["rate_limited"] == 2
+    finally:
+        gateway.close()
+
+
+def test_order_still_queued_at_timeout_is_never_sent(slow_gateway, kite):
+    slow_gateway.submit("key", "token", _order("FIRST")).result(5)
+    with pytest.raises(OrderNotSent):
+        slow_gateway.place("key", "token", _order("LATE"), timeout=0.2)
+    # Well past the next token: the withdrawn order must not go out
+    time.sleep(0.8)
+    assert kite.sent == ["FIRST"]
+    assert slow_gateway.stats()["key"]["queued"] == 0
+
+
+def test_order_sent_before_timeout_is_reported_as_pending(gateway, kite):
+    kite.gate.clear()
+    result = gateway.place("key", "token", _order("SLOW"), timeout=0.2)
+    assert isinstance(result, PendingOrder)
+    kite.gate.set()
+    assert result.future.result(5) == "order-1"
+    assert kite.sent == ["SLOW"]
+
+
+def test_executor_reports_late_orders_as_pending_and_records_them_when_accepted(exchange, monkeypatch):
+    from concurrent.futures import Future
+    from algorithm_executor import AlgorithmExecutor, DeploymentConfig
+
+    executor = AlgorithmExecutor()
+    try:
+        config = DeploymentConfig(algorithm_id="d1", algorithm_name="d1", algorithm_code="", api_key="key",
+                                  access_token="token")
+        executor.deployments["d1"] = config
+        reply = Future()
+        monkeypatch.setattr(executor.orders, "place", lambda *args, **kwargs: PendingOrder("gw-7", reply))
+
+        message = {"type": "call", "method": "place_order",
+                   "params": {"tradingsymbol": "NIFTY", "transaction_type": "BUY", "quantity": 50}}
+        assert executor._handle_worker_message(config, message) == {
+            "op": "reply", "result": {"status": "PENDING", "reference": "gw-7"}}
+        assert executor.get_trade_results("d1") == []
+
+        reply.set_result("240101000001")
+        executor.store.sync()
+        [trade] = executor.get_trade_results("d1")
+        assert (trade["order_id"], trade["status"], trade["quantity"]) == ("240101000001", "PLACED", 50)
+
+        # The worker's PENDING report arriving after the outcome adds no second row
+        executor._handle_worker_message(config, _pending_report("gw-7"))
+        executor.store.sync()
+        assert [trade["order_id"] for trade in executor.get_trade_results("d1")] == ["240101000001"]
+    finally:
+        executor.close()
+
+
+def _pending_report(reference):
+    return {"type": "trade", "record": {"order_id": reference, "symbol": "NIFTY", "transaction_type": "BUY",
+                                        "quantity": 50, "price": 0.0, "status": "PENDING"}}
+
+
+def test_a_pending_trade_is_updated_in_place_when_the_order_is_accepted(exchange, monkeypatch):
+    from concurrent.futures import Future
+    from algorithm_executor import AlgorithmExecutor, DeploymentConfig
+
+    executor = AlgorithmExecutor()
+    try:
+        config = DeploymentConfig(algorithm_id="d1", algorithm_name="d1", algorithm_code="", api_key="key",
+                                  access_token="token")
+        executor.deployments["d1"] = config
+        monkeypatch.setattr(executor.fills, "watch", lambda *args: None)
+        replies = {"gw-1": Future(), "gw-2": Future()}
+        references = iter(replies)
+
+        def place(*args, **kwargs):
+            reference = next(references)
+            return PendingOrder(reference, replies[reference])
+
+        monkeypatch.setattr(executor.orders, "place", place)
+
+        for reference in replies:
+            message = {"type": "call", "method": "place_order",
+                       "params": {"tradingsymbol": "NIFTY", "transaction_type": "BUY", "quantity": 50}}
+            executor._handle_worker_message(config, message)
+            executor._handle_worker_message(config, _pending_report(reference))
+        replies["gw-1"].set_result("240101000001")
+        replies["gw-2"].set_exception(ConnectionError("reset by peer"))
+        executor.store.sync()
+
+        failed, placed = executor.get_trade_results("d1")
+        assert (placed["order_id"], placed["status"]) == ("240101000001", "PLACED")
+        assert (failed["order_id"], failed["status"], failed["error"]) == ("", "FAILED", "reset by peer")
+    finally:
+        executor.close()
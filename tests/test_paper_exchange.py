@@ -0,0 +1,98 @@
+"""
+Paper exchange tests
+Matching against the touch, limit and stop orders, partial fills from
+limited depth, rejections, and the Kite REST routes
+"""
+
+import pytest
+from kiteconnect import KiteConnect
+
+from kite_stub_server import ConstantPrice, FillRules, StubBroker, make_price_path
+
+INSTRUMENT = "NSE:TCS"
+
+
+def _broker(**rules):
+    broker = StubBroker(base_price=100.0, price_path=ConstantPrice(), fill_rules=FillRules(**rules))
+    broker.price(INSTRUMENT)
+    return broker
+
+
+def _place(broker, side, quantity, **params):
+    params = dict({"exchange": "NSE", "tradingsymbol": "TCS", "transaction_type": side,
+                   "quantity": str(quantity)}, **params)
+    return broker.order(broker.place_order("regular", params)["order_id"])
+
+
+def test_market_orders_fill_at_the_touch_with_slippage():
+    broker = _broker(slippage_bps=10)
+    buy = _place(broker, "BUY", 5)
+    sell = _place(broker, "SELL", 5)
+    assert (buy["status"], buy["filled_quantity"]) == ("COMPLETE", 5)
+    assert buy["average_price"] == pytest.approx(100.15)
+    assert sell["average_price"] == pytest.approx(99.85)
+
+
+def test_limit_orders_rest_until_marketable():
+    broker = _broker()
+    order = _place(broker, "BUY", 5, order_type="LIMIT", price="99")
+    assert order["status"] == "OPEN"
+
+    broker.modify_order(order["order_id"], {"price": "100.05"})
+    order = broker.order(order["order_id"])
+    assert (order["status"], order["average_price"]) == ("COMPLETE", 100.05)
+    with pytest.raises(ValueError):
+        broker.cancel_order(order["order_id"])
+
+
+def test_stop_orders_wait_for_their_trigger():
+    broker = _broker()
+    stop = _place(broker, "SELL", 5, order_type="SL-M", trigger_price="95")
+    assert stop["status"] == "TRIGGER PENDING"
+    broker.prices[INSTRUMENT] = 94.0
+    broker.price(INSTRUMENT)
+    assert broker.order(stop["order_id"])["status"] == "COMPLETE"
+
+
+def test_limited_depth_gives_partial_fills():
+    broker = _broker(depth=3)
+    order = _place(broker, "BUY", 5)
+    assert (order["status"], order["filled_quantity"], order["pending_quantity"]) == ("OPEN", 3, 2)
+    # The next exchange tick fills the rest
+    broker.price(INSTRUMENT)
+    assert broker.order(order["order_id"])["status"] == "COMPLETE"
+
+    resting = _place(broker, "BUY", 5, order_type="LIMIT", price="90")
+    broker.cancel_order(resting["order_id"])
+    assert broker.order(resting["order_id"])["cancelled_quantity"] == 5
+
+
+def test_invalid_orders_are_rejected():
+    broker = _broker()
+    assert _place(broker, "BUY", 0)["status"] == "REJECTED"
+    assert _place(broker, "BUY", 5, order_type="LIMIT")["status_message"] == "Price is required for LIMIT orders"
+    assert _place(_broker(reject_rate=1.0), "BUY", 5)["status"] == "REJECTED"
+
+
+def test_positions_net_the_fills():
+    broker = _broker(spread=0)
+    _place(broker, "BUY", 10)
+    _place(broker, "SELL", 4)
+    (position,) = broker.positions()["net"]
+    assert (position["quantity"], position["average_price"], position["pnl"]) == (6, 100.0, 0.0)
+
+
+def test_unknown_price_paths_are_rejected():
+    with pytest.raises(ValueError):
+        make_price_path("sideways")
+
+
+def test_kite_connect_trades_against_the_server(exchange):
+    kite = KiteConnect(api_key="key", root=exchange.root)
+    kite.set_access_token("token")
+    order_id = kite.place_order(variety="regular", exchange="NSE", tradingsymbol="INFY",
+                                transaction_type="BUY", quantity=2, product="MIS", order_type="MARKET")
+    assert kite.order_history(order_id)[-1]["status"] == "COMPLETE"
+    assert [order["order_id"] for order in kite.orders()] == [order_id]
+    assert kite.positions()["net"][0]["quantity"] == 2
+    assert "NSE:INFY" in kite.ltp(["NSE:INFY"])
@@ -0,0 +1,108 @@
+"""
+Positions service tests
+One broker poll per account shared by all readers, refresh on request,
+serving the last good snapshot through errors, and idle accounts
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from positions_service import PositionsService
+
+
+class FakeKite:
+    """Counts positions calls; fails while `failing` is set"""
+
+    def __init__(self):
+        self.calls = 0
+        self.failing = False
+        self._lock = threading.Lock()
+
+    def positions(self):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(0.05)
+        if self.failing:
+            raise ConnectionError("broker down")
+        return {"net": [], "day": [], "call": calls}
+
+    def margins(self):
+        return {"equity": {"net": 1000.0}}
+
+
+@pytest.fixture
+def kite():
+    return FakeKite()
+
+
+@pytest.fixture
+def make_service(kite):
+    services = []
+
+    def make(**kwargs):
+        service = PositionsService(lambda api_key, access_token: kite, **kwargs)
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        service.close()
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_concurrent_readers_share_one_fetch(kite, make_service):
+    service = make_service(interval=60)
+    with ThreadPoolExecutor(8) as pool:
+        snapshots = list(pool.map(lambda _: service.get("key", "token"), range(8)))
+    assert kite.calls == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert snapshots[0]["margins"] == {"equity": {"net": 1000.0}}
+
+
+def test_the_poller_keeps_the_snapshot_fresh(kite, make_service):
+    service = make_service(interval=0.1)
+    first = service.get("key", "token")
+    _wait_for(lambda: service.get("key", "token") is not first)
+    assert service.positions("key", "token")["call"] > 1
+
+
+def test_a_refresh_request_fetches_right_away(kite, make_service):
+    service = make_service(interval=60)
+    service.get("key", "token")
+    service.request_refresh("key", "token")
+    _wait_for(lambda: service.positions("key", "token")["call"] == 2)
+
+
+def test_errors_keep_the_last_good_snapshot(kite, make_service):
+    service = make_service(interval=60)
+    service.get("key", "token")
+    kite.failing = True
+    service.request_refresh("key", "token")
+    _wait_for(lambda: service.get("key", "token")["error"] == "broker down")
+    assert service.positions("key", "token")["call"] == 1
+
+
+def test_an_account_without_a_snapshot_raises(kite, make_service):
+    kite.failing = True
+    service = make_service(interval=60)
+    with pytest.raises(RuntimeError, match="broker down"):
+        service.get("key", "token")
+
+
+def test_idle_accounts_stop_being_polled(kite, make_service):
+    service = make_service(interval=0.05, idle_timeout=0.1)
+    service.get("key", "token")
+    _wait_for(lambda: len(service) == 0)
+    calls = kite.calls
+    time.sleep(0.2)
+    assert kite.calls == calls
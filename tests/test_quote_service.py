@@ -0,0 +1,105 @@
+"""
+Quote service tests
+Coalescing concurrent callers into one broker call per account, caching
+with per-purpose staleness, and errors reaching every waiting caller
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from quote_service import QuoteService
+
+
+class FakeKite:
+    """Answers quote/ltp for every instrument except UNKNOWN ones, counting calls"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def quote(self, instruments):
+        return self._answer("quote", instruments)
+
+    def ltp(self, instruments):
+        return self._answer("ltp", instruments)
+
+    def _answer(self, kind, instruments):
+        with self._lock:
+            self.calls.append((kind, sorted(instruments)))
+        if self.fail:
+            raise ConnectionError("broker down")
+        return {i: {"last_price": 100.0} for i in instruments if not i.startswith("NSE:UNKNOWN")}
+
+
+def _service(kite, **kwargs):
+    return QuoteService(lambda api_key, access_token: kite, **kwargs)
+
+
+def test_concurrent_callers_share_one_request():
+    kite = FakeKite()
+    service = _service(kite, window=0.2)
+    instruments = ["NSE:TCS", "NSE:INFY", "NSE:SBIN"]
+    with ThreadPoolExecutor(len(instruments)) as pool:
+        results = list(pool.map(lambda i: service.get("key", "token", [i]), instruments))
+
+    assert kite.calls == [("quote", sorted(instruments))]
+    assert [list(result) for result in results] == [[i] for i in instruments]
+
+
+def test_accounts_asking_for_the_same_instrument_do_not_share_futures():
+    kite = FakeKite()
+    service = QuoteService(lambda api_key, access_token: kite, window=0.02, timeout=5)
+
+    def fetch(account, delay):
+        time.sleep(delay)
+        return service.get(account, "token", ["NFO:X", f"NSE:{account}"])
+
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(fetch, "A", 0)
+        second = pool.submit(fetch, "B", 0.005)
+        assert first.result(5) == {"NFO:X": {"last_price": 100.0}, "NSE:A": {"last_price": 100.0}}
+        assert second.result(5) == {"NFO:X": {"last_price": 100.0}, "NSE:B": {"last_price": 100.0}}
+    assert sorted(kite.calls) == [("quote", ["NFO:X", "NSE:A"]), ("quote", ["NFO:X", "NSE:B"])]
+
+
+def test_repeats_are_served_from_the_cache():
+    kite = FakeKite()
+    service = _service(kite, window=0)
+    assert service.get("key", "token", ["NSE:TCS", "NSE:UNKNOWN1"]) == {"NSE:TCS": {"last_price": 100.0}}
+    # Unknown instruments are cached as missing, and a full quote also answers an LTP request
+    assert service.get("key", "token", ["NSE:TCS", "NSE:UNKNOWN1"], kind="ltp") == {"NSE:TCS": {"last_price": 100.0}}
+    assert len(kite.calls) == 1
+
+    service.invalidate("NSE:TCS")
+    service.get("key", "token", ["NSE:TCS"])
+    assert kite.calls[-1] == ("quote", ["NSE:TCS"])
+
+
+def test_staleness_depends_on_the_purpose():
+    kite = FakeKite()
+    service = _service(kite, window=0, staleness={"pricing": 0.0, "validation": 60.0})
+    service.get("key", "token", ["NSE:TCS"])
+    service.get("key", "token", ["NSE:TCS"], purpose="validation")
+    assert len(kite.calls) == 1
+    service.get("key", "token", ["NSE:TCS"])
+    assert len(kite.calls) == 2
+
+
+def test_errors_reach_every_waiting_caller():
+    kite = FakeKite(fail=True)
+    service = _service(kite, window=0.05)
+    with ThreadPoolExecutor(2) as pool:
+        futures = [pool.submit(service.get, "key", "token", [i]) for i in ("NSE:TCS", "NSE:INFY")]
+        for future in futures:
+            with pytest.raises(ConnectionError):
+                future.result(5)
+    assert len(kite.calls) == 1
+
+
+def test_unknown_kinds_are_rejected():
+    with pytest.raises(ValueError):
+        _service(FakeKite()).get("key", "token", ["NSE:TCS"], kind="depth")
@@ -0,0 +1,83 @@
+"""
+Startup resume tests
+Deployments left running are restarted only when asked, with one profile
+check per account
+"""
+
+import uuid
+from dataclasses import asdict
+
+import pytest
+from kiteconnect import KiteConnect
+
+from deployment_store import DeploymentStore
+
+NOOP_ALGORITHM = "def main():\n    pass\n"
+
+
+def _seed(tokens):
+    """A deployments.db with one running deployment per entry of tokens"""
+    from algorithm_executor import DeploymentConfig
+    store = DeploymentStore("deployments.db")
+    store.load()
+    for i, token in enumerate(tokens):
+        config = DeploymentConfig(algorithm_id=f"d{i}", algorithm_name=f"d{i}", algorithm_code=NOOP_ALGORITHM,
+                                  api_key="key", access_token=token, run_interval=3600,
+                                  status="running", created_at="2026-01-02T09:15:00")
+        store.put(config.algorithm_id, asdict(config))
+    store.close()
+
+
+@pytest.fixture
+def profile_calls(monkeypatch):
+    calls = []
+    original = KiteConnect.profile
+
+    def profile(kite):
+        calls.append(kite.access_token)
+        return original(kite)
+
+    monkeypatch.setattr(KiteConnect, "profile", profile)
+    return calls
+
+
+def test_constructing_an_executor_does_not_start_stored_deployments(exchange, profile_calls):
+    from algorithm_executor import AlgorithmExecutor
+    _seed([uuid.uuid4().hex] * 2)
+    executor = AlgorithmExecutor()
+    try:
+        assert executor.resumed.is_set()
+        assert not any(executor.is_running(algorithm_id) for algorithm_id in executor.deployments)
+        assert profile_calls == []
+    finally:
+        executor.close()
+
+
+def test_resume_checks_each_account_once(exchange, profile_calls):
+    from algorithm_executor import AlgorithmExecutor
+    tokens = [uuid.uuid4().hex for _ in range(3)]
+    _seed([tokens[i % 3] for i in range(9)])
+    executor = AlgorithmExecutor()
+    try:
+        executor.resume_in_background()
+        assert executor.resumed.wait(30)
+        assert sorted(profile_calls) == sorted(tokens)
+        assert all(executor.is_running(f"d{i}") for i in range(9))
+        # A resume keeps the original deploy time
+        assert executor.deployments["d0"].created_at == "2026-01-02T09:15:00"
+        assert executor.reconcile() == 0
+    finally:
+        executor.close()
+
+
+def test_resume_stops_deployments_whose_token_is_rejected(exchange, profile_calls):
+    from algorithm_executor import AlgorithmExecutor
+    _seed([uuid.uuid4().hex, ""])
+    executor = AlgorithmExecutor()
+    try:
+        assert executor.resume_deployments() == 1
+        assert executor.is_running("d0")
+        assert executor.deployments["d1"].status == "stopped"
+        assert executor.store.get("d1")["status"] == "stopped"
+    finally:
+        executor.close()
@@ -0,0 +1,160 @@
+"""
+Scheduler tests
+Fixed-delay runs per deployment, no overlapping runs, cancelling, and
+many deployments sharing one timer thread and a bounded pool
+"""
+
+import threading
+import time
+
+import pytest
+
+from scheduler import DeploymentScheduler
+
+
+class Recorder:
+    """run_callback that records start/end times and returns a fixed delay"""
+
+    def __init__(self, delay=0.1, duration=0.0):
+        self.delay = delay
+        self.duration = duration
+        self.runs = {}
+        self.active = set()
+        self.overlaps = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, algorithm_id):
+        started = time.monotonic()
+        with self._lock:
+            if algorithm_id in self.active:
+                self.overlaps += 1
+            self.active.add(algorithm_id)
+        time.sleep(self.duration(algorithm_id) if callable(self.duration) else self.duration)
+        with self._lock:
+            self.active.discard(algorithm_id)
+            self.runs.setdefault(algorithm_id, []).append((started, time.monotonic()))
+        return self.delay
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(callback, **kwargs):
+        scheduler = DeploymentScheduler(callback, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.shutdown(wait=True)
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_runs_repeat_after_the_returned_delay(make_scheduler):
+    recorder = Recorder(delay=0.1)
+    scheduler = make_scheduler(recorder)
+    scheduler.schedule("a")
+    _wait_for(lambda: len(recorder.runs.get("a", [])) >= 4)
+    starts = [start for start, _ in recorder.runs["a"]]
+    assert min(later - earlier for earlier, later in zip(starts, starts[1:])) >= 0.09
+
+
+def test_an_overrun_is_followed_by_a_full_gap(make_scheduler):
+    # The first run takes three intervals; a fixed-rate schedule would start the next one at once
+    durations = iter([0.3] + [0.0] * 10)
+    recorder = Recorder(delay=0.1, duration=lambda algorithm_id: next(durations))
+    scheduler = make_scheduler(recorder)
+    scheduler.schedule("a")
+    _wait_for(lambda: len(recorder.runs.get("a", [])) >= 2)
+    (_, first_end), (second_start, _) = recorder.runs["a"][:2]
+    assert second_start - first_end >= 0.09
+
+
+def test_runs_of_one_deployment_never_overlap(make_scheduler):
+    recorder = Recorder(delay=0.0, duration=0.05)
+    scheduler = make_scheduler(recorder, max_workers=4)
+    for _ in range(5):
+        scheduler.schedule("a")
+    scheduler.schedule("b")
+    _wait_for(lambda: len(recorder.runs.get("a", [])) >= 5 and recorder.runs.get("b"))
+    assert recorder.overlaps == 0
+
+
+def test_schedule_during_a_run_reruns_once_it_finishes(make_scheduler):
+    recorder = Recorder(delay=None, duration=0.2)
+    scheduler = make_scheduler(recorder)
+    scheduler.schedule("a")
+    _wait_for(lambda: "a" in recorder.active)
+    scheduler.schedule("a")
+    _wait_for(lambda: len(recorder.runs.get("a", [])) == 2)
+    time.sleep(0.1)
+    assert len(recorder.runs["a"]) == 2
+    assert not scheduler.is_scheduled("a")
+
+
+def test_cancel_stops_future_runs(make_scheduler):
+    recorder = Recorder(delay=0.05, duration=0.1)
+    scheduler = make_scheduler(recorder)
+    scheduler.schedule("a")
+    _wait_for(lambda: "a" in recorder.active)
+    in_flight = scheduler.cancel("a")
+    in_flight.result(5)
+    runs = len(recorder.runs["a"])
+    time.sleep(0.3)
+    assert len(recorder.runs["a"]) == runs
+    assert not scheduler.is_scheduled("a")
+
+
+def test_many_deployments_share_a_bounded_pool(make_scheduler):
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def run(algorithm_id):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return None
+
+    threads = threading.active_count()
+    scheduler = make_scheduler(run, max_workers=3)
+    for i in range(30):
+        scheduler.schedule(f"d{i}")
+    _wait_for(lambda: not any(scheduler.is_scheduled(f"d{i}") for i in range(30)))
+    assert peak[0] == 3
+    # One timer thread plus the pool, however many deployments there are
+    assert threading.active_count() - threads <= 4
+
+
+def test_a_failing_run_stops_only_its_deployment(make_scheduler):
+    recorder = Recorder(delay=0.05)
+
+    def run(algorithm_id):
+        if algorithm_id == "bad":
+            raise RuntimeError("boom")
+        return recorder(algorithm_id)
+
+    scheduler = make_scheduler(run)
+    scheduler.schedule("bad")
+    scheduler.schedule("good")
+    _wait_for(lambda: len(recorder.runs.get("good", [])) >= 3)
+    assert not scheduler.is_scheduled("bad")
+
+
+def test_rescheduling_replaces_the_pending_run(make_scheduler):
+    recorder = Recorder(delay=None)
+    scheduler = make_scheduler(recorder)
+    scheduler.schedule("a", delay=60)
+    scheduler.schedule("a", delay=0.05)
+    _wait_for(lambda: recorder.runs.get("a"))
+    time.sleep(0.1)
+    assert len(recorder.runs["a"]) == 1